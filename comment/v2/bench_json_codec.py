@@ -0,0 +1,56 @@
+# =========================
+# Benchmark JSON codec trên NDJSON comment: stdlib json (đường cũ) vs json_utils (orjson nếu có)
+# =========================
+#   python bench_json_codec.py [--root ../../database/comment] [--limit 0] [--repeat 3]
+# Đo loads từng dòng và dumps lại từng row; kiểm tra 2 đường cho cùng giá trị (byte dumps khác
+# nhau vì json_utils dùng separators compact — xem shared/json_utils.py).
+import argparse, glob, json, os, time
+from json_utils import dumps, loads
+from shared.json_utils import orjson  # shim json_utils đã thêm gốc repo vào sys.path
+
+def load_lines(root, limit):
+    lines = []
+    for path in sorted(glob.glob(os.path.join(root, "**", "*.ndjson"), recursive=True)):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    lines.append(line)
+                    if limit and len(lines) >= limit:
+                        return lines
+    return lines
+
+def _best(fn, items, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for x in items:
+            fn(x)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+def _old_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=os.path.join("..", "..", "database", "comment"), help="Thư mục chứa *.ndjson.")
+    ap.add_argument("--limit", type=int, default=0, help="Số dòng tối đa (0 = tất cả).")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lượt đo, lấy lượt nhanh nhất.")
+    args = ap.parse_args()
+
+    lines = load_lines(args.root, args.limit)
+    if not lines:
+        raise SystemExit(f"Không có dòng NDJSON nào trong {args.root}")
+    rows = [json.loads(x) for x in lines]
+    mb = sum(len(x.encode("utf-8")) for x in lines) / 1e6
+
+    diff = sum(1 for x, r in zip(lines, rows) if loads(x) != r or json.loads(dumps(r)) != r)
+
+    print(f"[BENCH] {len(lines)} dòng, {mb:.1f} MB, backend={'orjson' if orjson is not None else 'json'}, "
+          f"khác giá trị: {diff}")
+    for name, old_fn, new_fn, items in (("loads", json.loads, loads, lines), ("dumps", _old_dumps, dumps, rows)):
+        t_old = _best(old_fn, items, args.repeat)
+        t_new = _best(new_fn, items, args.repeat)
+        print(f"[BENCH] {name}: cũ {t_old * 1e3:.0f} ms, mới {t_new * 1e3:.0f} ms → x{t_old / t_new:.2f}")
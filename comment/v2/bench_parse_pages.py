@@ -0,0 +1,96 @@
+# =========================
+# Benchmark parse trang comment trên raw_dumps: đường cũ (loads → tokens → clean → loads lại) vs parse_comment_page
+# =========================
+#   python bench_parse_pages.py [--root raw_dumps] [--limit 500] [--repeat 3]
+# Đọc response từ raw archive (index.ndjson, bỏ doc Depth1 replies) và các file page*.txt / page*.json kiểu cũ.
+import argparse, glob, os, time
+from configs import *
+from extract_comment_utils import extract_full_posts_from_resptext, parse_comment_page
+from get_comment_fb_utils import (RawArchive, _split_top_level_json_objects, _strip_xssi_globally,
+                                  clean_fb_resp_text, collect_reply_tokens_from_json)
+from json_utils import loads
+
+def _legacy_parse(resp_text):
+    """Đường parse cũ của crawl_comments (giữ lại để so sánh)."""
+    reply_token_map = {}
+    try:
+        json_resp = loads(resp_text)
+        cleaned = resp_text
+        collect_reply_tokens_from_json(json_resp, reply_token_map)
+    except Exception:
+        stripped = _strip_xssi_globally(resp_text)
+        parts = _split_top_level_json_objects(stripped)
+        if len(parts) > 1:
+            cleaned = clean_fb_resp_text(resp_text)
+            loads(cleaned)
+        else:
+            loads(stripped)
+            cleaned = stripped
+    rows, end_cursor, total, _ = extract_full_posts_from_resptext(cleaned)
+    return rows, end_cursor, total, reply_token_map
+
+def load_pages(root, limit):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(root, "page*.txt")) + glob.glob(os.path.join(root, "page*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    index = os.path.join(root, "index.ndjson")
+    if os.path.exists(index):
+        arc = RawArchive(root=root, mode="full")
+        try:
+            seen = set()
+            with open(index, "r", encoding="utf-8") as f:
+                for line in f:
+                    rec = loads(line)
+                    if rec["h"] in seen or "Depth1" in str(rec.get("doc") or ""):
+                        continue
+                    seen.add(rec["h"])
+                    pages.append(arc.get(rec["h"]))
+                    if limit and len(pages) >= limit:
+                        break
+        finally:
+            arc.close()
+    return pages[:limit] if limit else pages
+
+def _time(fn, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in pages:
+            try:
+                fn(p)
+            except Exception:
+                pass
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=RAW_DUMPS_DIR, help="Thư mục raw archive / page*.txt.")
+    ap.add_argument("--limit", type=int, default=0, help="Số trang tối đa (0 = tất cả).")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lượt đo, lấy lượt nhanh nhất.")
+    args = ap.parse_args()
+
+    pages = load_pages(args.root, args.limit)
+    if not pages:
+        raise SystemExit(f"Không có trang nào trong {args.root}")
+    mb = sum(len(p) for p in pages) / 1e6
+
+    diff = 0
+    for p in pages:
+        try:
+            old = _legacy_parse(p)
+        except Exception:
+            continue
+        new = parse_comment_page(p)
+        # đường cũ bỏ token replies khi body phải clean → chỉ so tokens với trang JSON sạch
+        if old[:3] != new[:3] or (new[4] is None and old[3] != new[3]):
+            diff += 1
+
+    t_old = _time(_legacy_parse, pages, args.repeat)
+    t_new = _time(parse_comment_page, pages, args.repeat)
+    print(f"[BENCH] {len(pages)} trang, {mb:.1f} MB, khác kết quả: {diff}")
+    print(f"[BENCH] cũ : {t_old:.2f}s ({t_old / len(pages) * 1e3:.2f} ms/trang, {mb / t_old:.1f} MB/s)")
+    print(f"[BENCH] mới: {t_new:.2f}s ({t_new / len(pages) * 1e3:.2f} ms/trang, {mb / t_new:.1f} MB/s) "
+          f"→ x{t_old / t_new:.2f}")
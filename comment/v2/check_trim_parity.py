@@ -0,0 +1,38 @@
+# =========================
+# Kiểm tra --trim không đổi kết quả: body gốc vs body đã __trimBody → cùng comment rows / cursor / token replies
+# =========================
+#   python check_trim_parity.py [--root raw_dumps] [--limit 0]
+# Cần node; body lấy từ raw archive ghi lúc chạy KHÔNG trim (archive lưu đúng text Python nhận được).
+import argparse
+from configs import *
+from extract_comment_utils import extract_replies_from_depth1_resp, parse_comment_page
+from get_comment_fb_automation import _TRIM_JS, _trim_spec
+from shared.trim_parity import archive_bodies, trim_bodies
+
+def analyze(text):
+    rows, end_cursor, total, reply_token_map, _err = parse_comment_page(text)
+    return rows, end_cursor, total, reply_token_map, extract_replies_from_depth1_resp(text)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=RAW_DUMPS_DIR, help="Thư mục raw archive (index.ndjson + pack-*.bin).")
+    ap.add_argument("--limit", type=int, default=0, help="Số response tối đa (0 = tất cả).")
+    args = ap.parse_args()
+
+    bodies = archive_bodies(args.root, args.limit)
+    if not bodies:
+        raise SystemExit(f"Không có response nào trong {args.root}")
+    trimmed = trim_bodies(_TRIM_JS, _trim_spec(True), bodies)
+
+    diff, fallback, full, kept = 0, {}, 0, 0
+    for i, (body, t) in enumerate(zip(bodies, trimmed)):
+        full += t["full"]; kept += t["kept"]
+        if t["fallback"]:
+            fallback[t["fallback"]] = fallback.get(t["fallback"], 0) + 1
+            continue
+        if analyze(body) != analyze(t["text"]):
+            diff += 1
+            print(f"[PARITY] response #{i}: rows/cursor/token khác sau trim")
+    print(f"[PARITY] {len(bodies)} response, khác kết quả: {diff}, giữ nguyên (fallback): {fallback or 0}, "
+          f"byte còn {kept / max(full, 1):.1%}")
+    raise SystemExit(1 if diff else 0)
@@ -7,10 +7,44 @@ POST_URL      = "https://www.facebook.com/reel/1528393574968999/?rdid=ZfoaJKOZsh
 # POST_URL      = "https://www.facebook.com/thoibao.de/posts/pfbid0Jpg5qPjAF2uFoKUwn34moBouHYcNJQeVUqg4NyBthaiKAjWxFdNfmq5wTCiTrsYRl"
 OUT_FILE      = "comments_batch1.json"
 REMOTE_PORT  = 9222
+# NDJSON writer giữ file mở: ghi xuống khi buffer đủ FLUSH_BYTES hoặc quá FLUSH_INTERVAL giây
+NDJSON_FLUSH_BYTES    = 1 << 20
+NDJSON_FLUSH_INTERVAL = 2.0
+# Output "*.ndjson.zst" → ghi segment nén zstd, xoay vòng khi đủ ZSTD_SEGMENT_BYTES (byte chưa nén)
+ZSTD_LEVEL         = 6
+ZSTD_SEGMENT_BYTES = 64 << 20
+# Raw archive: "off" | "sample" (1/RAW_ARCHIVE_SAMPLE_EVERY trang + trang parse lỗi) | "full"
+# — response gốc khoá theo hash, nén zstd vào pack trong RAW_DUMPS_DIR (thay page{n}.txt/.json)
+RAW_DUMPS_DIR = "raw_dumps"
+RAW_ARCHIVE   = "full"
+RAW_ARCHIVE_SAMPLE_EVERY = 20
+RAW_ARCHIVE_PACK_BYTES   = 256 << 20
+RAW_ARCHIVE_LEVEL        = 6
 
 # =========================
 # Reuse helpers (cursor keys + parse)
 # =========================
 CURSOR_KEYS = {"end_cursor","endCursor","after","afterCursor","commentsAfterCursor","feedAfterCursor","cursor"}
 
+# Cắt response trong page trước khi qua WebDriver: bỏ các key nặng extractor không đọc.
+# Subtree sắp bỏ mà chứa key/__typename bên dưới → giữ nguyên cả body.
+TRIM_RESPONSES   = False
+TRIM_DROP_KEYS   = {"dash_manifest", "dash_manifests", "dash_manifest_xml_string", "manifest_xml",
+                    "playlist", "representations", "all_video_dash_prefetch_representations",
+                    "dash_prefetch_experimental", "spherical_video_fallback_urls",
+                    "prefetch_uris", "prefetch_uris_v2",
+                    "encrypted_tracking", "tracking", "click_tracking_linkshim_cb"}
+# Guard thật = TRIM_GUARD_KEYS ∪ CURSOR_KEYS ∪ extract_comment_utils.EXTRACT_KEYS, gộp trong _trim_spec
+TRIM_GUARD_KEYS  = {"page_info", "pageInfo", "end_cursor", "endCursor", "has_next_page", "hasNextPage",
+                    "expansion_token", "expansionToken", "expansion_info", "message",
+                    "comment_rendering_instance", "comment_rendering_instance_for_feed_location",
+                    "comments", "edges", "node", "display_comments", "comment_replies", "threaded_comments",
+                    "comment_count", "creation_time"}
+TRIM_GUARD_TYPES = {"Story", "Comment", "Feedback"}
+
+# Số parent mở replies cùng lúc trong page (fetch song song, 1 = tuần tự như cũ)
+REPLY_CONCURRENCY = 1
+# Gom trang replies của tối đa REPLY_BATCH_SIZE parent vào 1 lần gọi WebDriver (1 = tắt)
+REPLY_BATCH_SIZE  = 1
+
 PROXY_URL = "http://10.9.145.4:4002"
\ No newline at end of file
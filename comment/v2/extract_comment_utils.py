@@ -1,11 +1,27 @@
 # ========= Full-field extractors (NON-BREAKING: only adds new helpers) =========
 import datetime
-import json
 import re
-from get_comment_fb_utils import find_pageinfo_any
+from get_comment_fb_utils import (_split_top_level_json_spans, _strip_xssi_globally, collect_reply_tokens_from_json,
+                                  find_pageinfo_any, pick_fb_resp_block)
+from json_utils import loads
 
 _HASHTAG_RE = re.compile(r"(?:#|＃)([A-Za-z0-9_]+)", re.UNICODE)
 
+# Key comment row đọc từ node (theo path) + key dò ở mọi độ sâu (_walk_progressive_urls).
+# EXTRACT_KEYS: --trim trong page không được bỏ subtree chứa chúng (get_comment_fb_automation._trim_spec
+# gộp với TRIM_GUARD_KEYS). Thêm key mới cho extractor thì thêm vào các bộ dưới đây.
+_TEXT_KEYS   = ("preferred_body", "body_renderer", "body")
+_IMAGE_KEYS  = ("image", "photo_image", "blurred_image", "previewImage")
+_VIDEO_KEYS  = ("playable_url", "browser_native_hd_url", "browser_native_sd_url", "permalink_url")
+_SOURCE_KEYS = ("owning_profile", "page", "group", "source")
+_NODE_KEYS   = ("author", "feedback", "parent_feedback", "attachments", "video", "content", "text",
+                "comment_action_links", "created_time", "top_reactions", "reaction_count",
+                "replies_fields", "replies_connection", "total_count", "legacy_fbid")
+_MATCH_KEYS  = ("videoDeliveryResponseFragment", "videoDeliveryResponseResult", "progressive_urls", "progressive_url")
+EXTRACT_KEYS = frozenset((*_TEXT_KEYS, *_IMAGE_KEYS, *_VIDEO_KEYS, *_SOURCE_KEYS, *_NODE_KEYS, *_MATCH_KEYS))
+# subtree chép nguyên vào row (avatar = author.profile_picture_depth_0, content dạng dict) → trim không cắt bên trong
+EXTRACT_KEEP_KEYS = frozenset(("profile_picture_depth_0", "content"))
+
 
 # 1) Generic safe getters -------------------------------------------------------
 def _as_list(x):
@@ -195,22 +211,23 @@ REACTION_ID_MAP = {
 }
 
 
+_REACTION_ALIAS = {
+    "like": "like",
+    "likes": "like",
+    "love": "love",
+    "haha": "haha",
+    "wow": "wow",
+    "sad": "sad",
+    "angry": "angry",
+    "care": "care",
+    "thankful": "care",  # historical
+}
+
 def _norm_reaction_name(rtype_or_id: str | None) -> str | None:
     """Normalize reaction name or map id -> canonical name."""
     if not rtype_or_id:
         return None
-    s = str(rtype_or_id).lower()
-    alias = {
-        "like": "like",
-        "likes": "like",
-        "love": "love",
-        "haha": "haha",
-        "wow": "wow",
-        "sad": "sad",
-        "angry": "angry",
-        "care": "care",
-        "thankful": "care",  # historical
-    }.get(s)
+    alias = _REACTION_ALIAS.get(str(rtype_or_id).lower())
     if alias:
         return alias
     return REACTION_ID_MAP.get(str(rtype_or_id))
@@ -378,7 +395,7 @@ def _get_comment_created_time(n: dict) -> int | None:
 
 def _pick_comment_text(n: dict) -> str | None:
     """Prefer preferred_body > body_renderer > body."""
-    for k in ("preferred_body", "body_renderer", "body"):
+    for k in _TEXT_KEYS:
         t = ((n.get(k) or {}).get("text"))
         if isinstance(t, str) and t.strip():
             return t
@@ -399,7 +416,7 @@ def _get_image_url_if_any(n: dict) -> list[str]:
             or att.get("style_type_renderer", {}).get("attachment", {}).get("media")
             or {}
         )
-        for key in ("image", "photo_image", "blurred_image", "previewImage"):
+        for key in _IMAGE_KEYS:
             uri = (media.get(key) or {}).get("uri")
             if isinstance(uri, str) and uri.startswith("http"):
                 urls.append(uri)
@@ -415,35 +432,37 @@ def _reply_count(fb: dict, n: dict) -> int:
     rc = (fb or {}).get("replies_connection") or (n.get("replies_connection") or {})
     edges = (rc or {}).get("edges") or []
     return len(edges) if isinstance(edges, list) else 0
+def _first_child_id(d: dict, keys) -> str | None:
+    """= _first(_get_in(d, [k, "id"]) for k in keys)."""
+    for k in keys:
+        c = d.get(k)
+        if isinstance(c, dict):
+            v = c.get("id")
+            if v not in (None, "", [], {}):
+                return v
+    return None
+
 def _pick_source_id_from_node(node: dict) -> str | None:
     # ưu tiên nguồn trực tiếp
-    sid = _first(
-        _get_in(node, ["owning_profile", "id"]),
-        _get_in(node, ["page", "id"]),
-        _get_in(node, ["group", "id"]),
-        _get_in(node, ["source", "id"]),
-    )
+    sid = _first_child_id(node, _SOURCE_KEYS)
     if sid:
         return sid
 
     # 👇 NEW: nhiều comment/reply lại nhét owning_profile trong parent_feedback
     pf = node.get("parent_feedback") or {}
-    sid = _first(
-        _get_in(pf, ["owning_profile", "id"]),
-        _get_in(pf, ["page", "id"]),
-        _get_in(pf, ["group", "id"]),
-    )
-    if sid:
-        return sid
+    if isinstance(pf, dict):
+        sid = _first_child_id(pf, ("owning_profile", "page", "group"))
+        if sid:
+            return sid
 
     return None
 def _collect_progressive_urls(obj) -> list[str]:
     out: list[str] = []
+    _walk_progressive_urls(obj, out, set())
+    return out
 
-    def _add(u):
-        if isinstance(u, str) and u.startswith("http") and u not in out:
-            out.append(u)
-
+def _walk_progressive_urls(obj, out, seen):
+    # preorder, giữ lần xuất hiện đầu — cùng thứ tự với bản gộp list con trước đây
     if isinstance(obj, dict):
         # Nhánh “chính thống” của FB
         vdrf = obj.get("videoDeliveryResponseFragment") or {}
@@ -451,21 +470,19 @@ def _collect_progressive_urls(obj) -> list[str]:
 
         # 1) progressive_urls chuẩn
         for it in vdr.get("progressive_urls", []) or []:
-            _add(it.get("progressive_url"))
+            u = it.get("progressive_url")
+            if isinstance(u, str) and u.startswith("http") and u not in seen:
+                seen.add(u)
+                out.append(u)
 
         # 2) phòng khi FB đổi key/đặt sâu hơn – quét đệ quy
-        for k, v in obj.items():
+        for v in obj.values():
             if isinstance(v, (dict, list)):
-                for u in _collect_progressive_urls(v):
-                    _add(u)
+                _walk_progressive_urls(v, out, seen)
 
     elif isinstance(obj, list):
         for x in obj:
-            for u in _collect_progressive_urls(x):
-                if u not in out:
-                    out.append(u)
-
-    return out
+            _walk_progressive_urls(x, out, seen)
 def _get_video_urls_if_any(n: dict) -> list[str]:
     out: list[str] = []
 
@@ -483,7 +500,7 @@ def _get_video_urls_if_any(n: dict) -> list[str]:
         target2 = attachment.get("target") or {}
 
         for src in (media, media2):
-            for key in ("playable_url", "browser_native_hd_url", "browser_native_sd_url", "permalink_url"):
+            for key in _VIDEO_KEYS:
                 _add(src.get(key))
 
             # 👉 hút progressive_urls nếu có trong media
@@ -499,7 +516,7 @@ def _get_video_urls_if_any(n: dict) -> list[str]:
 
     # b) field "video" trên node (nếu có)
     video_field = n.get("video") or {}
-    for key in ("playable_url", "browser_native_hd_url", "browser_native_sd_url", "permalink_url"):
+    for key in _VIDEO_KEYS:
         _add(video_field.get(key))
 
     # 👉 hút progressive_urls trong node["video"]
@@ -515,16 +532,34 @@ def _pick_source_id_from_payload(pay: dict) -> str | None:
     """
     root = _get_in(pay, ["data", "node"]) or {}
     return _pick_source_id_from_node(root)
-def _build_comment_row_from_node(n: dict, fallback_source_id: str | None = None) -> dict:
+# Cột của 1 comment row, đúng thứ tự key khi xuất dict
+_ROW_FIELDS = (
+    "id", "raw_comment_id", "type", "link", "author_id", "author", "author_link", "avatar",
+    "created_time", "content", "image_url",
+    "like", "haha", "wow", "sad", "love", "angry", "care", "comment", "share",
+    "hashtag", "video", "source_id", "feedback_id", "is_share", "link_share", "type_share",
+)
+_EMPTY = (None, "", [])  # _get_in coi là không có
+
+def _comment_vals(n: dict, fallback_source_id: str | None = None) -> list:
+    """
+    Comment row dạng list theo _ROW_FIELDS (gọn hơn dict khi còn phải gộp trùng).
+    Mỗi field tính đúng 1 lần, cùng luật với _get_in / _pick_* như bản dict cũ.
+    """
     fb = n.get("feedback") or {}
 
-    author_id = _get_in(n, ["author", "id"])
-    author_name = _get_in(n, ["author", "name"])
-    author_link = _pick_url(
-        _get_in(n, ["author", "url"]),
-        _get_in(n, ["author", "profile_url"]),
-    )
-    avatar = _get_in(n, ["author", "profile_picture_depth_0"])
+    a = n.get("author")
+    if isinstance(a, dict):
+        author_id, author_name, avatar = a.get("id"), a.get("name"), a.get("profile_picture_depth_0")
+        url, profile_url = a.get("url"), a.get("profile_url")
+        if author_id in _EMPTY: author_id = None
+        if author_name in _EMPTY: author_name = None
+        if avatar in _EMPTY: avatar = None
+        if url in _EMPTY: url = None
+        if profile_url in _EMPTY: profile_url = None
+        author_link = _pick_url(url, profile_url)
+    else:
+        author_id = author_name = avatar = author_link = None
 
     content = (
         _pick_comment_text(n)
@@ -532,7 +567,23 @@ def _build_comment_row_from_node(n: dict, fallback_source_id: str | None = None)
         or _get_in(n, ["content"])
     )
 
-    created_time = _get_comment_created_time(n)
+    # permalink + created_time cùng 1 vòng qua action links
+    link = created_time = None
+    for al in n.get("comment_action_links", []) or []:
+        if al.get("__typename") == "XFBCommentTimeStampActionLink":
+            c = al.get("comment") or {}
+            if link is None:
+                link = (c.get("url") or "").strip() or None
+            if created_time is None:
+                ct = c.get("created_time")
+                if isinstance(ct, int):
+                    created_time = ct
+    if link is None:
+        link = (fb.get("url") or "").strip() or None
+    if created_time is None:
+        ct = n.get("created_time")
+        created_time = ct if isinstance(ct, int) else None
+
     image_urls = _get_image_url_if_any(n)
     bd = _reaction_breakdown_from_top_edges(fb)
     reply_cnt = _reply_count(fb, n)
@@ -551,41 +602,19 @@ def _build_comment_row_from_node(n: dict, fallback_source_id: str | None = None)
     )
 
     raw_id = n.get("id") or n.get("legacy_fbid")
-    if source_id_here and raw_id:
-        row_id = f"{source_id_here}_{raw_id}"
-    else:
-        row_id = raw_id
-
-    row = {
-        "id": row_id,
-        "raw_comment_id": raw_id,           # optional: id FB gốc
-        "type": "Comment",
-        "link": _get_comment_permalink(n),
-        "author_id": author_id,
-        "author": author_name,
-        "author_link": author_link,
-        "avatar": avatar,
-        "created_time": created_time,
-        "content": content,
-        "image_url": image_urls,
-        "like": int(bd.get("like", 0)),
-        "haha": int(bd.get("haha", 0)),
-        "wow": int(bd.get("wow", 0)),
-        "sad": int(bd.get("sad", 0)),
-        "love": int(bd.get("love", 0)),
-        "angry": int(bd.get("angry", 0)),
-        "care": int(bd.get("care", 0)),
-        "comment": int(reply_cnt),
-        "share": 0,
-        "hashtag": _extract_hashtags_from_text(content),
-        "video": video_urls,
-        "source_id": source_id_here,
-        "feedback_id": feedback_id,         # 👈👈👈 THÊM CÁI NÀY
-        "is_share": False,
-        "link_share": None,
-        "type_share": "shared_none",
-    }
-    return row
+    row_id = f"{source_id_here}_{raw_id}" if source_id_here and raw_id else raw_id
+
+    return [
+        row_id, raw_id, "Comment", link, author_id, author_name, author_link, avatar,
+        created_time, content, image_urls,
+        bd["like"], bd["haha"], bd["wow"], bd["sad"], bd["love"], bd["angry"], bd["care"],
+        int(reply_cnt), 0,
+        _extract_hashtags_from_text(content), video_urls, source_id_here, feedback_id,
+        False, None, "shared_none",
+    ]
+
+def _build_comment_row_from_node(n: dict, fallback_source_id: str | None = None) -> dict:
+    return dict(zip(_ROW_FIELDS, _comment_vals(n, fallback_source_id)))
 
 def _iter_comment_nodes(root):
     """
@@ -630,12 +659,84 @@ def _iter_comment_nodes(root):
         elif isinstance(cur, list):
             stack.extend(cur)
 
+_MERGE_NZ_FIELDS = (
+    "link",
+    "author_id",
+    "author",
+    "author_link",
+    "avatar",
+    "created_time",
+    "content",
+    "image_url",
+    "hashtag",
+    "video",
+    "source_id",
+    "link_share",
+    "feedback_id",      # 👈 thêm
+)
+_MERGE_COUNT_FIELDS = ("like", "haha", "wow", "sad", "love", "angry", "care", "comment", "share")
+
+_MERGE_NZ_IDX = tuple(_ROW_FIELDS.index(k) for k in _MERGE_NZ_FIELDS)
+_MERGE_COUNT_IDX = tuple(_ROW_FIELDS.index(k) for k in _MERGE_COUNT_FIELDS)
+_IS_SHARE_IDX = _ROW_FIELDS.index("is_share")
+_TYPE_SHARE_IDX = _ROW_FIELDS.index("type_share")
+
+def _merge_comment_vals(prev: list, new: list) -> list:
+    """merge_comment_row cho row dạng list (_comment_vals)."""
+    for i in _MERGE_NZ_IDX:
+        prev[i] = _nz(prev[i], new[i])
+    for i in _MERGE_COUNT_IDX:
+        prev[i] = _merge_counts(prev[i], new[i])
+    prev[_IS_SHARE_IDX] = prev[_IS_SHARE_IDX] or new[_IS_SHARE_IDX]
+    prev[_TYPE_SHARE_IDX] = prev[_TYPE_SHARE_IDX] or new[_TYPE_SHARE_IDX]
+    return prev
+
+def merge_comment_row(prev: dict, row_new: dict) -> dict:
+    """Gộp row_new vào prev (cùng comment): ưu tiên giá trị khác rỗng, counter lấy max."""
+    for k in _MERGE_NZ_FIELDS:
+        prev[k] = _nz(prev.get(k), row_new.get(k))
+    for k in _MERGE_COUNT_FIELDS:
+        prev[k] = _merge_counts(prev.get(k), row_new.get(k))
+    # fixed flags
+    prev["is_share"] = prev.get("is_share", False) or row_new.get("is_share", False)
+    prev["type_share"] = prev.get("type_share") or row_new.get("type_share")
+    return prev
+
 def extract_full_posts_from_resptext(resp_text: str):
     try:
-        obj = json.loads(resp_text)
+        obj = loads(resp_text)
     except Exception:
         return [], None, None, None
 
+    rows, end_cursor, total = _rows_from_payload(obj)
+    return rows, end_cursor, total, obj
+
+def parse_comment_page(resp_text: str):
+    """
+    1 trang comment → (rows, end_cursor, total, reply_token_map, parse_err) với đúng 1 lần decode:
+      - body JSON sạch → loads 1 lần
+      - lỗi (XSSI / nhiều JSON dính nhau) → strip + tách block 1 lần, chọn block như clean_fb_resp_text
+        (pick_fb_resp_block trả luôn obj đã parse); parse_err = exception của lần loads đầu
+    reply_token_map như collect_reply_tokens_from_json, rows/end_cursor/total như extract_full_posts_from_resptext.
+    """
+    parse_err = None
+    try:
+        obj = loads(resp_text)
+    except Exception as e:
+        parse_err = e
+        s = _strip_xssi_globally(resp_text)
+        spans = _split_top_level_json_spans(s)
+        if len(spans) > 1:
+            obj = pick_fb_resp_block(s, spans)[1]
+        else:
+            obj = loads(s)
+
+    reply_token_map = {}
+    collect_reply_tokens_from_json(obj, reply_token_map)
+    rows, end_cursor, total = _rows_from_payload(obj)
+    return rows, end_cursor, total, reply_token_map, parse_err
+
+def _rows_from_payload(obj):
     payloads = obj if isinstance(obj, list) else [obj]
     end_cursor, has_next, total = None, None, None
     by_id = {}  # id -> row (merged)
@@ -664,52 +765,24 @@ def extract_full_posts_from_resptext(resp_text: str):
             if not cid:
                 continue
 
-            fb = n.get("feedback") or {}
-            row_new = _build_comment_row_from_node(n)
-
-            # breakdown fill
-            bd = _reaction_breakdown_from_top_edges(fb)
-            for k in ("like", "haha", "wow", "sad", "love", "angry", "care"):
-                row_new[k] = int(bd.get(k, 0))
-
-            # merge into by_id
+            # row dạng list (breakdown đã tính trong _comment_vals), dict hoá 1 lần ở cuối
+            vals = _comment_vals(n)
             prev = by_id.get(cid)
-            if not prev:
-                by_id[cid] = row_new
+            if prev is None:
+                by_id[cid] = vals
             else:
-                # prefer non-empty values; counts take max
-                for k in (
-                    "link",
-                    "author_id",
-                    "author",
-                    "author_link",
-                    "avatar",
-                    "created_time",
-                    "content",
-                    "image_url",
-                    "hashtag",
-                    "video",
-                    "source_id",
-                    "link_share",
-                    "feedback_id",      # 👈 thêm
-
-                ):
-                    prev[k] = _nz(prev.get(k), row_new.get(k))
-                for k in ("like", "haha", "wow", "sad", "love", "angry", "care", "comment", "share"):
-                    prev[k] = _merge_counts(prev.get(k), row_new.get(k))
-                # fixed flags
-                prev["is_share"] = prev.get("is_share", False) or row_new.get("is_share", False)
-                prev["type_share"] = prev.get("type_share") or row_new.get("type_share")
-
-    rows = list(by_id.values())
-    return rows, end_cursor, total, obj
+                _merge_comment_vals(prev, vals)
+
+    rows = [dict(zip(_ROW_FIELDS, v)) for v in by_id.values()]
+    return rows, end_cursor, total
+
 def extract_replies_from_depth1_resp(resp_text, parent_comment_id=None):
     """
     Parser siêu chịu đựng cho reply depth-1.
     Giờ sẽ cố build luôn thành row giống comment cha (nếu payload đủ).
     """
     try:
-        obj = json.loads(resp_text)
+        obj = loads(resp_text)
     except Exception:
         return [], None
 
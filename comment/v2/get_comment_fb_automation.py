@@ -1,9 +1,13 @@
-import json, time, urllib.parse, subprocess, re, socket
+import time, urllib.parse, subprocess, re, socket
 from typing import List, Dict, Any, Optional
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 
+from configs import CURSOR_KEYS, TRIM_DROP_KEYS, TRIM_GUARD_KEYS, TRIM_GUARD_TYPES, TRIM_RESPONSES
+from extract_comment_utils import EXTRACT_KEEP_KEYS, EXTRACT_KEYS
+from json_utils import dumps, loads
+
 def _wait_port(host: str, port: int, timeout: float = 15.0, poll: float = 0.1) -> bool:
     """Return True if (host,port) becomes connectable within timeout."""
     end = time.time() + timeout
@@ -278,7 +282,7 @@ def match_comment_req(rec):
     if "variables=" in body:
         try:
             v = parse_form(body).get("variables","")
-            vj = json.loads(urllib.parse.unquote_plus(v))
+            vj = loads(urllib.parse.unquote_plus(v))
             keys = set(vj.keys())
             signs = {"commentable_object_id","commentsAfterCursor","feedLocation","focusCommentID","feedbackSource"}
             if keys & signs: return True
@@ -315,7 +319,7 @@ def extract_comment_texts(obj, out):
 def extract_comments_from_resptext(resp_text):
     texts = []
     try:
-        obj = json.loads(resp_text)
+        obj = loads(resp_text)
     except:
         return texts, None, None, None
     extract_comment_texts(obj, texts)
@@ -385,7 +389,7 @@ def _is_comments_gql(req: dict) -> bool:
     # Dựa vào variables thay vì friendly_name (chắc cú hơn)
     vars_str = urllib.parse.unquote_plus(form.get("variables","") or "")
     try:
-        vars_obj = json.loads(vars_str) if vars_str else {}
+        vars_obj = loads(vars_str) if vars_str else {}
     except Exception:
         vars_obj = {}
 
@@ -420,28 +424,199 @@ def wait_first_comment_request(driver, baseline, timeout=12, poll=0.2):
     raise TimeoutError("Không thấy request comments sau khi set sort/click")
 
 
+# =========================
+# Cắt response trong page (trước khi qua WebDriver)
+# =========================
+# Bỏ các key nặng mà extractor không đọc (TRIM_DROP_KEYS: manifest video, tracking...).
+# Subtree sắp bỏ mà chứa key/node extractor có đọc (TRIM_GUARD_*), hoặc body không
+# parse/serialize lại y hệt được (key số, int > 2^53) → trả nguyên body.
+_TRIM_JS = r"""
+function __trimBody(text, spec) {
+  const drop = new Set(spec.drop), guard = new Set(spec.guard), types = new Set(spec.types);
+  const whole = new Set(spec.keep || []);  // subtree extractor chép nguyên vào row → không cắt bên trong
+  const enc = new TextEncoder();
+  const full = enc.encode(text).length;
+  const keep = (why) => ({text, full, kept: full, fallback: why});
+  const s = text.replace(/^\s*(?:for\s*\(\s*;\s*;\s*\)\s*;\s*)?(?:\)\]\}'\s*)?/, "");
+  const docs = [];
+  try { docs.push(JSON.parse(s)); }
+  catch (e) {
+    for (const line of s.split(/\r?\n/)) {
+      const t = line.trim();
+      if (!t) continue;
+      try { docs.push(JSON.parse(t)); } catch (e2) { return keep("parse"); }
+    }
+  }
+  if (!docs.length) return keep("empty");
+
+  const guarded = (o) => {
+    if (Array.isArray(o)) return o.some(guarded);
+    if (!o || typeof o !== "object") return false;
+    if (types.has(o.__typename)) return true;
+    for (const [k, v] of Object.entries(o)) if (guard.has(k) || guarded(v)) return true;
+    return false;
+  };
+  let bad = null;
+  const prune = (o) => {
+    if (bad) return;
+    if (typeof o === "number") {
+      if (Number.isInteger(o) && !Number.isSafeInteger(o)) bad = "bigint";
+      return;
+    }
+    if (Array.isArray(o)) { for (const v of o) prune(v); return; }
+    if (!o || typeof o !== "object") return;
+    for (const k of Object.keys(o)) {
+      if (/^(?:0|[1-9]\d*)$/.test(k)) { bad = "intkey"; return; }  // JS đổi thứ tự key số
+      if (drop.has(k)) {
+        if (guarded(o[k])) { bad = "guard:" + k; return; }
+        delete o[k];
+      } else if (!whole.has(k)) {
+        prune(o[k]);
+      }
+    }
+  };
+  for (const d of docs) prune(d);
+  if (bad) return keep(bad);
+  const out = docs.map(d => JSON.stringify(d)).join("\n");
+  return {text: out, full, kept: enc.encode(out).length, fallback: null};
+}
+"""
+
+# guard dựng từ chính các bộ key của extractor (extract_comment_utils) + cursor, không giữ tay 1 danh sách riêng
+_TRIM_GUARD = sorted(set(TRIM_GUARD_KEYS) | set(CURSOR_KEYS) | EXTRACT_KEYS)
+
+def _trim_spec(trim):
+    if not trim:
+        return None
+    return {"drop": sorted(TRIM_DROP_KEYS), "guard": _TRIM_GUARD, "types": sorted(TRIM_GUARD_TYPES),
+            "keep": sorted(EXTRACT_KEEP_KEYS)}
+
+def _report_trim(info, tag=""):
+    if not info:
+        return
+    full, kept = info.get("full") or 0, info.get("kept") or 0
+    if info.get("fallback"):
+        print(f"[TRIM]{tag} giữ nguyên {full/1024:.0f}KB ({info['fallback']})")
+    else:
+        print(f"[TRIM]{tag} {full/1024:.0f}KB → {kept/1024:.0f}KB (-{(full-kept)/1024:.0f}KB, {100*(full-kept)/max(full,1):.0f}%)")
+
 # =========================
 # Replay GraphQL inside the page (keeps auth/cookies)
 # =========================
-def graphql_post_in_page(driver, url: str, form_params: dict, override_vars: dict):
+def graphql_post_in_page(driver, url: str, form_params: dict, override_vars: dict, trim: bool = TRIM_RESPONSES):
+    """trim=True: cắt manifest video/tracking ngay trong page trước khi trả body (xem _TRIM_JS)."""
     fp = dict(form_params)
-    fp["variables"] = json.dumps(override_vars, separators=(',',':'), ensure_ascii=False)
+    fp["variables"] = dumps(override_vars)
     body = urllib.parse.urlencode(fp)
-    js = r"""
-    const url = arguments[0], body = arguments[1], cb = arguments[2];
+    js = _TRIM_JS + r"""
+    const url = arguments[0], body = arguments[1], spec = arguments[2], cb = arguments[arguments.length - 1];
     fetch(url, {
       method:'POST', credentials:'include',
       headers:{'content-type':'application/x-www-form-urlencoded'},
       body
-    }).then(r=>r.text()).then(t=>cb({ok:true,text:t}))
-      .catch(e=>cb({ok:false,err:String(e)}));
+    }).then(r=>r.text()).then(t=>{
+      if (!spec) return cb({ok:true,text:t});
+      const x = __trimBody(t, spec);
+      cb({ok:true,text:x.text,trim:{full:x.full,kept:x.kept,fallback:x.fallback}});
+    }).catch(e=>cb({ok:false,err:String(e)}));
     """
     driver.set_script_timeout(120)
-    ret = driver.execute_async_script(js, url, body)
+    ret = driver.execute_async_script(js, url, body, _trim_spec(trim))
     if not ret or not ret.get("ok"):
         raise RuntimeError("Replay GraphQL failed: %s" % (ret and ret.get('err')))
+    _report_trim(ret.get("trim"))
     return ret["text"]
 
+_POOL_JS = r"""
+const url = arguments[0], jobs = arguments[1], spec = arguments[2], waitMs = arguments[3], fetchMs = arguments[4];
+const cb = arguments[arguments.length - 1];
+const P = window.__gqlPool || (window.__gqlPool = {inflight: new Map(), done: []});
+for (const [id, body] of jobs) {
+  // fetch treo → abort sau fetchMs, settle thành {ok:false, err:"timeout"} (không giữ slot mãi)
+  const ac = new AbortController();
+  const timer = setTimeout(() => ac.abort(), fetchMs);
+  const p = fetch(url, {
+    method:'POST', credentials:'include',
+    headers:{'content-type':'application/x-www-form-urlencoded'},
+    body, signal: ac.signal
+  }).then(r => r.text()).then(t => {
+    if (!spec) return {id, ok:true, text:t};
+    const x = __trimBody(t, spec);
+    return {id, ok:true, text:x.text, trim:{full:x.full, kept:x.kept, fallback:x.fallback}};
+  }).catch(e => ({id, ok:false, err: ac.signal.aborted ? "timeout" : String(e)}))
+    .then(res => { clearTimeout(timer); P.inflight.delete(id); P.done.push(res); });
+  P.inflight.set(id, p);
+}
+const flush = () => { const out = P.done; P.done = []; cb({out, inflight: P.inflight.size}); };
+if (P.done.length || !P.inflight.size) { flush(); }
+else { Promise.race([...P.inflight.values(), new Promise(r => setTimeout(r, waitMs))]).then(flush); }
+"""
+
+def graphql_pool_pump(driver, url: str, form_params: dict, jobs, wait_ms: int = 20000,
+                      fetch_timeout_ms: int = 60000, trim: bool = TRIM_RESPONSES):
+    """
+    Pool fetch trong page (window.__gqlPool): bắn các request mới rồi chờ tới khi có ít nhất 1 request
+    (mới hoặc cũ) xong / hết wait_ms. jobs: [(job_id, override_vars)]; job_id phải duy nhất trong cả phiên page.
+    Mỗi fetch quá fetch_timeout_ms bị abort → {"ok": False, "err": "timeout"}.
+    Trả (results, inflight): results = [{"id", "ok", "text" | "err"}] đã xong, inflight = số request còn chạy trong page.
+    """
+    payload = []
+    for jid, override_vars in jobs:
+        fp = dict(form_params)
+        fp["variables"] = dumps(override_vars)
+        payload.append([jid, urllib.parse.urlencode(fp)])
+    driver.set_script_timeout(max(120, wait_ms // 1000 + 30))
+    ret = driver.execute_async_script(_TRIM_JS + _POOL_JS, url, payload, _trim_spec(trim), int(wait_ms),
+                                      int(fetch_timeout_ms)) or {}
+    out = ret.get("out") or []
+    for r in out:
+        _report_trim(r.get("trim"))
+    return out, int(ret.get("inflight") or 0)
+
+_BATCH_JS = r"""
+const url = arguments[0], bodies = arguments[1], spec = arguments[2], fetchMs = arguments[3];
+const cb = arguments[arguments.length - 1];
+const isJson = (t) => { try { JSON.parse(t); return true; } catch (e) { return false; } };
+Promise.all(bodies.map(body => {
+  // như _POOL_JS: 1 fetch treo bị abort sau fetchMs → {ok:false, err:"timeout"}, không giữ cả Promise.all
+  const ac = new AbortController();
+  const timer = setTimeout(() => ac.abort(), fetchMs);
+  return fetch(url, {
+    method:'POST', credentials:'include',
+    headers:{'content-type':'application/x-www-form-urlencoded'},
+    body, signal: ac.signal
+  }).then(r => r.text()).then(t => {
+    if (!spec) return {ok:true, text:t, json:isJson(t)};
+    const x = __trimBody(t, spec);
+    return {ok:true, text:x.text, json:isJson(x.text), trim:{full:x.full, kept:x.kept, fallback:x.fallback}};
+  }).catch(e => ({ok:false, err: ac.signal.aborted ? "timeout" : String(e)}))
+    .finally(() => clearTimeout(timer));
+})).then(cb);
+"""
+
+def graphql_batch_in_page(driver, url: str, form_params: dict, vars_list, fetch_timeout_ms: int = 60000,
+                          trim: bool = TRIM_RESPONSES):
+    """
+    Bắn len(vars_list) request cùng form trong 1 lần execute_async_script (Promise.all), trả list
+    cùng thứ tự: {"ok", "text", "json"} | {"ok": False, "err"}. "json" = body JSON.parse được
+    ngay trong page → bên Python khỏi loads thử lần nữa.
+    Mỗi fetch quá fetch_timeout_ms bị abort → {"ok": False, "err": "timeout"}.
+    """
+    bodies = []
+    for override_vars in vars_list:
+        fp = dict(form_params)
+        fp["variables"] = dumps(override_vars)
+        bodies.append(urllib.parse.urlencode(fp))
+    if not bodies:
+        return []
+    driver.set_script_timeout(max(120, fetch_timeout_ms // 1000 + 30))
+    ret = driver.execute_async_script(_TRIM_JS + _BATCH_JS, url, bodies, _trim_spec(trim), int(fetch_timeout_ms))
+    if not isinstance(ret, list) or len(ret) != len(bodies):
+        raise RuntimeError("Batch GraphQL failed: %r" % (ret if not isinstance(ret, list) else len(ret)))
+    for r in ret:
+        _report_trim(r.get("trim"))
+    return ret
+
 def pick_reply_template_from_page(driver):
     """
     Lấy cái request GraphQL dùng để load REPLIES (Depth1).
@@ -455,7 +630,7 @@ def pick_reply_template_from_page(driver):
         friendly = form.get("fb_api_req_friendly_name", "") or ""
         vars_str = urllib.parse.unquote_plus(form.get("variables","") or "")
         try:
-            vars_obj = json.loads(vars_str) if vars_str else {}
+            vars_obj = loads(vars_str) if vars_str else {}
         except Exception:
             vars_obj = {}
 
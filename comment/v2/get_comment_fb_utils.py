@@ -7,9 +7,14 @@ from selenium.common.exceptions import (
 )
 from selenium.common.exceptions import NoSuchElementException
 
-import time, os, json, urllib, re
-
-from configs import CURSOR_KEYS
+import time, os, urllib, re
+
+from configs import (CURSOR_KEYS, NDJSON_FLUSH_BYTES, NDJSON_FLUSH_INTERVAL, RAW_ARCHIVE, RAW_ARCHIVE_LEVEL,
+                     RAW_ARCHIVE_PACK_BYTES, RAW_ARCHIVE_SAMPLE_EVERY, RAW_DUMPS_DIR, ZSTD_LEVEL, ZSTD_SEGMENT_BYTES)
+from json_utils import JSONDecodeError, load, loads, raw_decode
+from shared.ndjson import (_ZST_SUFFIX, NdjsonWriter, close_ndjson_writers, flush_ndjson_writers,
+                           iter_ndjson, ndjson_writer as _ndjson_writer)
+from shared.raw_archive import RawArchive
 def _iter_all_dicts(o):
     if isinstance(o, dict):
         yield o
@@ -325,25 +330,23 @@ def append_ndjson_texts(out_path: str, texts, page_no: int, cursor_val: str | No
     """
     if not texts:
         return 0
-    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
-    wrote = 0
-    with open(out_path, "a", encoding="utf-8") as f:
-        for i, t in enumerate(texts):
-            # Nếu batch_texts là chuỗi thuần:
-            if isinstance(t, str):
-                obj = {"text": t, "page": page_no, "idx": i}
-            else:
-                # Phòng khi sau này bạn đổi parser trả dict (text, author,...)
-                obj = dict(t)
-                obj.setdefault("page", page_no)
-                obj.setdefault("idx", i)
-                if "text" not in obj and "body" in obj:
-                    obj["text"] = obj.get("body")
-            if cursor_val:
-                obj["cursor"] = cursor_val
-            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-            wrote += 1
-    return wrote
+    rows = []
+    for i, t in enumerate(texts):
+        # Nếu batch_texts là chuỗi thuần:
+        if isinstance(t, str):
+            obj = {"text": t, "page": page_no, "idx": i}
+        else:
+            # Phòng khi sau này bạn đổi parser trả dict (text, author,...)
+            obj = dict(t)
+            obj.setdefault("page", page_no)
+            obj.setdefault("idx", i)
+            if "text" not in obj and "body" in obj:
+                obj["text"] = obj.get("body")
+        if cursor_val:
+            obj["cursor"] = cursor_val
+        rows.append(obj)
+    ndjson_writer(out_path).write_many(rows)
+    return len(rows)
 def open_reel_comments_if_present(driver, wait_after=0.6, timeout=6.0):
     """
     Mở panel bình luận cho Reel nếu có.
@@ -504,11 +507,13 @@ def parse_form(body_str: str):
 def load_checkpoint(path="checkpoint_comments.json"):
     if os.path.exists(path):
         try:
-            return json.load(open(path,"r",encoding="utf-8"))
+            with open(path,"r",encoding="utf-8") as f:
+                return load(f)
         except: return {}
     return {}
 
 def save_checkpoint(data: dict, path="checkpoint_comments.json"):
+    flush_ndjson_writers(durable=True)  # comment đã ghi phải nằm trên đĩa trước cursor mới
     tmp = path + ".tmp"
     # with open(tmp,"w",encoding="utf-8") as f:
     #     json.dump(data, f, ensure_ascii=False, indent=2)
@@ -529,13 +534,12 @@ def match_comment_req(rec: dict):
     if "variables=" in body:
         try:
             v = parse_form(body).get("variables","")
-            vj = json.loads(urllib.parse.unquote_plus(v))
+            vj = loads(urllib.parse.unquote_plus(v))
             keys = set(vj.keys())
             signs = {"commentable_object_id","commentsAfterCursor","feedLocation","focusCommentID","feedbackSource","after","afterCursor"}
             if keys & signs: return True
         except: pass
     return False
-import json, re
 
 CURSOR_KEYS = {
     "end_cursor", "endCursor",
@@ -549,14 +553,16 @@ def _strip_xssi_globally(s: str) -> str:
     s = s.replace(")]}',", "")
     return s.strip()
 
-def _split_top_level_json_objects(s: str) -> list[str]:
+def _scan_top_level_json(s: str, pos: int = 0) -> list[str]:
+    """Quét từng ký tự từ `pos`: các block {...} / [...] ở depth 0 (bỏ qua chuỗi, không validate JSON)."""
     out = []
     start = None
     depth = 0
     in_str = False
     esc = False
 
-    for i, ch in enumerate(s):
+    for i in range(pos, len(s)):
+        ch = s[i]
         if in_str:
             if esc:
                 esc = False
@@ -581,7 +587,50 @@ def _split_top_level_json_objects(s: str) -> list[str]:
                     if depth == 0 and start is not None:
                         out.append(s[start:i+1].strip())
                         start = None
-    return out if out else [s.strip()]
+    return out
+
+_NON_WS_RE = re.compile(r"\S")
+
+def _split_top_level_json_spans(s: str) -> list[tuple]:
+    """
+    Như _scan_top_level_json nhưng trả [(block, obj)] và không duyệt từng ký tự trong Python:
+      1) mỗi dòng là 1 document (FB trả multi-doc theo dòng) → loads từng dòng
+      2) không thì raw_decode theo offset (như iter_json_spans bên post)
+      3) gặp đoạn không decode được → quét từng ký tự phần còn lại, obj=None (chưa parse)
+    """
+    lines = [ln.strip() for ln in s.split("\n")]
+    lines = [ln for ln in lines if ln]
+    if lines and all(ln[0] in "{[" for ln in lines):
+        try:
+            return [(ln, loads(ln)) for ln in lines]
+        except ValueError:
+            pass
+
+    out, i, n = [], 0, len(s)
+    while i < n:
+        m = _NON_WS_RE.search(s, i)
+        if not m:
+            break
+        j = m.start()
+        if s[j] in "{[":
+            try:
+                obj, k = raw_decode(s, j)
+                out.append((s[j:k], obj))
+                i = k
+                continue
+            except JSONDecodeError:
+                pass
+        out.extend((p, None) for p in _scan_top_level_json(s, j))
+        break
+    return out
+
+def _split_top_level_json_objects(s: str) -> list[str]:
+    spans = _split_top_level_json_spans(s)
+    return [p for p, _ in spans] if spans else [s.strip()]
+
+# key cursor có giá trị "có nghĩa" (khác null / "" / false) — đọc thẳng trên text block, khỏi walk cây
+_CURSOR_VAL_RE = re.compile(r'"(?:%s)"\s*:(?!\s*(?:null\b|""|false\b))' % "|".join(map(re.escape, sorted(CURSOR_KEYS))))
+_PAGE_INFO_KEY_RE = re.compile(r'"page_info"\s*:')
 
 def _score_cursor_in_json(obj, depth=0):
     """
@@ -630,65 +679,124 @@ def clean_fb_resp_text(resp_text: str) -> str:
     """
     if not resp_text:
         return ""
+    return pick_fb_resp_block(_strip_xssi_globally(resp_text))[0]
 
-    s = _strip_xssi_globally(resp_text)
-
+def pick_fb_resp_block(s: str, spans=None):
+    """
+    Lõi của clean_fb_resp_text: `s` đã strip XSSI, `spans` = _split_top_level_json_spans(s) nếu đã có.
+    Trả (block, obj) — obj là block đã parse sẵn, khỏi loads lại.
+    """
     s_l = s.lstrip()
     if s_l.startswith("<!DOCTYPE html") or s_l.startswith("<html"):
         raise ValueError("Got HTML instead of JSON (maybe login expired)")
 
-    parts = _split_top_level_json_objects(s)
+    if spans is None:
+        spans = _split_top_level_json_spans(s)
 
     parsed = []
-    for p in parts:
-        try:
-            obj = json.loads(p)
-            parsed.append((p, obj))
-        except json.JSONDecodeError:
-            continue
+    for p, obj in spans:
+        if obj is None:
+            try:
+                obj = loads(p)
+            except JSONDecodeError:
+                continue
+        parsed.append((p, obj))
 
     if not parsed:
         # last chance: thử parse nguyên chuỗi
-        json.loads(s)
-        return s
-
-    # Chấm điểm cursor cho từng block
-    best_p = None
-    best_score = -1
-    any_has = False
-
-    for p, obj in parsed:
-        score, has_any = _score_cursor_in_json(obj)
-        if has_any:
-            any_has = True
-        if score > best_score:
-            best_score = score
-            best_p = p
-
-    if any_has:
-        return best_p.strip()
+        return s, loads(s)
+
+    # Chấm điểm cursor cho từng block. Block không có cursor "có nghĩa" (regex trên text) thì
+    # điểm chỉ còn bonus page_info (3 / dict) → đếm trên text; chỉ walk block có cursor khi cần so điểm.
+    hits = [_CURSOR_VAL_RE.search(p) is not None for p, _ in parsed]
+    if any(hits):
+        cand = [i for i, h in enumerate(hits) if h]
+        bonus = [0 if h else 3 * len(_PAGE_INFO_KEY_RE.findall(p)) for h, (p, _) in zip(hits, parsed)]
+        if len(cand) == 1 and max(bonus) < 10:
+            # block duy nhất có cursor: điểm ≥ 10 > mọi block còn lại
+            p, obj = parsed[cand[0]]
+            return p.strip(), obj
+        best_p = best_obj = None
+        best_score = -1
+        for h, b, (p, obj) in zip(hits, bonus, parsed):
+            score = _score_cursor_in_json(obj)[0] if h else b
+            if score > best_score:
+                best_score = score
+                best_p, best_obj = p, obj
+        return best_p.strip(), best_obj
 
     # Không block nào có cursor → fallback: block hợp lệ dài nhất
     best_len = -1
-    best_p2 = None
-    for p, _ in parsed:
+    best_p2 = best_obj2 = None
+    for p, obj in parsed:
         if len(p) > best_len:
             best_len = len(p)
-            best_p2 = p
-    return best_p2.strip()
+            best_p2, best_obj2 = p, obj
+    return best_p2.strip(), best_obj2
+
 
 
+# =========================
+# NDJSON writer / reader — bản dùng chung ở shared/ndjson.py (path .ndjson.zst → segment zstd),
+# ở đây chỉ gắn NDJSON_FLUSH_* / ZSTD_* của comment
+# =========================
+def ndjson_writer(path) -> NdjsonWriter:
+    kw = {"flush_bytes": NDJSON_FLUSH_BYTES, "flush_interval": NDJSON_FLUSH_INTERVAL}
+    if str(path).endswith(_ZST_SUFFIX):
+        kw.update(segment_bytes=ZSTD_SEGMENT_BYTES, level=ZSTD_LEVEL)
+    return _ndjson_writer(path, **kw)
 
 def append_ndjson_line(path, obj):
-    os.makedirs(os.path.dirname(path), exist_ok=True) if os.path.dirname(path) else None
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-        
+    ndjson_writer(path).write(obj)
+
+# =========================
+# Raw archive — bản dùng chung ở shared/raw_archive.py, ở đây gắn RAW_* của comment
+# =========================
+_RAW_ARCHIVE = None
+
+def raw_archive(mode=None) -> RawArchive:
+    """Archive dùng chung của process; mode chỉ có tác dụng ở lần gọi đầu."""
+    global _RAW_ARCHIVE
+    if _RAW_ARCHIVE is None:
+        _RAW_ARCHIVE = RawArchive(RAW_DUMPS_DIR, mode=mode or RAW_ARCHIVE, sample_every=RAW_ARCHIVE_SAMPLE_EVERY,
+                                  pack_bytes=RAW_ARCHIVE_PACK_BYTES, level=RAW_ARCHIVE_LEVEL)
+    return _RAW_ARCHIVE
+
+
 def choose_first_key(candidates):
     for k in candidates:
         return k  # lấy key đầu (đã sắp xếp theo ưu tiên)
     return None
 
+def _collect_tokens_dict(obj, out_map):
+    # dạng mà ông dán:
+    # node -> feedback -> expansion_info -> expansion_token
+    if obj.get("__typename") == "Comment" and "feedback" in obj:
+        cmt_id = obj.get("id")
+        fb = obj.get("feedback") or {}
+        fb_id = fb.get("id")
+        exp = (fb.get("expansion_info") or {}).get("expansion_token")
+        if cmt_id and fb_id and exp:
+            out_map[cmt_id] = {
+                "token": exp,
+                "feedback_id": fb_id,
+            }
+    # chỉ gọi đệ quy cho dict/list — bỏ qua lá ngay tại đây
+    for v in obj.values():
+        t = type(v)
+        if t is dict:
+            _collect_tokens_dict(v, out_map)
+        elif t is list:
+            _collect_tokens_list(v, out_map)
+
+def _collect_tokens_list(arr, out_map):
+    for v in arr:
+        t = type(v)
+        if t is dict:
+            _collect_tokens_dict(v, out_map)
+        elif t is list:
+            _collect_tokens_list(v, out_map)
+
 def collect_reply_tokens_from_json(json_resp, out_map):
     """
     Đi qua tree JSON, gom:
@@ -699,28 +807,8 @@ def collect_reply_tokens_from_json(json_resp, out_map):
     """
     if not isinstance(json_resp, dict):
         return
+    _collect_tokens_dict(json_resp, out_map)
 
-    def walk(obj):
-        if isinstance(obj, dict):
-            # dạng mà ông dán:
-            # node -> feedback -> expansion_info -> expansion_token
-            if obj.get("__typename") == "Comment" and "feedback" in obj:
-                cmt_id = obj.get("id")
-                fb = obj.get("feedback") or {}
-                fb_id = fb.get("id")
-                exp = (fb.get("expansion_info") or {}).get("expansion_token")
-                if cmt_id and fb_id and exp:
-                    out_map[cmt_id] = {
-                        "token": exp,
-                        "feedback_id": fb_id,
-                    }
-            for v in obj.values():
-                walk(v)
-        elif isinstance(obj, list):
-            for v in obj:
-                walk(v)
-
-    walk(json_resp)
 def _normalize_id(item: dict) -> str | None:
     print(item)
     cid = item.get("id") or item.get("id")
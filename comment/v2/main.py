@@ -1,22 +1,24 @@
 from collections import deque
-import json, time, urllib.parse, os, hashlib
-from extract_comment_utils import extract_full_posts_from_resptext, extract_replies_from_depth1_resp
+import itertools, time, urllib.parse, hashlib
+from extract_comment_utils import extract_replies_from_depth1_resp, parse_comment_page
 from configs import *
+from json_utils import dumps, loads
 from get_comment_fb_utils import (
-                                 _split_top_level_json_objects,
-                                 _strip_xssi_globally,
                                  append_ndjson_line,
                                  clean_fb_resp_text,
-                                 collect_reply_tokens_from_json,
                                  detect_cursor_key,
+                                 flush_ndjson_writers,
                                  load_checkpoint,
                                  open_reel_comments_if_present,
+                                 raw_archive,
                                  save_checkpoint,
                                  set_sort_to_all_comments_unified,
                                  strip_cursors_from_vars
                                  )
 from get_comment_fb_automation import (
                                  click_view_more_if_any,
+                                 graphql_batch_in_page,
+                                 graphql_pool_pump,
                                  graphql_post_in_page,
                                  parse_form,
                                  pick_reply_template_from_page,
@@ -26,9 +28,61 @@ from get_comment_fb_automation import (
                                  hook_graphql,
                                  wait_first_comment_request)
 from startdriverproxy import bootstrap_auth, start_driver_with_proxy
-os.makedirs("raw_dumps", exist_ok=True)
 
 REPLY_DOC_ID = "25396268633304296"  # từ payload của ông
+_POOL_IDS = itertools.count(1)  # job id cho graphql_pool_pump
+
+def _reply_form(form):
+    reply_form = dict(form)
+    reply_form["doc_id"] = REPLY_DOC_ID
+    reply_form["fb_api_req_friendly_name"] = "Depth1CommentsListPaginationQuery"
+    return reply_form
+
+def _reply_vars(base_reply_vars, parent_id, token):
+    use_vars = dict(base_reply_vars)
+    # dọn field comment-level
+    use_vars.pop("commentsAfterCount", None)
+    use_vars.pop("commentsAfterCursor", None)
+    use_vars.pop("commentsBeforeCount", None)
+    use_vars.pop("commentsBeforeCursor", None)
+
+    # query theo FEEDBACK ID
+    use_vars["id"] = parent_id
+    use_vars["repliesAfterCount"] = 20
+    if token:
+        use_vars["expansionToken"] = token
+    return use_vars
+
+def _write_reply_page(resp_text, parent_id, pages, out_json, extract_fn, clean_fn, is_json=None):
+    """Bóc 1 trang replies của parent, ghi từng row. Trả next_token.
+    is_json: page đã biết body parse được hay chưa (None → tự loads thử)."""
+    if is_json is None:
+        try:
+            loads(resp_text)
+            is_json = True
+        except Exception:
+            is_json = False
+    if not is_json:
+        resp_text = clean_fn(resp_text)
+
+    # 👇 Lúc này replies là list "full rows"
+    replies, next_token = extract_fn(resp_text, parent_id)
+
+    new_cnt = 0
+    for r in replies:
+        # r đã là dạng comment-row rồi → chỉ thêm metadata để phân biệt reply
+        rec = {
+            **r,
+            "is_reply": True,
+            "parent_id": parent_id,
+            "page": pages,
+            "ts": time.time(),
+        }
+        append_ndjson_line(out_json, rec)
+        new_cnt += 1
+
+    print(f"[V2-REPLIES] parent={parent_id[:12]}… page {pages}: +{new_cnt}/{len(replies)}")
+    return next_token
 
 def crawl_replies_for_parent_expansion(
     driver,
@@ -44,54 +98,18 @@ def crawl_replies_for_parent_expansion(
 ):
     pages = 0
     current_token = parent_token
-
-    reply_form = dict(form)
-    reply_form["doc_id"] = REPLY_DOC_ID
-    reply_form["fb_api_req_friendly_name"] = "Depth1CommentsListPaginationQuery"
+    reply_form = _reply_form(form)
 
     while True:
         pages += 1
         if max_reply_pages and pages > max_reply_pages:
             break
 
-        use_vars = dict(base_reply_vars)
-        # dọn field comment-level
-        use_vars.pop("commentsAfterCount", None)
-        use_vars.pop("commentsAfterCursor", None)
-        use_vars.pop("commentsBeforeCount", None)
-        use_vars.pop("commentsBeforeCursor", None)
-
-        # query theo FEEDBACK ID
-        use_vars["id"] = parent_id
-        use_vars["repliesAfterCount"] = 20
-        if current_token:
-            use_vars["expansionToken"] = current_token
-
+        use_vars = _reply_vars(base_reply_vars, parent_id, current_token)
         raw_ret = graphql_post_in_page(driver, url, reply_form, use_vars)
         resp_text = raw_ret.get("text") if isinstance(raw_ret, dict) else raw_ret
 
-        try:
-            json.loads(resp_text)
-        except Exception:
-            resp_text = clean_fn(resp_text)
-
-        # 👇 Lúc này replies là list "full rows"
-        replies, next_token = extract_fn(resp_text, parent_id)
-
-        new_cnt = 0
-        for r in replies:
-            # r đã là dạng comment-row rồi → chỉ thêm metadata để phân biệt reply
-            rec = {
-                **r,
-                "is_reply": True,
-                "parent_id": parent_id,
-                "page": pages,
-                "ts": time.time(),
-            }
-            append_ndjson_line(out_json, rec)
-            new_cnt += 1
-
-        print(f"[V2-REPLIES] parent={parent_id[:12]}… page {pages}: +{new_cnt}/{len(replies)}")
+        next_token = _write_reply_page(resp_text, parent_id, pages, out_json, extract_fn, clean_fn)
 
         if not next_token or next_token == current_token:
             print("[V2-REPLIES] Hết trang replies (no new expansion_token).")
@@ -99,6 +117,165 @@ def crawl_replies_for_parent_expansion(
 
         current_token = next_token
 
+def crawl_replies_concurrent(
+    driver,
+    url,
+    form,
+    base_reply_vars,
+    jobs,
+    out_json,
+    extract_fn,
+    clean_fn,
+    concurrency=REPLY_CONCURRENCY,
+    max_reply_pages=None,
+    max_retries=2,
+    fetch_timeout_ms=60000,
+    max_stall_rounds=10
+):
+    """
+    Như crawl_replies_for_parent_expansion cho cả hàng đợi `jobs` ({"id", "token"}), nhưng giữ tối đa
+    `concurrency` parent đang fetch cùng lúc trong page (graphql_pool_pump). Mỗi trang về là ghi row
+    ngay; parent dừng theo luật cũ (next_token rỗng / không đổi).
+    Trang lỗi / timeout / mất pool (page reload) tính 1 lần thử, quá max_retries thì bỏ parent đó;
+    max_stall_rounds vòng liền không ghi được trang nào → bỏ cả hàng đợi còn lại.
+    """
+    reply_form = _reply_form(form)
+    pending = deque(jobs)
+    ready = deque()   # parent có trang kế (hoặc cần thử lại) → ưu tiên trước parent mới
+    running = {}      # job_id → state
+    stall = 0
+
+    def _retry(st, why):
+        st["tries"] += 1
+        if st["tries"] <= max_retries:
+            print(f"[V2-REPLIES] parent={st['parent'][:12]}… page {st['pages']} lỗi, thử lại "
+                  f"{st['tries']}/{max_retries}: {why}")
+            ready.append(st)
+        else:
+            print(f"[V2-REPLIES] parent={st['parent'][:12]}… page {st['pages']} lỗi: {why} → bỏ (quá {max_retries} lần thử).")
+
+    while pending or ready or running:
+        if stall >= max_stall_rounds:
+            left = len(pending) + len(ready) + len(running)
+            print(f"[V2-REPLIES] {stall} vòng không có trang nào → bỏ {left} parent còn lại.")
+            break
+
+        new = []
+        while len(running) < concurrency and (ready or pending):
+            if ready:
+                st = ready.popleft()
+            else:
+                job = pending.popleft()
+                st = {"parent": job["id"], "token": job.get("token"), "pages": 1, "tries": 0}
+            if max_reply_pages and st["pages"] > max_reply_pages:
+                continue
+            jid = next(_POOL_IDS)  # id duy nhất cả phiên: pool trong page sống qua nhiều lần gọi
+            running[jid] = st
+            new.append((jid, _reply_vars(base_reply_vars, st["parent"], st["token"])))
+
+        results, inflight = graphql_pool_pump(driver, url, reply_form, new, fetch_timeout_ms=fetch_timeout_ms)
+        if not results and not inflight and running:
+            # page đã reload (mất window.__gqlPool) → gửi lại các trang đang chờ, tính 1 lần thử
+            lost = list(running.values())
+            running.clear()
+            for st in lost:
+                _retry(st, "mất pool (page reload?)")
+            stall += 1
+            continue
+
+        progressed = False
+        for res in results:
+            st = running.pop(res["id"], None)
+            if st is None:
+                continue
+            if not res.get("ok"):
+                _retry(st, res.get("err"))
+                continue
+
+            progressed = True
+            next_token = _write_reply_page(res["text"], st["parent"], st["pages"], out_json, extract_fn, clean_fn)
+            if not next_token or next_token == st["token"]:
+                print(f"[V2-REPLIES] parent={st['parent'][:12]}… hết trang replies (no new expansion_token).")
+                continue
+            st.update(token=next_token, pages=st["pages"] + 1, tries=0)
+            ready.append(st)
+        stall = 0 if progressed else stall + 1
+
+def crawl_replies_batched(
+    driver,
+    url,
+    form,
+    base_reply_vars,
+    jobs,
+    out_json,
+    extract_fn,
+    clean_fn,
+    batch_size=REPLY_BATCH_SIZE,
+    max_reply_pages=None,
+    max_retries=2,
+    fetch_timeout_ms=60000
+):
+    """
+    Replies theo đợt: mỗi đợt lấy tối đa `batch_size` cặp (feedback_id, expansion_token) — parent đang
+    dở trước, parent mới sau — và gửi hết trong 1 lần graphql_batch_in_page. Luật dừng mỗi parent như
+    crawl_replies_for_parent_expansion. Trang lỗi / timeout tính 1 lần thử cho parent đó; cả lần gọi
+    bridge lỗi (script timeout, page reload...) tính 1 lần thử cho mọi parent trong đợt. Quá max_retries
+    thì bỏ parent, các parent khác chạy tiếp ở đợt sau.
+    """
+    reply_form = _reply_form(form)
+    pending = deque(jobs)
+    ready = deque()
+    waves = 0
+
+    def _retry(st, why):
+        st["tries"] += 1
+        if st["tries"] <= max_retries:
+            print(f"[V2-REPLIES] parent={st['parent'][:12]}… page {st['pages']} lỗi, thử lại "
+                  f"{st['tries']}/{max_retries}: {why}")
+            ready.append(st)
+        else:
+            print(f"[V2-REPLIES] parent={st['parent'][:12]}… page {st['pages']} lỗi: {why} → bỏ (quá {max_retries} lần thử).")
+
+    while pending or ready:
+        wave = []
+        while len(wave) < batch_size and (ready or pending):
+            if ready:
+                st = ready.popleft()
+            else:
+                job = pending.popleft()
+                st = {"parent": job["id"], "token": job.get("token"), "pages": 1, "tries": 0}
+            if max_reply_pages and st["pages"] > max_reply_pages:
+                continue
+            wave.append(st)
+        if not wave:
+            break
+
+        waves += 1
+        try:
+            results = graphql_batch_in_page(
+                driver, url, reply_form,
+                [_reply_vars(base_reply_vars, st["parent"], st["token"]) for st in wave],
+                fetch_timeout_ms=fetch_timeout_ms)
+        except Exception as e:
+            print(f"[V2-REPLIES] đợt {waves} ({len(wave)} parent) lỗi bridge: {e!r}")
+            for st in wave:
+                _retry(st, "lỗi bridge")
+            continue
+
+        for st, res in zip(wave, results):
+            if not res.get("ok"):
+                _retry(st, res.get("err"))
+                continue
+
+            next_token = _write_reply_page(res["text"], st["parent"], st["pages"], out_json,
+                                           extract_fn, clean_fn, is_json=res.get("json"))
+            if not next_token or next_token == st["token"]:
+                print(f"[V2-REPLIES] parent={st['parent'][:12]}… hết trang replies (no new expansion_token).")
+                continue
+            st.update(token=next_token, pages=st["pages"] + 1, tries=0)
+            ready.append(st)
+    print(f"[V2-REPLIES] {len(jobs)} parent xong trong {waves} đợt batch.")
+
 def crawl_comments(driver, out_json="comments.ndjson", checkpoint_path="checkpoint_comments.json", max_pages=None):
 
     # 1) ensure one lightweight scroll to produce first request
@@ -115,10 +292,11 @@ def crawl_comments(driver, out_json="comments.ndjson", checkpoint_path="checkpoi
 
     url = first_req.get("url")
     form = parse_form(first_req.get("body",""))
+    target_url = driver.current_url
     # variables gốc
     orig_vars_str = urllib.parse.unquote_plus(form.get("variables","") or "")
     try:
-        orig_vars = json.loads(orig_vars_str) if orig_vars_str else {}
+        orig_vars = loads(orig_vars_str) if orig_vars_str else {}
     except Exception:
         orig_vars = {}
 
@@ -176,47 +354,18 @@ def crawl_comments(driver, out_json="comments.ndjson", checkpoint_path="checkpoi
         raw_ret = graphql_post_in_page(driver, url, form, use_vars)
         resp_text = raw_ret.get("text") if isinstance(raw_ret, dict) else raw_ret
 
-        # parse “an toàn”
-        reply_token_map = {}
-        try:
-            # case FB trả JSON sạch
-            with open(f"raw_dumps/page{pages}.txt", "w", encoding="utf-8") as f:
-                f.write(resp_text)
-            json_resp = json.loads(resp_text)
-            
-            cleaned = resp_text
-            reply_token_map = {}
-            collect_reply_tokens_from_json(json_resp, reply_token_map)
-        except Exception as e:
-            # case FB trả 2 JSON dính nhau → dùng hàm clean
-            raw = resp_text
-            stripped = _strip_xssi_globally(raw)
-            parts = _split_top_level_json_objects(stripped)
-            if len(parts) > 1:
-                cleaned = clean_fb_resp_text(raw)      # ưu tiên block có cursor bằng score đệ quy
-                json_resp = json.loads(cleaned)
-            else:
-                json_resp = json.loads(stripped)
-                cleaned = stripped
-
-
-            # os.makedirs("raw_dumps", exist_ok=True)
-            # with open(f"raw_dumps/page{pages}.txt", "w", encoding="utf-8") as f:
-            #     f.write(resp_text)
+        # parse “an toàn” — decode 1 lần: rows + cursor + total + token replies
+        # (body lỗi: strip XSSI / tách JSON dính nhau, ưu tiên block có cursor như clean_fb_resp_text)
+        batch_texts, end_cursor, total_target, reply_token_map, parse_err = parse_comment_page(resp_text)
+        parse_failed = parse_err is not None
+        if parse_failed:
+            print(f"[WARN] page {pages} parse fail:", parse_err)
+            # không continue vì đã parse ok qua block đã clean
 
-            print(f"[WARN] page {pages} parse fail:", e)
-            # không continue vì đã parse ok qua cleaned
+        # lưu response gốc để trace (sample mode vẫn giữ trang parse lỗi)
+        raw_archive().put(resp_text, force=parse_failed, target=target_url, page=pages, cursor=current_cursor,
+                          doc=friendly or doc_id)
 
-        # # lưu JSON sạch để trace (optional)
-        with open(f"raw_dumps/page{pages}.json", "w", encoding="utf-8") as f:
-            json.dump(json_resp, f, ensure_ascii=False, indent=2)
-
-        # extract
-        batch_texts, end_cursor, total_target, extra = extract_full_posts_from_resptext(cleaned)
-        if extra and isinstance(extra, dict):
-            for job in extra.get("reply_jobs", []):
-                # job kiểu: {"id": parent_comment_id, "token": expansion_token}
-                reply_jobs.append(job)
         # stop if no next page
         if not end_cursor:
             print("[V2] Hết trang (không còn end_cursor).")
@@ -243,7 +392,7 @@ def crawl_comments(driver, out_json="comments.ndjson", checkpoint_path="checkpoi
                         item.get("text")
                         or item.get("message")
                         or item.get("body")
-                        or json.dumps(item, ensure_ascii=False)
+                        or dumps(item)
                     )
                     reply_count = (
                         item.get("comment")
@@ -321,12 +470,39 @@ def crawl_comments(driver, out_json="comments.ndjson", checkpoint_path="checkpoi
         ck["vars_template"] = vars_template
         ck["cursor_key"] = cursor_key
         ck["ts"] = time.time()
+        flush_ndjson_writers(durable=True)
         # save_checkpoint(ck, checkpoint_path)
 
         # ADVANCE cursor (chỉ 1 lần)
         current_cursor = end_cursor
 
         # # === crawl replies cho các parent vừa phát hiện ===
+        if REPLY_BATCH_SIZE > 1 and reply_jobs:
+            crawl_replies_batched(
+                driver,
+                url,
+                form,
+                base_reply_vars=vars_template,
+                jobs=list(reply_jobs),
+                out_json=out_json,
+                extract_fn=extract_replies_from_depth1_resp,
+                clean_fn=clean_fb_resp_text,
+                batch_size=REPLY_BATCH_SIZE,
+            )
+            reply_jobs.clear()
+        elif REPLY_CONCURRENCY > 1 and reply_jobs:
+            crawl_replies_concurrent(
+                driver,
+                url,
+                form,
+                base_reply_vars=vars_template,   # ⚠️ dùng template đã strip cursor, KO dùng orig_vars
+                jobs=list(reply_jobs),
+                out_json=out_json,
+                extract_fn=extract_replies_from_depth1_resp,
+                clean_fn=clean_fb_resp_text,
+                concurrency=REPLY_CONCURRENCY,
+            )
+            reply_jobs.clear()
         while reply_jobs:
             job = reply_jobs.popleft()
             parent_id = job["id"]
@@ -346,6 +522,7 @@ def crawl_comments(driver, out_json="comments.ndjson", checkpoint_path="checkpoi
             )
 
 
+    flush_ndjson_writers(durable=True)
     print(f"[V2] DONE. Collected {len(all_texts)} comments → {out_json}. Checkpoint at {checkpoint_path}.")
     return all_texts
 
@@ -0,0 +1,123 @@
+# =========================
+# Gộp shard comment (comments_<hash>.ndjson / .ndjson.zst) → 1 file export đã khử trùng
+# =========================
+#   python merge_shards.py database/comment/page/thoibaode/sheet1/tmp_comments_sheet1 thoibaode-comments-sheet1.xlsx
+# Mỗi shard được đọc + gộp trùng trong process pool; process chính gộp kết quả theo thứ tự shard
+# (cùng luật merge_comment_row như extract_full_posts_from_resptext) rồi ghi streaming ra
+# .xlsx (openpyxl write-only) hoặc .ndjson / .ndjson.zst (ndjson_writer).
+import argparse, glob, os, time
+from concurrent.futures import ProcessPoolExecutor
+from extract_comment_utils import merge_comment_row
+from get_comment_fb_utils import close_ndjson_writers, iter_ndjson, ndjson_writer
+from json_utils import dumps
+
+def comment_key(row):
+    # raw_comment_id = base64("comment:<post>_<comment>") → duy nhất giữa các post
+    return row.get("raw_comment_id") or row.get("id")
+
+def _load_shard(path):
+    """Worker: đọc 1 shard, gộp trùng trong shard. Trả (rows, số dòng đọc, số byte)."""
+    by_key, no_key, n_in = {}, [], 0
+    for row in iter_ndjson(path):
+        n_in += 1
+        k = comment_key(row)
+        if not k:
+            no_key.append(row)
+            continue
+        prev = by_key.get(k)
+        if prev is None:
+            by_key[k] = row
+        else:
+            merge_comment_row(prev, row)
+    return list(by_key.values()) + no_key, n_in, os.path.getsize(path)
+
+def _shard_files(src):
+    if os.path.isfile(src):
+        return [src]
+    files = glob.glob(os.path.join(src, "*.ndjson")) + glob.glob(os.path.join(src, "*.ndjson.zst"))
+    return sorted(files)
+
+def _write_xlsx(rows, out_path):
+    from openpyxl import Workbook
+
+    header, seen = [], set()
+    for r in rows:
+        for k in r:
+            if k not in seen:
+                seen.add(k); header.append(k)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet_1")
+    ws.append(header)
+    for r in rows:
+        ws.append([dumps(v) if isinstance(v, (list, dict)) else v for v in (r.get(h) for h in header)])
+    wb.save(out_path)
+
+def merge_shards(src, out_path, workers=None):
+    """
+    Gộp mọi shard trong thư mục `src` vào `out_path` (đuôi .xlsx / .ndjson / .ndjson.zst).
+    workers=1 → chạy tuần tự trong process hiện tại. Trả dict thống kê.
+    """
+    files = _shard_files(src)
+    if not files:
+        raise FileNotFoundError(f"Không có shard .ndjson trong {src}")
+    if workers is None:
+        workers = min(os.cpu_count() or 1, len(files))
+    t0 = time.time()
+    merged, no_key = {}, []
+    n_in = n_shard_rows = n_bytes = 0
+    if workers == 1:
+        results = map(_load_shard, files)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_load_shard, files, chunksize=1)  # giữ thứ tự shard
+    try:
+        for rows, cnt, size in results:
+            n_in += cnt
+            n_shard_rows += len(rows)
+            n_bytes += size
+            for row in rows:
+                k = comment_key(row)
+                if not k:
+                    no_key.append(row)
+                    continue
+                prev = merged.get(k)
+                if prev is None:
+                    merged[k] = row
+                else:
+                    merge_comment_row(prev, row)
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    t_parse = time.time() - t0
+
+    rows = list(merged.values()) + no_key
+    if out_path.endswith(".xlsx"):
+        _write_xlsx(rows, out_path)
+    else:
+        w = ndjson_writer(out_path)
+        w.write_many(rows)
+        close_ndjson_writers()
+    dt = time.time() - t0
+
+    stats = {
+        "shards": len(files), "rows_in": n_in, "rows_out": len(rows),
+        "dup_in_shard": n_in - n_shard_rows, "dup_cross_shard": n_shard_rows - len(rows),
+        "mb": n_bytes / 1e6, "parse_s": t_parse, "total_s": dt,
+    }
+    dup = n_in - len(rows)
+    print(f"[MERGE] {len(files)} shard, {n_in:,} dòng → {len(rows):,} comment "
+          f"(trùng {dup:,} = {dup / n_in * 100 if n_in else 0:.1f}%: {stats['dup_in_shard']:,} trong shard, "
+          f"{stats['dup_cross_shard']:,} giữa các shard)")
+    print(f"[MERGE] đọc+gộp {t_parse:.2f}s ({n_in / t_parse if t_parse else 0:,.0f} dòng/s, "
+          f"{stats['mb'] / t_parse if t_parse else 0:.1f} MB/s), tổng {dt:.2f}s → {out_path}")
+    return stats
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("src", help="Thư mục shard (tmp_comments_*) hoặc 1 file shard.")
+    ap.add_argument("out", help="File export: .xlsx, .ndjson hoặc .ndjson.zst.")
+    ap.add_argument("--workers", type=int, default=None, help="Số process parse shard (mặc định = số CPU, 1 = tuần tự).")
+    args = ap.parse_args()
+    if os.path.exists(args.out):
+        raise SystemExit(f"{args.out} đã tồn tại — xoá trước nếu muốn ghi lại.")
+    merge_shards(args.src, args.out, workers=args.workers)
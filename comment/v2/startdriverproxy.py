@@ -2,7 +2,9 @@ from seleniumwire import webdriver
 from selenium.webdriver.chrome.options import Options
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-import json, time, os
+import time, os
+
+from json_utils import load
 ALLOWED_COOKIE_DOMAINS = {".facebook.com", "facebook.com", "m.facebook.com", "web.facebook.com"}
 HERE = Path(__file__).resolve().parent
 
@@ -66,7 +68,7 @@ def _normalize_cookie(c: dict) -> Optional[dict]:
 
 def _add_cookies_safely(driver, cookies_path: Path):
     with open(cookies_path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+        raw = load(f)
     if isinstance(raw, dict) and "cookies" in raw:
         raw = raw["cookies"]
     if not isinstance(raw, list):
@@ -85,7 +87,7 @@ def _add_cookies_safely(driver, cookies_path: Path):
     return added
 def _set_kv_storage(driver, kv_path: Path, storage: str = "localStorage"):
     with open(kv_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+        data = load(f)
     if isinstance(data, dict):
         for k, v in data.items():
             driver.execute_script(f"{storage}.setItem(arguments[0], arguments[1]);", k, v)
@@ -1,6 +1,9 @@
-import json
+import time
 import pandas as pd
 from datetime import datetime
+# đọc .ndjson/.jsonl, 1 file .zst, hoặc "<stem>.ndjson.zst" (segment theo manifest của comment crawler)
+from shared.ndjson import iter_ndjson_lines
+from shared.json_utils import JSONDecodeError, loads
 
 def convert_timestamp(timestamp):
     """Chuyển đổi Unix timestamp sang định dạng datetime"""
@@ -17,54 +20,111 @@ def process_list_field(field_value):
         return str(field_value)
     return field_value
 
+# Các trường xuất ra Excel, theo thứ tự cột
+FIELDS = [
+    'id', 'type', 'link', 'author_id', 'author', 'author_link', 
+    'avatar', 'created_time', 'content', 'image_url', 'like', 
+    'comment', 'haha', 'wow', 'sad', 'love', 'angry', 'care', 
+    'share', 'hashtag', 'video', 'source_id', 'is_share', 
+    'link_share', 'type_share'
+]
+EXCEL_MAX_ROWS = 1_048_576  # giới hạn dòng / sheet của Excel (tính cả header)
+
+def ndjson_to_excel_stream(input_file, output_file, fields=FIELDS, sheet_rows=EXCEL_MAX_ROWS - 1,
+                           report_every=100_000):
+    """
+    Xuất NDJSON sang Excel kiểu streaming: đọc từng dòng, ghi thẳng qua openpyxl write-only,
+    không giữ list/DataFrame → RAM không tăng theo số dòng.
+    Đủ `sheet_rows` dòng dữ liệu thì sang sheet mới (Sheet_2, Sheet_3, ...), mỗi sheet có header.
+    Trả (số dòng đã ghi, số sheet).
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws, n_sheets, in_sheet, total = None, 0, sheet_rows, 0
+    t0 = time.time()
+    print(f"Đang đọc file: {input_file}")
+    for line_num, line in enumerate(iter_ndjson_lines(input_file), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            json_obj = loads(line)
+        except JSONDecodeError as e:
+            print(f"Lỗi parse JSON ở dòng {line_num}: {e}")
+            continue
+
+        if in_sheet >= sheet_rows:
+            n_sheets += 1
+            ws = wb.create_sheet(f"Sheet_{n_sheets}")
+            ws.append(fields)
+            in_sheet = 0
+        row = []
+        for field in fields:
+            # thiếu field/null → None: write-only bỏ qua ô rỗng thay vì ghi chuỗi '' (nhìn trong Excel như nhau)
+            value = json_obj.get(field)
+            # list giữ format ["item","item"] như process_list_field; dict (avatar...) cũng ghi dạng chuỗi
+            if isinstance(value, (list, dict)):
+                value = str(value)
+            row.append(value)
+        ws.append(row)
+        in_sheet += 1
+        total += 1
+        if report_every and total % report_every == 0:
+            print(f"  {total:,} dòng ({total / (time.time() - t0):,.0f} dòng/s)")
+
+    if ws is None:
+        ws = wb.create_sheet("Sheet_1")
+        ws.append(fields)
+        n_sheets = 1
+    print(f"Đang ghi vào file: {output_file}")
+    wb.save(output_file)
+    dt = time.time() - t0
+    print(f"Hoàn tất! Đã xuất {total:,} bản ghi / {n_sheets} sheet vào {output_file} "
+          f"trong {dt:.1f}s ({total / dt if dt else 0:,.0f} dòng/s)")
+    return total, n_sheets
+
 def ndjson_to_excel(input_file, output_file):
     """
     Đọc file NDJSON và chuyển đổi sang Excel
     
     Args:
-        input_file: đường dẫn đến file .ndjson hoặc .jsonl
+        input_file: đường dẫn đến file .ndjson hoặc .jsonl (hoặc .ndjson.zst, xem iter_ndjson_lines)
         output_file: đường dẫn file Excel output (phải có đuôi .xlsx)
     """
     
     # Các trường cần lấy theo thứ tự
-    fields = [
-        'id', 'type', 'link', 'author_id', 'author', 'author_link', 
-        'avatar', 'created_time', 'content', 'image_url', 'like', 
-        'comment', 'haha', 'wow', 'sad', 'love', 'angry', 'care', 
-        'share', 'hashtag', 'video', 'source_id', 'is_share', 
-        'link_share', 'type_share'
-    ]
+    fields = FIELDS
     
     data_list = []
     
     # Đọc file NDJSON
     print(f"Đang đọc file: {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
+    for line_num, line in enumerate(iter_ndjson_lines(input_file), 1):
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            # Parse JSON từ mỗi dòng
+            json_obj = loads(line)
             
-            try:
-                # Parse JSON từ mỗi dòng
-                json_obj = json.loads(line)
+            # Tạo dictionary cho dòng dữ liệu
+            row_data = {}
+            for field in fields:
+                value = json_obj.get(field, '')
                 
-                # Tạo dictionary cho dòng dữ liệu
-                row_data = {}
-                for field in fields:
-                    value = json_obj.get(field, '')
-                    
 
-                    if field in ['image_url', 'hashtag', 'video']:
-                        value = process_list_field(value)
-                    
-                    row_data[field] = value
+                if field in ['image_url', 'hashtag', 'video']:
+                    value = process_list_field(value)
                 
-                data_list.append(row_data)
-                
-            except json.JSONDecodeError as e:
-                print(f"Lỗi parse JSON ở dòng {line_num}: {e}")
-                continue
+                row_data[field] = value
+            
+            data_list.append(row_data)
+            
+        except JSONDecodeError as e:
+            print(f"Lỗi parse JSON ở dòng {line_num}: {e}")
+            continue
     
     # Tạo DataFrame
     df = pd.DataFrame(data_list, columns=fields)
@@ -86,14 +146,14 @@ if __name__ == "__main__":
     output_file = "thoibao-de.xlsx"
     
     try:
-        df = ndjson_to_excel(input_file, output_file)
+        # file lớn (hàng triệu dòng): ghi streaming, tự sang sheet mới trước giới hạn 1,048,576 dòng
+        total, n_sheets = ndjson_to_excel_stream(input_file, output_file)
         
         # In thông tin tổng quan
         print("\n=== THÔNG TIN TỔNG QUAN ===")
-        print(f"Tổng số bản ghi: {len(df)}")
-        print(f"Các cột: {list(df.columns)}")
-        print("\nMẫu 3 dòng đầu tiên:")
-        print(df.head(3))
+        print(f"Tổng số bản ghi: {total}")
+        print(f"Số sheet: {n_sheets}")
+        print(f"Các cột: {FIELDS}")
         
     except FileNotFoundError:
         print(f"Không tìm thấy file: {input_file}")
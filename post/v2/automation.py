@@ -1,4 +1,4 @@
-import time, json, urllib, os
+import time, urllib, os
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs, urlunparse, urlencode
 
@@ -9,7 +9,9 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException as _SETimeout
 
 from configs import *
-from utils import _normalize_cookie, _strip_xssi_prefix, choose_best_graphql_obj, deep_collect_cursors, deep_find_has_next, is_group_feed_req, iter_json_values, merge_vars, parse_form, strip_cursors_from_vars, update_vars_for_next_cursor
+from json_utils import dumps, load, loads
+from get_info import EXTRACT_KEYS
+from utils import _normalize_cookie, choose_best_graphql_obj, ResponseAnalysis, is_group_feed_req, iter_json_spans, merge_vars, parse_form, strip_cursors_from_vars, update_vars_for_next_cursor
 # =========================
 # Chrome + selenium-wire
 # =========================
@@ -51,7 +53,7 @@ def start_driver_with_proxy(proxy_url: str, headless: bool = False) -> webdriver
 # =========================
 def _add_cookies_safely(driver, cookies_path: Path):
     with open(cookies_path, "r", encoding="utf-8") as f:
-        raw = json.load(f)
+        raw = load(f)
     if isinstance(raw, dict) and "cookies" in raw:
         raw = raw["cookies"]
     if not isinstance(raw, list):
@@ -178,15 +180,91 @@ def fetch_via_wire(driver, form):
     return getattr(resp, "text", "")
 
 
+# =========================
+# Cắt response trong page (trước khi qua WebDriver)
+# =========================
+# Bỏ các key nặng mà extractor không đọc (TRIM_DROP_KEYS: manifest video, tracking...).
+# Subtree sắp bỏ mà chứa key/node extractor có đọc (TRIM_GUARD_*), hoặc body không
+# parse/serialize lại y hệt được (key số, int > 2^53) → trả nguyên body.
+_TRIM_JS = r"""
+function __trimBody(text, spec) {
+  const drop = new Set(spec.drop), guard = new Set(spec.guard), types = new Set(spec.types);
+  const whole = new Set(spec.keep || []);  // subtree extractor chép nguyên vào row → không cắt bên trong
+  const enc = new TextEncoder();
+  const full = enc.encode(text).length;
+  const keep = (why) => ({text, full, kept: full, fallback: why});
+  const s = text.replace(/^\s*(?:for\s*\(\s*;\s*;\s*\)\s*;\s*)?(?:\)\]\}'\s*)?/, "");
+  const docs = [];
+  try { docs.push(JSON.parse(s)); }
+  catch (e) {
+    for (const line of s.split(/\r?\n/)) {
+      const t = line.trim();
+      if (!t) continue;
+      try { docs.push(JSON.parse(t)); } catch (e2) { return keep("parse"); }
+    }
+  }
+  if (!docs.length) return keep("empty");
+
+  const guarded = (o) => {
+    if (Array.isArray(o)) return o.some(guarded);
+    if (!o || typeof o !== "object") return false;
+    if (types.has(o.__typename)) return true;
+    for (const [k, v] of Object.entries(o)) if (guard.has(k) || guarded(v)) return true;
+    return false;
+  };
+  let bad = null;
+  const prune = (o) => {
+    if (bad) return;
+    if (typeof o === "number") {
+      if (Number.isInteger(o) && !Number.isSafeInteger(o)) bad = "bigint";
+      return;
+    }
+    if (Array.isArray(o)) { for (const v of o) prune(v); return; }
+    if (!o || typeof o !== "object") return;
+    for (const k of Object.keys(o)) {
+      if (/^(?:0|[1-9]\d*)$/.test(k)) { bad = "intkey"; return; }  // JS đổi thứ tự key số
+      if (drop.has(k)) {
+        if (guarded(o[k])) { bad = "guard:" + k; return; }
+        delete o[k];
+      } else if (!whole.has(k)) {
+        prune(o[k]);
+      }
+    }
+  };
+  for (const d of docs) prune(d);
+  if (bad) return keep(bad);
+  const out = docs.map(d => JSON.stringify(d)).join("\n");
+  return {text: out, full, kept: enc.encode(out).length, fallback: null};
+}
+"""
+
+# guard dựng từ chính các bộ key của extractor (get_info) + cursor, không giữ tay 1 danh sách riêng
+_TRIM_GUARD = sorted(set(TRIM_GUARD_KEYS) | set(CURSOR_KEYS) | EXTRACT_KEYS)
+
+def _trim_spec(trim):
+    if not trim:
+        return None
+    return {"drop": sorted(TRIM_DROP_KEYS), "guard": _TRIM_GUARD, "types": sorted(TRIM_GUARD_TYPES)}
+
+def _report_trim(info, tag=""):
+    if not info:
+        return
+    full, kept = info.get("full") or 0, info.get("kept") or 0
+    if info.get("fallback"):
+        print(f"[TRIM]{tag} giữ nguyên {full/1024:.0f}KB ({info['fallback']})")
+    else:
+        print(f"[TRIM]{tag} {full/1024:.0f}KB → {kept/1024:.0f}KB (-{(full-kept)/1024:.0f}KB, {100*(full-kept)/max(full,1):.0f}%)")
+
 # =========================
 # JS fetch with page cookies
 # =========================
-def js_fetch_in_page(driver, form_dict, extra_headers=None, timeout_ms=20000):
+def js_fetch_in_page(driver, form_dict, extra_headers=None, timeout_ms=20000, trim=False):
     """
     Chạy fetch ngay TRONG context page (giữ cookie), có timeout bằng AbortController.
     Trả về text body. Ném RuntimeError nếu fail.
+    trim=True: cắt bớt body trong page trước khi trả về (xem _TRIM_JS).
     """
-    script = r"""
+    script = _TRIM_JS + r"""
         const done = arguments[arguments.length - 1];
         (async () => {
           try {
@@ -215,6 +293,12 @@ def js_fetch_in_page(driver, form_dict, extra_headers=None, timeout_ms=20000):
 
             const text = await res.text();
             clearTimeout(to);
+            const spec = arguments[3];
+            if (spec) {
+              const t = __trimBody(text, spec);
+              return done(JSON.stringify({ok:true, status:res.status, text:t.text,
+                                          trim:{full:t.full, kept:t.kept, fallback:t.fallback}}));
+            }
             done(JSON.stringify({ok:true, status:res.status, text}));
           } catch (e) {
             done(JSON.stringify({ok:false, error: (e && e.message) ? e.message : String(e)}));
@@ -222,43 +306,210 @@ def js_fetch_in_page(driver, form_dict, extra_headers=None, timeout_ms=20000):
         })();
     """
     driver.set_script_timeout(max(5, int(timeout_ms/1000) + 10))
-    raw = driver.execute_async_script(script, form_dict, extra_headers or {}, int(timeout_ms))
+    raw = driver.execute_async_script(script, form_dict, extra_headers or {}, int(timeout_ms), _trim_spec(trim))
     try:
-        obj = json.loads(raw) if isinstance(raw, str) else raw
+        obj = loads(raw) if isinstance(raw, str) else raw
     except Exception:
         raise RuntimeError(f"js_fetch_in_page: bad_return {raw!r}")
 
     if not obj.get("ok"):
         raise RuntimeError(f"js_fetch_in_page: {obj.get('error')}")
+    _report_trim(obj.get("trim"))
     return obj.get("text", "")
 
+def js_fetch_chain_in_page(driver, form_dict, hops, vars_template=None, extra_headers=None,
+                           timeout_ms=20000, delay=(0.7, 1.4), trim=False):
+    """
+    Như js_fetch_in_page nhưng script trong page tự đi theo end_cursor tối đa `hops` trang
+    trong 1 lần execute_async_script (1 round-trip WebDriver cho cả chuỗi).
+    Chọn cursor + cập nhật variables giống ResponseAnalysis/update_vars_for_next_cursor.
+    Trả về [(form, text)] theo thứ tự, trang đầu ứng với form_dict. Ném RuntimeError nếu trang đầu fail.
+    trim=True: cursor vẫn chọn trên body gốc, rồi mới cắt từng trang (xem _TRIM_JS).
+    """
+    script = _TRIM_JS + r"""
+        const done = arguments[arguments.length - 1];
+        (async () => {
+          const form0 = arguments[0] || {};
+          const extra = arguments[1] || {};
+          const timeout = arguments[2] || 20000;
+          const hops = arguments[3] || 1;
+          const tmpl = arguments[4] || {};
+          const cursorKeys = new Set(arguments[5] || []);
+          const delay = arguments[6] || [0, 0];
+          const spec = arguments[7];
+          const PRIO = {"page_info.end_cursor": 3, "end_cursor": 3, "endCursor": 3, "edges[-1].cursor": 2};
+
+          // truthy kiểu Python: {} / [] / "" / 0 / null đều là "rỗng"
+          const truthy = (v) => {
+            if (Array.isArray(v)) return v.length > 0;
+            if (v && typeof v === "object") return Object.keys(v).length > 0;
+            return !!v;
+          };
+          const isDict = (v) => !!v && typeof v === "object" && !Array.isArray(v);
+
+          // = choose_best_graphql_obj(iter_json_spans(text)) cho trường hợp thường gặp
+          const bestDoc = (text) => {
+            const s = text.replace(/^\s*(?:for\s*\(\s*;\s*;\s*\)\s*;\s*)?(?:\)\]\}'\s*)?/, "");
+            const docs = [];
+            try { docs.push([JSON.parse(s), s.trim().length]); }
+            catch (e) {
+              for (const line of s.split(/\r?\n/)) {
+                const t = line.trim();
+                if (!t) continue;
+                try { docs.push([JSON.parse(t), t.length]); } catch (e2) {}
+              }
+            }
+            const withData = docs.filter(d => isDict(d[0]) && ("data" in d[0]));
+            const pool = withData.length ? withData : docs;
+            let best = null;
+            for (const d of pool) if (!best || d[1] > best[1]) best = d;
+            return best ? best[0] : null;
+          };
+
+          // = ResponseAnalysis(obj, collect_posts=False).cursor / .has_next
+          const pickCursor = (root) => {
+            let best = null, bestP = -1, bestL = -1;
+            const flags = [];
+            const consider = (src, c) => {
+              if (typeof c !== "string" || c.length < 10) return;
+              const p = PRIO[src] || 1;
+              if (p > bestP || (p === bestP && c.length > bestL)) { best = c; bestP = p; bestL = c.length; }
+            };
+            const dive = (o) => {
+              if (Array.isArray(o)) { for (const v of o) dive(v); return; }
+              if (!isDict(o)) return;
+              const pi = truthy(o.page_info) ? o.page_info : o.pageInfo;
+              if (isDict(pi)) {
+                consider("page_info.end_cursor", truthy(pi.end_cursor) ? pi.end_cursor : pi.endCursor);
+                const hn = (pi.has_next_page == null) ? pi.hasNextPage : pi.has_next_page;
+                if (typeof hn === "boolean") flags.push(hn);
+              }
+              const edges = o.edges;
+              if (Array.isArray(edges) && edges.length && isDict(edges[edges.length - 1])) {
+                consider("edges[-1].cursor", edges[edges.length - 1].cursor);
+              }
+              for (const [k, v] of Object.entries(o)) {
+                if (cursorKeys.has(k)) consider(k, v);
+                dive(v);
+              }
+            };
+            dive(root);
+            const hasNext = flags.some(x => x) ? true : (flags.length ? false : null);
+            return [best, hasNext];
+          };
+
+          // = update_vars_for_next_cursor(form, cur, vars_template)["variables"]
+          const nextVars = (varsStr, cur) => {
+            let base;
+            try { base = JSON.parse(varsStr || "{}"); } catch (e) { base = {}; }
+            if (!isDict(base)) base = {};
+            for (const [k, v] of Object.entries(tmpl)) if (!cursorKeys.has(k)) base[k] = v;
+            let changed = false;
+            if ("cursor" in base) { base.cursor = cur; changed = true; }
+            if (!changed) {
+              for (const k of ["after", "endCursor", "afterCursor", "feedAfterCursor"]) {
+                if (k in base) { base[k] = cur; changed = true; }
+              }
+            }
+            if (!changed) base.cursor = cur;
+            if (Number.isInteger(base.count)) base.count = Math.max(base.count, 10);
+            return JSON.stringify(base);
+          };
+
+          if (!location.host.includes('facebook.com')) {
+            return done(JSON.stringify({ok:false, error:"bad_origin:"+location.href}));
+          }
+
+          const headers = Object.assign({"Content-Type":"application/x-www-form-urlencoded"}, extra);
+          const pages = [];
+          let form = Object.assign({}, form0);
+          for (let i = 0; i < hops; i++) {
+            if (i > 0 && delay[1] > 0) {
+              await new Promise(r => setTimeout(r, 1000 * (delay[0] + Math.random() * (delay[1] - delay[0]))));
+            }
+            const ctrl = new AbortController();
+            const to = setTimeout(() => ctrl.abort('timeout'), timeout);
+            let text;
+            try {
+              const res = await fetch("/api/graphql/", {
+                method: "POST",
+                headers,
+                body: new URLSearchParams(form).toString(),
+                credentials: "include",
+                signal: ctrl.signal
+              });
+              text = await res.text();
+            } catch (e) {
+              clearTimeout(to);
+              if (!pages.length) {
+                return done(JSON.stringify({ok:false, error: (e && e.message) ? e.message : String(e)}));
+              }
+              break;  // giữ các trang đã lấy được
+            }
+            clearTimeout(to);
+            const page = {variables: form.variables || "", text};
+            pages.push(page);
+            const obj = (i + 1 < hops) ? bestDoc(text) : null;
+            if (spec) {
+              const t = __trimBody(text, spec);
+              page.text = t.text;
+              page.trim = {full: t.full, kept: t.kept, fallback: t.fallback};
+            }
+            if (!obj) break;
+            const [cur, hasNext] = pickCursor(obj);
+            if (!cur || hasNext === false) break;
+            form = Object.assign({}, form, {variables: nextVars(form.variables, cur)});
+          }
+          done(JSON.stringify({ok:true, pages}));
+        })();
+    """
+    hops = max(1, int(hops))
+    driver.set_script_timeout(max(5, hops * (int(timeout_ms/1000) + int(delay[1]) + 1) + 10))
+    raw = driver.execute_async_script(script, form_dict, extra_headers or {}, int(timeout_ms), hops,
+                                      vars_template or {}, sorted(CURSOR_KEYS), list(delay), _trim_spec(trim))
+    try:
+        obj = loads(raw) if isinstance(raw, str) else raw
+    except Exception:
+        raise RuntimeError(f"js_fetch_chain_in_page: bad_return {raw!r}")
+
+    if not obj.get("ok"):
+        raise RuntimeError(f"js_fetch_chain_in_page: {obj.get('error')}")
+    out = []
+    for i, p in enumerate(obj.get("pages") or []):
+        _report_trim(p.get("trim"), f" hop{i+1}")
+        f = dict(form_dict)
+        if p.get("variables"):
+            f["variables"] = p["variables"]
+        out.append((f, p.get("text", "")))
+    return out
+
 # =========================
 # Soft-refetch & reload
 # =========================
 def soft_refetch_form_and_cursor(driver, form, vars_template):
     try:
-        base = json.loads(form.get("variables", "{}"))
+        base = loads(form.get("variables", "{}"))
     except Exception:
         base = {}
     base = merge_vars(base, vars_template)
     base = strip_cursors_from_vars(base)
 
     new_form = dict(form)
-    new_form["variables"] = json.dumps(base, separators=(",", ":"))
+    new_form["variables"] = dumps(base)
 
     txt = js_fetch_in_page(driver, new_form, extra_headers={
         "Cache-Control": "no-cache",
         "Pragma": "no-cache",
     })
-    obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
+    obj = choose_best_graphql_obj(iter_json_spans(txt))
     if not obj:
         return None, None, None, None
 
-    cursors = deep_collect_cursors(obj)
-    new_has_next = deep_find_has_next(obj)
+    ra = ResponseAnalysis(obj, collect_posts=False)
+    new_has_next = ra.has_next
     if new_has_next is None: 
-        new_has_next = bool(cursors)
-    new_cursor = cursors[0][1] if cursors else None
+        new_has_next = bool(ra.cursors)
+    new_cursor = ra.cursor
 
     if new_cursor:
         new_form = update_vars_for_next_cursor(new_form, new_cursor, vars_template)
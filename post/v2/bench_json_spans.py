@@ -0,0 +1,64 @@
+# =========================
+# Benchmark decode body GraphQL nhiều document dính nhau: iter_json_values cũ (cắt s[i:]) vs iter_json_spans
+# =========================
+#   python bench_json_spans.py [--docs 20000] [--big-docs 40] [--repeat 3]
+# Case 1: nhiều document nhỏ (trang phân trang dài); case 2: ít document lớn (~80 KB/doc).
+# Body có prefix for (;;); ở đầu và rác ở cuối; đường cũ = caller cũ: _strip_xssi_prefix cả body rồi
+# iter_json_values. Kiểm tra 2 đường cho cùng kết quả.
+import argparse, json, random, re, time
+from utils import _strip_xssi_prefix, iter_json_values
+
+def _legacy_iter_json_values(s: str):
+    """iter_json_values trước iter_json_spans (giữ lại để so sánh)."""
+    dec = json.JSONDecoder()
+    i, n = 0, len(s)
+    while i < n:
+        m = re.search(r'\S', s[i:])
+        if not m: break
+        j = i + m.start()
+        try:
+            obj, k = dec.raw_decode(s, j); yield obj; i = k
+        except json.JSONDecodeError:
+            chunk = _strip_xssi_prefix(s[j:])
+            if chunk == s[j:]: break
+            try:
+                obj, k_rel = dec.raw_decode(chunk, 0); yield obj; i = j + k_rel
+            except json.JSONDecodeError:
+                break
+
+def fake_doc(r, edges):
+    return {"data": {"node": {"group_feed": {"edges": [
+        {"node": {"id": str(r.randint(10**14, 10**15)), "message": {"text": "nội dung " * r.randint(1, 30)}},
+         "cursor": f"AQHR{r.getrandbits(64):x}"} for _ in range(edges)],
+        "page_info": {"has_next_page": True, "end_cursor": f"AQHR{r.getrandbits(64):x}"}}}},
+        "extensions": {"is_final": False}}
+
+def fake_body(r, docs, edges):
+    parts = [json.dumps(fake_doc(r, edges), ensure_ascii=False) for _ in range(docs)]
+    return "for (;;);" + "\n".join(parts) + "\n<!-- rác -->"
+
+def _old_path(s):
+    return _legacy_iter_json_values(_strip_xssi_prefix(s))
+
+def _best(fn, s, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = list(fn(s))
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=20000, help="Số document nhỏ trong body case 1.")
+    ap.add_argument("--big-docs", type=int, default=40, help="Số document lớn trong body case 2.")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lượt đo, lấy lượt nhanh nhất.")
+    args = ap.parse_args()
+
+    r = random.Random(0)
+    for name, body in (("nhỏ", fake_body(r, args.docs, 1)), ("lớn", fake_body(r, args.big_docs, 300))):
+        t_old, old = _best(_old_path, body, args.repeat)
+        t_new, new = _best(iter_json_values, body, args.repeat)
+        print(f"[BENCH] {len(old)} doc {name}, {len(body.encode('utf-8')) / 1e6:.1f} MB, cùng kết quả: {old == new}")
+        print(f"[BENCH]   cũ {t_old * 1e3:.0f} ms, mới {t_new * 1e3:.0f} ms → x{t_old / t_new:.1f}")
@@ -0,0 +1,92 @@
+# =========================
+# Benchmark seen_ids: set[str] (đường cũ) vs SeenIndex (mmap) vs SeenIndex + bloom
+# =========================
+#   python bench_seen_index.py [--keys 1000000] [--lookups 200000] [--out bench_seen_tmp]
+# RAM đo bằng tracemalloc (heap Python: set + chuỗi id, delta, bloom); file base của SeenIndex
+# nằm trong page cache qua mmap nên in riêng. Lookup đo riêng id đã thấy (có) và id mới (chưa) —
+# bloom chỉ có lợi ở id mới. Thời gian mở (dựng bloom) đo riêng, không chạy tracemalloc.
+import argparse, gc, os, random, shutil, time, tracemalloc
+from checkpoint import SeenIndex
+
+def fake_ids(r, n):
+    return [str(r.randint(10**14, 10**16)) for _ in range(n)]
+
+def _traced(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, mem
+
+def _timed(build):
+    t0 = time.perf_counter()
+    obj = build()
+    return obj, time.perf_counter() - t0
+
+def _lookup_ns(seen, queries):
+    best = None
+    for _ in range(3):
+        t0 = time.perf_counter()
+        hits = sum(1 for q in queries if q in seen)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best / len(queries) * 1e9, hits
+
+def _lookups(seen, q_seen, q_new):
+    """(ns/lần với id đã thấy, ns/lần với id mới, tổng số trúng)."""
+    ns_seen, h1 = _lookup_ns(seen, q_seen)
+    ns_new, h2 = _lookup_ns(seen, q_new)
+    return ns_seen, ns_new, h1 + h2
+
+def _mib(n):
+    return n / (1 << 20)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keys", type=int, default=1_000_000, help="Số id đã thấy.")
+    ap.add_argument("--lookups", type=int, default=200_000, help="Số lần tra mỗi loại (có / chưa).")
+    ap.add_argument("--out", default="bench_seen_tmp", help="Thư mục tạm (bị xoá rồi tạo lại).")
+    args = ap.parse_args()
+
+    shutil.rmtree(args.out, ignore_errors=True)
+    os.makedirs(args.out)
+    r = random.Random(0)
+    # chuỗi id tạo trong lúc trace cho set → tính cả chi phí giữ str như seen_ids cũ
+    ids_path = os.path.join(args.out, "ids.txt")
+    with open(ids_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(fake_ids(r, args.keys)))
+
+    def read_ids():
+        with open(ids_path, "r", encoding="utf-8") as f:
+            return f.read().split("\n")
+
+    old, old_mem = _traced(lambda: set(read_ids()))
+    _, old_build = _timed(lambda: set(read_ids()))
+    q_seen = r.sample(sorted(old), args.lookups)
+    q_new = fake_ids(r, args.lookups)
+
+    print(f"[BENCH] {args.keys} id, {args.lookups} lần tra mỗi loại")
+    old_seen, old_new, old_hits = _lookups(old, q_seen, q_new)
+    print(f"[BENCH] {'set[str]':17}: RAM {_mib(old_mem):6.1f} MiB, file    0.0 MiB, "
+          f"dựng {old_build:.2f}s, tra có {old_seen:5.0f} ns / chưa {old_new:5.0f} ns")
+    ids = sorted(old)
+    del old
+    gc.collect()
+
+    for bloom in (False, True):
+        path = os.path.join(args.out, f"seen_{int(bloom)}.bin")
+        idx = SeenIndex(path)
+        idx.update(ids)
+        idx.flush()
+        idx._close()
+        # mở lại như lúc load checkpoint
+        idx, mem = _traced(lambda: SeenIndex(path, bloom=bloom))
+        idx._close()
+        idx, dt = _timed(lambda: SeenIndex(path, bloom=bloom))
+        ns_seen, ns_new, hits = _lookups(idx, q_seen, q_new)
+        name = "SeenIndex + bloom" if bloom else "SeenIndex"
+        print(f"[BENCH] {name:17}: RAM {_mib(mem):6.1f} MiB, file {_mib(os.path.getsize(path)):6.1f} MiB, "
+              f"mở {dt:.2f}s, tra có {ns_seen:5.0f} ns / chưa {ns_new:5.0f} ns, cùng kết quả: {hits == old_hits}")
+        idx._close()
+    shutil.rmtree(args.out, ignore_errors=True)
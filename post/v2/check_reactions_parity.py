@@ -0,0 +1,224 @@
+# =========================
+# Kiểm tra extract_reactions_and_counts: bản cũ (6 lần _deep_iter) vs bản hiện tại (1 lần duyệt, summary + memo)
+# =========================
+#   python check_reactions_parity.py [--root database/raw_dumps] [--limit 0] [--fake 2000] [--repeat 3]
+# Story lấy từ raw archive (mọi node _looks_like_group_post, kể cả story lồng trong attached_story);
+# archive trống/không có → cây story giả (đủ các pattern share/comment/reaction cũ + mới).
+# In từng story khác kết quả, exit 1 nếu có.
+import argparse, random, time
+from configs import *
+from get_info import (REACTION_ID_MAP, REACTION_KEYS, _deep_iter, _looks_like_group_post, _norm_reaction_name,
+                      extract_reactions_and_counts)
+from utils import iter_json_values
+from shared.trim_parity import archive_bodies
+
+def _legacy_extract_reactions_and_counts(n):
+    """extract_reactions_and_counts trước khi gộp 1 lần duyệt (giữ lại để so sánh)."""
+    counts = {v: 0 for v in REACTION_KEYS.values()}
+    counts.update({"comment": 0, "share": 0})
+
+    # ---- A) SHARE (new style + fallback string)
+    for k, v in _deep_iter(n):
+        if k == "share_count" and isinstance(v, dict):
+            c = v.get("count")
+            if isinstance(c, int):
+                counts["share"] = max(counts["share"], c)
+        if k == "i18n_share_count":  # "1.2K", "5"...
+            try:
+                s = str(v).replace(".", "").replace(",", "")
+                c = int(s)
+                counts["share"] = max(counts["share"], c)
+            except:
+                pass
+        if k in ("sharecount", "resharesCount") and isinstance(v, int):
+            counts["share"] = max(counts["share"], v)
+
+    # ---- B) COMMENT (đủ pattern)
+    total_cmt = 0
+    for k, v in _deep_iter(n):
+        if k == "comments_count_summary_renderer" and isinstance(v, dict):
+            fb = v.get("feedback") or {}
+            cri = fb.get("comment_rendering_instance") or {}
+            comments = cri.get("comments") or {}
+            tc = comments.get("total_count")
+            if isinstance(tc, int):
+                total_cmt = max(total_cmt, tc)
+            tlc = cri.get("top_level_comments") or {}
+            tc2 = tlc.get("count")
+            if isinstance(tc2, int):
+                total_cmt = max(total_cmt, tc2)
+
+    for k, v in _deep_iter(n):
+        if k in ("total_comment_count", "comment_count", "commentsCount", "display_comments_count"):
+            if isinstance(v, int):
+                total_cmt = max(total_cmt, v)
+        if k == "comment_count" and isinstance(v, dict):
+            c = v.get("count")
+            if isinstance(c, int):
+                total_cmt = max(total_cmt, c)
+        if k == "i18n_comment_count":
+            try:
+                c = int(str(v).replace(".", "").replace(",", ""))
+                total_cmt = max(total_cmt, c)
+            except:
+                pass
+    counts["comment"] = max(counts["comment"], total_cmt)
+
+    # ---- C) REACTIONS (new style breakdown + total)
+    found_breakdown = False
+    for k, v in _deep_iter(n):
+        if k == "top_reactions" and isinstance(v, dict):
+            edges = v.get("edges") or []
+            for e in edges:
+                if not isinstance(e, dict):
+                    continue
+                node = (e.get("node") or {})
+                rid  = node.get("id")
+                rname= node.get("localized_name")
+                rkey = None
+                if isinstance(rid, str) and rid in REACTION_ID_MAP:
+                    rkey = REACTION_ID_MAP[rid]
+                if not rkey and rname:
+                    rkey = _norm_reaction_name(rname)
+                rc = e.get("reaction_count")
+                if rkey in REACTION_KEYS.values() and isinstance(rc, int):
+                    counts[rkey] = max(counts[rkey], rc)
+                    found_breakdown = True
+
+    total_any = 0
+    for k, v in _deep_iter(n):
+        if k == "reaction_count" and isinstance(v, dict):
+            c = v.get("count")
+            if isinstance(c, int):
+                total_any = max(total_any, c)
+    if total_any and not found_breakdown:
+        counts["like"] = max(counts["like"], total_any)
+
+    # ---- D) REACTIONS (kiểu cũ list [reactionType/key]:count/total_count)
+    for _k, v in _deep_iter(n):
+        if isinstance(v, list) and v and isinstance(v[0], dict) and (
+            ("reactionType" in v[0] and "count" in v[0]) or
+            ("key" in v[0] and "total_count" in v[0])
+        ):
+            for it in v:
+                rtype = (it.get("reactionType") or it.get("key") or "")
+                cnt = it.get("count") if "count" in it else it.get("total_count")
+                if isinstance(rtype, str):
+                    rtype = rtype.upper()
+                if rtype in REACTION_KEYS and isinstance(cnt, int):
+                    counts[REACTION_KEYS[rtype]] = max(counts[REACTION_KEYS[rtype]], cnt)
+
+    return counts
+
+def collect_stories(obj, out):
+    """Mọi story node (cả lồng nhau) theo thứ tự duyệt như ResponseAnalysis."""
+    if isinstance(obj, dict):
+        if _looks_like_group_post(obj):
+            out.append(obj)
+        for v in obj.values():
+            if isinstance(v, (dict, list)):
+                collect_stories(v, out)
+    elif isinstance(obj, list):
+        for v in obj:
+            if isinstance(v, (dict, list)):
+                collect_stories(v, out)
+    return out
+
+_REACTION_NAMES = ["Thích", "Yêu thích", "Haha", "Wow", "Buồn", "Phẫn nộ", "Thương thương", "Like", "??"]
+
+def fake_feedback(r):
+    fb = {}
+    if r.random() < .7:
+        fb["reaction_count"] = {"count": r.randint(0, 5000)}
+    if r.random() < .5:
+        fb["top_reactions"] = {"edges": [
+            {"node": {"id": r.choice(list(REACTION_ID_MAP) + ["0"]), "localized_name": r.choice(_REACTION_NAMES)},
+             "reaction_count": r.choice([r.randint(0, 900), None])} for _ in range(r.randint(0, 4))]}
+    if r.random() < .5:
+        fb["share_count"] = {"count": r.randint(0, 300)}
+    if r.random() < .3:
+        fb["i18n_share_count"] = r.choice(["1.234", "5", "2,1K", None])
+    if r.random() < .2:
+        fb[r.choice(["sharecount", "resharesCount"])] = r.randint(0, 99)
+    if r.random() < .5:
+        fb["comments_count_summary_renderer"] = {"feedback": {"comment_rendering_instance": {
+            "comments": {"total_count": r.randint(0, 999)}, "top_level_comments": {"count": r.randint(0, 999)}}}}
+    if r.random() < .4:
+        fb[r.choice(["total_comment_count", "comment_count", "commentsCount", "display_comments_count"])] = r.randint(0, 500)
+    if r.random() < .2:
+        fb["comment_count"] = {"count": r.randint(0, 500)}
+    if r.random() < .3:
+        fb["i18n_comment_count"] = r.choice(["1.024", "7", "3,5K"])
+    if r.random() < .25:
+        if r.random() < .5:
+            fb["reactors"] = [{"reactionType": r.choice(list(REACTION_KEYS) + ["like", "X"]), "count": r.randint(0, 300)}
+                              for _ in range(r.randint(1, 4))]
+        else:
+            fb["reactions"] = [{"key": r.choice(list(REACTION_KEYS)), "total_count": r.randint(0, 300)}
+                               for _ in range(r.randint(1, 4))]
+    return fb
+
+def fake_story(r, depth):
+    sid = str(r.randint(10**14, 10**15))
+    s = {"__typename": "Story", "id": "UzpfS" + sid, "post_id": sid,
+         "wwwURL": f"https://www.facebook.com/groups/g/permalink/{sid}/",
+         "comet_sections": {"feedback": {"story": {"feedback_context": {"feedback_target_with_context": {
+             "comet_ufi_summary_and_actions_renderer": {"feedback": fake_feedback(r)}}}}}},
+         "pad": [{"x": {"y": [i, {"z": "text"}]}} for i in range(r.randint(0, 30))]}
+    if depth > 0 and r.random() < .6:
+        s["comet_sections"]["attached_story"] = {"story": fake_story(r, depth - 1)}
+    return s
+
+def fake_pages(n, seed=0):
+    r = random.Random(seed)
+    return [{"data": {"node": {"group_feed": {"edges": [{"node": fake_story(r, r.randint(0, 3))} for _ in range(8)]}}}}
+            for _ in range(max(1, n // 8))]
+
+def _time(fn, stories, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(stories)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+def _run_new(pages):
+    out = []
+    for stories in pages:
+        memo = {}  # 1 memo / response như build_post_item trong ResponseAnalysis
+        out.append([extract_reactions_and_counts(n, memo) for n in stories])
+    return out
+
+def _run_old(pages):
+    return [[_legacy_extract_reactions_and_counts(n) for n in stories] for stories in pages]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=str(RAW_DUMPS_DIR), help="Thư mục raw archive (index.ndjson + pack-*.bin).")
+    ap.add_argument("--limit", type=int, default=0, help="Số response tối đa (0 = tất cả).")
+    ap.add_argument("--fake", type=int, default=2000, help="Số story giả khi archive trống.")
+    ap.add_argument("--repeat", type=int, default=3, help="Số lượt đo, lấy lượt nhanh nhất.")
+    args = ap.parse_args()
+
+    pages = [collect_stories(list(iter_json_values(b)), []) for b in archive_bodies(args.root, args.limit)]
+    source = args.root
+    if not any(pages):
+        pages = [collect_stories(p, []) for p in fake_pages(args.fake)]
+        source = "story giả"
+    n_stories = sum(len(p) for p in pages)
+
+    old, new = _run_old(pages), _run_new(pages)
+    diff = 0
+    for i, (po, pn) in enumerate(zip(old, new)):
+        for j, (a, b) in enumerate(zip(po, pn)):
+            if a != b:
+                diff += 1
+                keys = sorted(k for k in a if a[k] != b.get(k))
+                print(f"[PARITY] response #{i} story #{j}: khác {', '.join(f'{k} {a[k]}→{b.get(k)}' for k in keys)}")
+
+    t_old = _time(_run_old, pages, args.repeat)
+    t_new = _time(_run_new, pages, args.repeat)
+    print(f"[PARITY] {n_stories} story ({len(pages)} response, nguồn: {source}), khác kết quả: {diff}")
+    print(f"[PARITY] cũ {t_old * 1e3:.0f} ms, mới {t_new * 1e3:.0f} ms → x{t_old / t_new:.2f}")
+    raise SystemExit(1 if diff else 0)
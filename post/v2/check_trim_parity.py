@@ -0,0 +1,41 @@
+# =========================
+# Kiểm tra --trim không đổi kết quả: body gốc vs body đã __trimBody → cùng row build_post_item + cursor
+# =========================
+#   python check_trim_parity.py [--root database/raw_dumps] [--limit 0]
+# Cần node; body lấy từ raw archive ghi lúc chạy KHÔNG --trim (archive lưu đúng text Python nhận được).
+import argparse
+from configs import *
+from automation import _TRIM_JS, _trim_spec
+from utils import ResponseAnalysis, choose_best_graphql_obj, iter_json_spans
+from shared.trim_parity import archive_bodies, trim_bodies
+
+def analyze(text):
+    obj = choose_best_graphql_obj(iter_json_spans(text))
+    if obj is None:
+        return None
+    ra = ResponseAnalysis(obj)
+    return ra.posts, ra.cursor, ra.has_next
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=str(RAW_DUMPS_DIR), help="Thư mục raw archive (index.ndjson + pack-*.bin).")
+    ap.add_argument("--limit", type=int, default=0, help="Số response tối đa (0 = tất cả).")
+    args = ap.parse_args()
+
+    bodies = archive_bodies(args.root, args.limit)
+    if not bodies:
+        raise SystemExit(f"Không có response nào trong {args.root}")
+    trimmed = trim_bodies(_TRIM_JS, _trim_spec(True), bodies)
+
+    diff, fallback, full, kept = 0, {}, 0, 0
+    for i, (body, t) in enumerate(zip(bodies, trimmed)):
+        full += t["full"]; kept += t["kept"]
+        if t["fallback"]:
+            fallback[t["fallback"]] = fallback.get(t["fallback"], 0) + 1
+            continue
+        if analyze(body) != analyze(t["text"]):
+            diff += 1
+            print(f"[PARITY] response #{i}: posts/cursor khác sau trim")
+    print(f"[PARITY] {len(bodies)} response, khác kết quả: {diff}, giữ nguyên (fallback): {fallback or 0}, "
+          f"byte còn {kept / max(full, 1):.1%}")
+    raise SystemExit(1 if diff else 0)
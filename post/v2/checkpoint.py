@@ -1,34 +1,256 @@
 # =========================
 # Checkpoint / Output
 # =========================
-import os, json
+import os, mmap, hashlib
+from array import array
+from bisect import bisect_left
+from heapq import merge
 from configs import *
+from json_utils import dump, dumps, load, loads
+from shared.ndjson import NdjsonWriter, close_ndjson_writers, flush_ndjson_writers, ndjson_writer as _ndjson_writer
+from shared.raw_archive import RawArchive
 from datetime import datetime
+
+# =========================
+# Seen-id index — hash 64-bit, mảng sort memory-map + delta trong RAM
+# =========================
+def _seen_hash(k) -> int:
+    return int.from_bytes(hashlib.blake2b(str(k).encode("utf-8"), digest_size=8).digest(), "little")
+
+class SeenIndex:
+    """
+    Thay cho set[str] seen_ids: `k in idx`, idx.add(k), idx.update(ks), len(idx).
+      - base: uint64 đã sort trong file `path`, mmap read-only, tra bằng bisect
+      - delta: set hash mới từ lần flush() trước
+      - bloom (tuỳ chọn): bit array trước base, trả "chưa thấy" không cần bisect
+    path=None → chỉ giữ trong RAM. flush() gộp delta vào file (ghi tmp rồi os.replace).
+    """
+    _BLOOM_BITS_PER_KEY = 10  # tối thiểu; số bit làm tròn lên luỹ thừa 2 → 10–20 bit/key, 2 probe → dương giả ~1.4–3%
+
+    def __init__(self, path=None, bloom: bool = False):
+        self.path = str(path) if path else None
+        self.bloom_on = bloom
+        self.delta = set()
+        self._mm = None
+        self._base = memoryview(b"").cast("Q")
+        self._bloom = None
+        self._open()
+
+    def _open(self):
+        if self.path and os.path.exists(self.path) and os.path.getsize(self.path) >= 8:
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._base = memoryview(self._mm).cast("Q")
+        # bloom giữ qua flush() (key của delta đã add vào bloom); chỉ dựng lại khi quá đầy
+        if self.bloom_on and (self._bloom is None or (len(self) * self._BLOOM_BITS_PER_KEY > self._bloom_mask + 1
+                                                      and self._bloom_mask < 0xFFFFFFFF)):
+            self._bloom_build()
+
+    def _close(self):
+        self._base.release()
+        self._base = memoryview(b"").cast("Q")
+        if self._mm is not None:
+            self._mm.close()  # Windows không cho os.replace file đang map
+            self._mm = None
+
+    def _bloom_build(self):
+        n = len(self._base) + len(self.delta)
+        self._bloom_mask = (1 << min(32, max(16, (n * self._BLOOM_BITS_PER_KEY).bit_length()))) - 1
+        self._bloom = bytearray((self._bloom_mask + 1) >> 3)
+        add = self._bloom_add
+        for h in self._base:
+            add(h)
+        for h in self.delta:
+            add(h)
+
+    # 2 vị trí = 2 nửa 32-bit của chính hash 64-bit (blake2b, đã đều) — không hash lại, không vòng lặp;
+    # phần kiểm tra nằm luôn trong _has_hash (không gọi hàm): "chưa thấy" phải rẻ hơn bisect, không thì
+    # bloom chỉ tốn thêm. Bit array tối đa 2^32 bit (mỗi nửa đủ đánh chỉ số).
+    def _bloom_add(self, h):
+        b, mask = self._bloom, self._bloom_mask
+        p = h & mask
+        b[p >> 3] |= 1 << (p & 7)
+        p = (h >> 32) & mask
+        b[p >> 3] |= 1 << (p & 7)
+
+    def _has_hash(self, h) -> bool:
+        if h in self.delta:
+            return True
+        b = self._bloom
+        if b is not None:
+            mask = self._bloom_mask
+            p = h & mask
+            if not (b[p >> 3] >> (p & 7)) & 1:
+                return False
+            p = (h >> 32) & mask
+            if not (b[p >> 3] >> (p & 7)) & 1:
+                return False
+        base = self._base
+        i = bisect_left(base, h)
+        return i < len(base) and base[i] == h
+
+    def __contains__(self, k) -> bool:
+        return self._has_hash(_seen_hash(k))
+
+    def add(self, k):
+        self.add_hashes((_seen_hash(k),))
+
+    def update(self, ks):
+        self.add_hashes(_seen_hash(k) for k in ks)
+
+    def add_hashes(self, hs):
+        for h in hs:
+            if not self._has_hash(h):
+                self.delta.add(h)
+                if self._bloom is not None:
+                    self._bloom_add(h)
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self.delta)
+
+    def flush(self):
+        if not self.path or not self.delta:
+            return
+        merged = array("Q", merge(self._base, sorted(self.delta)))
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            merged.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        self._close()
+        os.replace(tmp, self.path)
+        self.delta = set()
+        self._open()
+
+# =========================
+# Checkpoint = snapshot (CHECKPOINT) + journal append-only (CHECKPOINT_JOURNAL)
+# =========================
+# Mỗi save_checkpoint chỉ append 1 dòng delta {seq, kw, seen_h (hash)}; cứ
+# CHECKPOINT_COMPACT_EVERY dòng (hoặc khi truyền cả seen_ids) thì flush SeenIndex,
+# ghi snapshot atomic rồi xoá journal. Snapshot giữ "journal_seq" → replay bỏ qua
+# dòng cũ hơn, nên crash giữa các bước vẫn load đúng.
+_STATE = None      # state đầy đủ trong RAM (seen_ids là SeenIndex)
+_PENDING = 0       # số dòng journal từ snapshot gần nhất
+
+def _empty_state():
+    return {"cursor": None, "seen_ids": [], "vars_template": {}, "ts": None,
+            "mode": None, "slice_to": None, "slice_from": None, "year": None,
+            "page": None, "min_created": None}
+
+def _atomic_write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        dump(data, f, indent=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _load_state():
+    global _PENDING
+    state = _empty_state()
+    if os.path.exists(CHECKPOINT):
+        try:
+            with open(CHECKPOINT, "r", encoding="utf-8") as f:
+                state.update(load(f))
+        except:
+            state = _empty_state()
+    seen = SeenIndex(SEEN_INDEX, bloom=SEEN_BLOOM)
+    seen.update(state.get("seen_ids") or ())  # checkpoint cũ còn list → gộp vào index
+    state["seen_ids"] = seen
+    seq = state.get("journal_seq") or 0
+    _PENDING = 0
+    if os.path.exists(CHECKPOINT_JOURNAL):
+        with open(CHECKPOINT_JOURNAL, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = loads(line)
+                except Exception:
+                    continue  # dòng cuối ghi dở khi crash
+                if rec.get("seq", 0) <= seq:
+                    continue
+                seq = rec["seq"]
+                state.update(rec.get("kw") or {})
+                state["seen_ids"].add_hashes(rec.get("seen_h") or ())
+                state["seen_ids"].update(rec.get("seen_add") or ())  # journal cũ lưu id thô
+                state["ts"] = rec.get("ts")
+                _PENDING += 1
+    state["journal_seq"] = seq
+    return state
+
+def _compact():
+    global _PENDING
+    _STATE["seen_ids"].flush()  # index trước, snapshot sau
+    data = dict(_STATE)
+    data.pop("seen_ids", None)
+    data["seen_count"] = len(_STATE["seen_ids"])
+    _atomic_write_json(CHECKPOINT, data)
+    open(CHECKPOINT_JOURNAL, "w").close()
+    _PENDING = 0
+
 def load_checkpoint():
-    if not os.path.exists(CHECKPOINT):
-        return {"cursor": None, "seen_ids": [], "vars_template": {}, "ts": None,
-                "mode": None, "slice_to": None, "slice_from": None, "year": None,
-                "page": None, "min_created": None}
-    try:
-        with open(CHECKPOINT, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {"cursor": None, "seen_ids": [], "vars_template": {}, "ts": None,
-                "mode": None, "slice_to": None, "slice_from": None, "year": None,
-                "page": None, "min_created": None}
-
-def save_checkpoint(**kw):
-    data = load_checkpoint()
-    data.update(kw)
-    data["ts"] = datetime.now().isoformat(timespec="seconds")
-    with open(CHECKPOINT, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """state["seen_ids"] là SeenIndex (dùng chung với checkpoint, không copy)."""
+    global _STATE
+    _STATE = _load_state()
+    return dict(_STATE)
+
+def save_checkpoint(seen_add=None, **kw):
+    """
+    seen_add: id mới thấy từ lần save trước → chỉ append delta (hash) vào journal.
+    seen_ids: cả tập (cuối run/backfill) → gộp vào index và ghi snapshot luôn.
+    """
+    global _STATE, _PENDING
+    if _STATE is None:
+        _STATE = _load_state()
+    flush_ndjson_writers(durable=True)  # row phải nằm trên đĩa trước khi checkpoint coi id là đã thấy
+    full_seen = kw.pop("seen_ids", None)
+    ts = datetime.now().isoformat(timespec="seconds")
+    _STATE.update(kw)
+    _STATE["ts"] = ts
+    if full_seen is not None:
+        if full_seen is not _STATE["seen_ids"]:
+            _STATE["seen_ids"].update(full_seen)
+        _compact()
+        return
+
+    # không lọc theo index: caller thường dùng chính SeenIndex này và đã add trước
+    seen_h = [_seen_hash(x) for x in (seen_add or ())]
+    _STATE["seen_ids"].add_hashes(seen_h)
+    _STATE["journal_seq"] = (_STATE.get("journal_seq") or 0) + 1
+    rec = {"seq": _STATE["journal_seq"], "ts": ts, "kw": kw}
+    if seen_h:
+        rec["seen_h"] = seen_h
+    with open(CHECKPOINT_JOURNAL, "a", encoding="utf-8") as f:
+        f.write(dumps(rec) + "\n")
+    _PENDING += 1
+    if _PENDING >= CHECKPOINT_COMPACT_EVERY:
+        _compact()
+
+# =========================
+# NDJSON writer — bản dùng chung ở shared/ndjson.py, ở đây chỉ gắn NDJSON_FLUSH_* của post
+# =========================
+def ndjson_writer(path=OUT_NDJSON) -> NdjsonWriter:
+    return _ndjson_writer(path, flush_bytes=NDJSON_FLUSH_BYTES, flush_interval=NDJSON_FLUSH_INTERVAL)
 
 def append_ndjson(items):
     if not items: return
-    with open(OUT_NDJSON, "a", encoding="utf-8") as f:
-        for it in items:
-            f.write(json.dumps(it, ensure_ascii=False) + "\n")
+    ndjson_writer(OUT_NDJSON).write_many(items)
+
+# =========================
+# Raw archive — bản dùng chung ở shared/raw_archive.py, ở đây gắn RAW_* của post
+# =========================
+_RAW_ARCHIVE = None
+
+def raw_archive(mode=None) -> RawArchive:
+    """Archive dùng chung của process; mode (vd. từ --raw-archive) chỉ có tác dụng ở lần gọi đầu."""
+    global _RAW_ARCHIVE
+    if _RAW_ARCHIVE is None:
+        _RAW_ARCHIVE = RawArchive(RAW_DUMPS_DIR, mode=mode or RAW_ARCHIVE, sample_every=RAW_ARCHIVE_SAMPLE_EVERY,
+                                  pack_bytes=RAW_ARCHIVE_PACK_BYTES, level=RAW_ARCHIVE_LEVEL)
+    return _RAW_ARCHIVE
 
 def normalize_seen_ids(seen_ids):
-    return set(seen_ids or [])
+    if isinstance(seen_ids, SeenIndex):
+        return seen_ids
+    idx = SeenIndex()
+    idx.update(seen_ids or ())
+    return idx
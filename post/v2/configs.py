@@ -22,7 +22,38 @@ ALLOWED_COOKIE_DOMAINS = {".facebook.com", "facebook.com", "m.facebook.com", "we
 KEEP_LAST     = 350
 OUT_NDJSON    = HERE / "database" / "posts_all.ndjson"
 RAW_DUMPS_DIR = HERE / "database" / "raw_dumps"
+# Raw archive: "off" | "sample" (1/RAW_ARCHIVE_SAMPLE_EVERY trang) | "full" — response gốc, khoá theo hash, nén zstd
+RAW_ARCHIVE   = "full"
+RAW_ARCHIVE_SAMPLE_EVERY = 20
+RAW_ARCHIVE_PACK_BYTES   = 256 << 20
+RAW_ARCHIVE_LEVEL        = 6
 CHECKPOINT    = HERE / "database" / "checkpoint.json"
+CHECKPOINT_JOURNAL = HERE / "database" / "checkpoint.journal.ndjson"
+CHECKPOINT_COMPACT_EVERY = 200   # số dòng journal trước khi gộp vào snapshot
+SEEN_INDEX    = HERE / "database" / "seen_ids.u64"   # hash 64-bit đã sort của seen_ids
+SEEN_BLOOM    = False   # bật bloom filter trước SeenIndex: id mới khỏi bisect (tốn thêm 10–20 bit/key RAM)
+# NDJSON writer giữ file mở: ghi xuống khi buffer đủ FLUSH_BYTES hoặc quá FLUSH_INTERVAL giây
+NDJSON_FLUSH_BYTES    = 1 << 20
+NDJSON_FLUSH_INTERVAL = 2.0
+
+# Pipeline: số trang được fetch trước trong lúc trang hiện tại đang bóc/ghi (0 = tuần tự)
+PREFETCH_DEPTH = 0
+# Số trang script trong page tự đi theo end_cursor trong 1 lần gọi WebDriver (1 = từng trang)
+CHAIN_HOPS = 1
+
+# Cắt response trong page trước khi qua WebDriver (--trim): bỏ các key nặng extractor không đọc.
+# Subtree sắp bỏ mà chứa key/__typename bên dưới → giữ nguyên cả body.
+TRIM_RESPONSES   = False
+TRIM_DROP_KEYS   = {"dash_manifest", "dash_manifests", "dash_manifest_xml_string", "manifest_xml",
+                    "playlist", "representations", "all_video_dash_prefetch_representations",
+                    "dash_prefetch_experimental", "spherical_video_fallback_urls",
+                    "prefetch_uris", "prefetch_uris_v2",
+                    "encrypted_tracking", "tracking", "click_tracking_linkshim_cb"}
+# Guard thật = TRIM_GUARD_KEYS ∪ CURSOR_KEYS ∪ get_info.EXTRACT_KEYS (key extractor dò sâu), gộp trong automation._trim_spec
+TRIM_GUARD_KEYS  = {"page_info", "pageInfo", "end_cursor", "endCursor", "has_next_page", "hasNextPage",
+                    "expansion_token", "expansionToken", "feedback", "attachments",
+                    "progressive_url", "progressive_urls"}
+TRIM_GUARD_TYPES = {"Story", "Comment", "Feedback"}
 
 # Cursor
 CURSOR_KEYS = {"end_cursor","endCursor","after","afterCursor","feedAfterCursor","cursor"}
@@ -0,0 +1,88 @@
+# =========================
+# Benchmark ghi Excel tăng dần: write_posts_to_excel cũ (load_workbook + save mỗi lần) vs ExcelPostStore
+# =========================
+#   python bench_excel_append.py [--appends 100] [--rows 50] [--out bench_excel_tmp]
+# Mỗi lần append `--rows` post giả (cùng dạng row build_post_item); store mới materialize 1 lần cuối.
+# So 2 file .xlsx theo giá trị ô để chắc 2 đường cho cùng nội dung.
+import argparse, os, random, shutil, time
+from openpyxl import Workbook, load_workbook
+from export_to_excel_utils import _jsonable, _merge_headers, _normalize_created_time, ExcelPostStore
+
+def _legacy_write(posts, excel_path):
+    """write_posts_to_excel trước ExcelPostStore (giữ lại để so sánh)."""
+    if os.path.exists(excel_path):
+        wb = load_workbook(excel_path)
+        ws = wb.active
+        current_headers = [c.value for c in ws[1] if c.value]
+    else:
+        wb = Workbook()
+        ws = wb.active
+        current_headers = []
+    final_headers = _merge_headers(current_headers, posts)
+    if final_headers != current_headers:
+        for idx, h in enumerate(final_headers, start=1):
+            ws.cell(row=1, column=idx, value=h)
+    start_row = ws.max_row + 1
+    for p in posts:
+        for col_idx, col_name in enumerate(final_headers, start=1):
+            val = p.get(col_name)
+            if col_name == "created_time":
+                val = _normalize_created_time(val)
+            ws.cell(row=start_row, column=col_idx, value=_jsonable(val))
+        start_row += 1
+    wb.save(excel_path)
+
+def fake_posts(r, n):
+    out = []
+    for _ in range(n):
+        pid = str(r.randint(10**14, 10**15))
+        p = {"id": pid, "rid": pid, "type": "story", "link": f"https://www.facebook.com/groups/g/posts/{pid}/",
+             "author_id": str(r.randint(10**9, 10**10)), "author": f"Tên {r.randint(0, 999)}",
+             "created_time": r.randint(1600000000, 1700000000), "content": "nội dung " * r.randint(1, 40),
+             "image_url": [f"https://img/{r.randint(0, 9)}"] * r.randint(0, 3), "like": r.randint(0, 999),
+             "comment": r.randint(0, 99), "share": r.randint(0, 50), "hashtag": [], "is_share": r.random() < .2}
+        if r.random() < .05:
+            p["share_meta"] = {"og_title": "tiêu đề"}  # key mới giữa chừng → header tiến hoá
+        out.append(p)
+    return out
+
+def _cells(path):
+    wb = load_workbook(path, read_only=True)
+    rows = [tuple(v for v in row) for row in wb.active.iter_rows(values_only=True)]
+    wb.close()
+    # cột trống cuối hàng: bản cũ có thể không có ô, bản mới ghi None
+    return [tuple(row[:len(rows[0])]) + (None,) * (len(rows[0]) - len(row)) for row in rows]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--appends", type=int, default=100, help="Số lần gọi ghi.")
+    ap.add_argument("--rows", type=int, default=50, help="Số post mỗi lần ghi.")
+    ap.add_argument("--out", default="bench_excel_tmp", help="Thư mục tạm (bị xoá rồi tạo lại).")
+    args = ap.parse_args()
+
+    shutil.rmtree(args.out, ignore_errors=True)
+    os.makedirs(args.out)
+    r = random.Random(0)
+    batches = [fake_posts(r, args.rows) for _ in range(args.appends)]
+
+    old_path = os.path.join(args.out, "old.xlsx")
+    t0 = time.perf_counter()
+    for b in batches:
+        _legacy_write(b, old_path)
+    t_old = time.perf_counter() - t0
+
+    new_path = os.path.join(args.out, "new.xlsx")
+    t0 = time.perf_counter()
+    st = ExcelPostStore(new_path)
+    for b in batches:
+        st.append(b)
+    t_append = time.perf_counter() - t0
+    st.materialize()
+    t_new = time.perf_counter() - t0
+
+    same = _cells(old_path) == _cells(new_path)
+    print(f"[BENCH] {args.appends} lần x {args.rows} post, cùng nội dung: {same}")
+    print(f"[BENCH] cũ : {t_old:.2f}s ({t_old / args.appends * 1e3:.0f} ms/lần)")
+    print(f"[BENCH] mới: {t_new:.2f}s (append {t_append / args.appends * 1e3:.1f} ms/lần + materialize "
+          f"{t_new - t_append:.2f}s) → x{t_old / t_new:.1f}")
+    shutil.rmtree(args.out, ignore_errors=True)
@@ -1,8 +1,10 @@
+import atexit
 import json
 import os
 from datetime import datetime
 from typing import Dict, Any, List
 from openpyxl import Workbook, load_workbook  # thêm import cho Excel
+from json_utils import dump, dumps, load, loads
 
 EXCEL_PATH = "data/thoibaode_db.xlsx"
 
@@ -28,21 +30,14 @@ def _normalize_created_time(val):
         return datetime.utcfromtimestamp(val).strftime("%Y-%m-%d %H:%M:%S")
     return val
 
-def write_posts_to_excel(posts: List[Dict[str, Any]], excel_path: str = EXCEL_PATH):
-    if not posts:
-        return
+def _stageable(val):
+    """Giá trị ô → kiểu JSON cho staging; còn lại (datetime từ .xlsx cũ...) thành str như default=str cũ."""
+    if val is None or isinstance(val, (str, int, float, bool)):
+        return val
+    return str(val)
 
-    # 1) Nếu đã có file → mở, không thì tạo mới
-    if os.path.exists(excel_path):
-        wb = load_workbook(excel_path)
-        ws = wb.active
-        current_headers = [c.value for c in ws[1] if c.value]
-    else:
-        wb = Workbook()
-        ws = wb.active
-        current_headers = []
-
-    # 2) Tập header cuối cùng
+def _merge_headers(current_headers: List[str], posts: List[Dict[str, Any]]) -> List[str]:
+    """Header cũ giữ nguyên thứ tự → thêm REQUIRED_COLUMNS còn thiếu → key mới (sort) của batch."""
     final_headers = list(current_headers) if current_headers else list(REQUIRED_COLUMNS)
 
     for col in REQUIRED_COLUMNS:
@@ -55,21 +50,113 @@ def write_posts_to_excel(posts: List[Dict[str, Any]], excel_path: str = EXCEL_PA
     for k in sorted(extra_keys):
         if k not in final_headers:
             final_headers.append(k)
+    return final_headers
 
-    # 3) Nếu header thay đổi → ghi lại hàng 1
-    if final_headers != current_headers:
-        for idx, h in enumerate(final_headers, start=1):
-            ws.cell(row=1, column=idx, value=h)
+class ExcelPostStore:
+    """
+    Store .xlsx cho write_posts_to_excel, không load_workbook + save cả file mỗi lần ghi:
+      - append(posts): chuẩn hoá row rồi nối ngay vào staging <excel>.rows.ndjson (1 dòng / row)
+        → mỗi lần ghi O(số row mới), không O(tổng số dòng); row không nằm chờ trong RAM
+      - header tiến hoá như trước, lưu ở <excel>.headers.json (chỉ ghi khi đổi)
+      - materialize(): dựng lại .xlsx từ staging bằng openpyxl write-only (ghi tmp rồi os.replace)
+    File .xlsx có từ trước (chưa có staging) được nạp vào staging 1 lần khi mở store.
+    Staging là bản gốc: sửa tay trong .xlsx sẽ bị ghi đè ở lần materialize sau.
+    """
+    def __init__(self, excel_path: str = EXCEL_PATH):
+        self.excel_path = excel_path
+        self.rows_path = excel_path + ".rows.ndjson"
+        self.headers_path = excel_path + ".headers.json"
+        self.dirty = False
+        self.headers: List[str] = []
+        d = os.path.dirname(excel_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        if os.path.exists(self.headers_path):
+            with open(self.headers_path, "r", encoding="utf-8") as f:
+                self.headers = load(f)
+        elif os.path.exists(excel_path):
+            self._seed_from_xlsx()
 
-    # 4) Ghi từng post
-    start_row = ws.max_row + 1
-    for p in posts:
-        for col_idx, col_name in enumerate(final_headers, start=1):
-            val = p.get(col_name)
-            if col_name == "created_time":
-                val = _normalize_created_time(val)
-            val = _jsonable(val)
-            ws.cell(row=start_row, column=col_idx, value=val)
-        start_row += 1
-
-    wb.save(excel_path)
+    def _seed_from_xlsx(self):
+        wb = load_workbook(self.excel_path, read_only=True)
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        self.headers = [h for h in header if h]
+        with open(self.rows_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                rec = {h: _stageable(v) for h, v in zip(header, row) if h and v is not None}
+                if rec:
+                    f.write(dumps(rec) + "\n")
+        wb.close()
+        self._save_headers()
+
+    def _save_headers(self):
+        tmp = self.headers_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            dump(self.headers, f)
+        os.replace(tmp, self.headers_path)
+
+    def append(self, posts: List[Dict[str, Any]]):
+        if not posts:
+            return
+        headers = _merge_headers(self.headers, posts)
+        lines = []
+        for p in posts:
+            row = {}
+            for k, val in p.items():
+                if k == "created_time":
+                    val = _normalize_created_time(val)
+                row[k] = _stageable(_jsonable(val))
+            lines.append(dumps(row) + "\n")
+        # header trước row: chết giữa 2 lần ghi thì chỉ thừa cột rỗng, không mất cột của row đã ghi
+        if headers != self.headers:
+            self.headers = headers
+            self._save_headers()
+        with open(self.rows_path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+        self.dirty = True
+
+    def materialize(self):
+        """Ghi .xlsx đầy đủ: header hiện tại + mọi row trong staging, streaming (RAM không theo số dòng)."""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet")
+        headers = self.headers
+        ws.append(headers)
+        if os.path.exists(self.rows_path):
+            with open(self.rows_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rec = loads(line)
+                        ws.append([rec.get(h) for h in headers])
+        tmp = self.excel_path + ".tmp.xlsx"
+        wb.save(tmp)
+        os.replace(tmp, self.excel_path)
+        self.dirty = False
+
+_STORES: Dict[str, ExcelPostStore] = {}
+
+def excel_store(excel_path: str = EXCEL_PATH) -> ExcelPostStore:
+    key = os.path.abspath(excel_path)
+    st = _STORES.get(key)
+    if st is None:
+        st = _STORES[key] = ExcelPostStore(excel_path)
+    return st
+
+def materialize_excel_stores():
+    for st in _STORES.values():
+        if st.dirty:
+            st.materialize()
+
+atexit.register(materialize_excel_stores)
+
+def write_posts_to_excel(posts: List[Dict[str, Any]], excel_path: str = EXCEL_PATH, materialize: bool = False):
+    """
+    Ghi thêm posts. Row vào staging ngay; .xlsx được dựng lại khi materialize=True,
+    khi gọi materialize_excel_stores(), hoặc lúc thoát process.
+    """
+    if not posts:
+        return
+    st = excel_store(excel_path)
+    st.append(posts)
+    if materialize:
+        st.materialize()
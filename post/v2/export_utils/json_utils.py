@@ -0,0 +1,9 @@
+# Shim: codec thật nằm ở <repo>/shared/json_utils.py (dùng chung post/v2 + comment/v2).
+# Script trong export_utils chạy từ thư mục của nó nên thêm gốc repo vào sys.path tại đây.
+import os, sys
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from shared.json_utils import *  # noqa: E402,F401,F403
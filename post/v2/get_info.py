@@ -19,13 +19,255 @@ def _deep_iter(obj):
         for v in obj:
             yield from _deep_iter(v)
 
-def deep_get_first(obj, want_keys):
+def deep_get_first(obj, want_keys, memo=None):
     want = {k.lower() for k in want_keys}
-    for k, v in _deep_iter(obj):
+    # index key → (parent, value) lần xuất hiện đầu, theo thứ tự pre-order
+    for k, (_parent, v) in _subtree_summary(obj, {} if memo is None else memo)["keys"].items():
         if isinstance(k, str) and k.lower() in want:
             return k, v
     return None, None
 
+# =========================
+# Subtree summary (bottom-up): mỗi story chỉ duyệt 1 lần / response
+# =========================
+# Story lồng nhau (bài share → attached_story) trước đây bị mọi extract_* duyệt
+# lại toàn bộ ở cả cha lẫn con. Giờ một lần duyệt pre-order gom đủ dữ liệu cho
+# các helper; gặp story con thì lấy summary đã memo (theo id(node)) ghép vào cha.
+# "keys" là index key → (parent, value) của lần xuất hiện ĐẦU TIÊN trong subtree;
+# dict giữ thứ tự chèn = thứ tự pre-order nên tra "key đầu tiên" không cần duyệt lại.
+_IMAGE_KEYS   = ("image", "previewImage", "photo_image", "preferred_thumbnail")
+_VIDEO_KEYS   = ("playable_url_quality_hd", "playable_url",
+                 "browser_native_hd_url", "browser_native_sd_url")
+_TS_KEYS      = {"creation_time", "created_time", "creationTime", "createdTime"}
+_CREATED_KEYS = ("creation_time", "created_time", "creationTime")
+_ATT_URL_KEYS = ("url", "canonical_url", "source", "href", "permalink_url", "external_url")
+_ATT_META_KEYS = (("title", "og_title"), ("subtitle", "og_desc"),
+                  ("site_name", "og_site_name"), ("publisher", "og_site_name"))
+_TEXT_SKIP    = {"see more", "xem thêm"}
+_TEXT_DICT_KEYS = ("message", "body", "savable_description")                        # {"text": ...}
+_TEXT_KEYS      = ("title", "subtitle", "headline", "label", "contextual_message")  # str hoặc {"text": ...}
+_SHARE_INT_KEYS   = ("sharecount", "resharesCount")
+_COMMENT_INT_KEYS = ("total_comment_count", "comment_count", "commentsCount", "display_comments_count")
+_ATTACHED_KEYS  = ("attached_story", "attachedStory", "attached_share_story")
+_GROUP_ID_KEYS  = {"group_id", "groupID", "groupIDV2"}
+# key so trực tiếp (==) trong _summary_take_*, _is_story_node, extract_author (avatar uri)
+_MATCH_KEYS   = ("text", "uri", "videoDeliveryResponseFragment", "share_count", "i18n_share_count",
+                 "comments_count_summary_renderer", "i18n_comment_count", "top_reactions", "reaction_count",
+                 "reactionType", "total_count", "__isFeedUnit", "post_id", "comet_sections")
+# Mọi key extractor dò ở bất kỳ độ sâu nào trong story → --trim không được bỏ subtree chứa chúng
+# (automation._trim_spec gộp với TRIM_GUARD_KEYS). Thêm key dò sâu mới thì thêm vào các bộ trên.
+EXTRACT_KEYS  = frozenset((*_IMAGE_KEYS, *_VIDEO_KEYS, *_TS_KEYS, *_CREATED_KEYS, *_ATT_URL_KEYS,
+                           *(k for k, _ in _ATT_META_KEYS), *_TEXT_DICT_KEYS, *_TEXT_KEYS, *_SHARE_INT_KEYS,
+                           *_COMMENT_INT_KEYS, *_ATTACHED_KEYS, *_GROUP_ID_KEYS, *_MATCH_KEYS))
+
+def _as_epoch_s(x):
+    try:
+        v = int(x)
+        if v > 10_000_000_000: v //= 1000
+        if 1104537600 <= v <= 4102444800:  # 2005..2100
+            return v
+    except: pass
+    return None
+
+def _new_summary():
+    counts = {v: 0 for v in REACTION_KEYS.values()}
+    counts.update({"comment": 0, "share": 0})
+    return {
+        "images": [], "videos": [], "progressive": [],
+        "counts": counts, "reaction_total": 0, "found_breakdown": False,
+        "ts_max": None,
+        "created_first": None,   # (value,) khi đã gặp
+        "keys": {},
+        "att_urls": [], "att_meta": {},
+        "texts": [],
+    }
+
+def _merge_summary(dst, src):
+    for k in ("images", "videos", "progressive", "att_urls", "texts"):
+        if src[k]: dst[k].extend(src[k])
+    dc = dst["counts"]
+    for k, c in src["counts"].items():
+        if c > dc[k]: dc[k] = c
+    dst["reaction_total"] = max(dst["reaction_total"], src["reaction_total"])
+    dst["found_breakdown"] = dst["found_breakdown"] or src["found_breakdown"]
+    if src["ts_max"] is not None and (dst["ts_max"] is None or src["ts_max"] > dst["ts_max"]):
+        dst["ts_max"] = src["ts_max"]
+    if dst["created_first"] is None: dst["created_first"] = src["created_first"]
+    dk = dst["keys"]
+    for k, pv in src["keys"].items():
+        if k not in dk: dk[k] = pv
+    for k, v in src["att_meta"].items():
+        dst["att_meta"].setdefault(k, v)
+
+def _summary_take_dict(acc, x):
+    """Các check trên CHÍNH dict x (trước khi xuống con) — attachment URL/meta + text."""
+    for k in _ATT_URL_KEYS:
+        v = x.get(k)
+        if isinstance(v, str):
+            u = _clean_url(v)
+            if u: acc["att_urls"].append(u)
+    meta = acc["att_meta"]
+    for (k1, k2) in _ATT_META_KEYS:
+        if isinstance(x.get(k1), dict) and isinstance(x[k1].get("text"), str):
+            meta.setdefault(k2, x[k1]["text"].strip())
+        elif isinstance(x.get(k1), str):
+            meta.setdefault(k2, x[k1].strip())
+
+    texts = acc["texts"]
+    def take(t):
+        if isinstance(t, str):
+            t = t.strip()
+            if t and t.lower() not in _TEXT_SKIP:
+                texts.append(t)
+    if "text" in x and isinstance(x["text"], str): take(x["text"])
+    for k in _TEXT_DICT_KEYS:
+        if k in x and isinstance(x[k], dict):
+            if isinstance(x[k].get("text"), str): take(x[k]["text"])
+    for k in _TEXT_KEYS:
+        val = x.get(k)
+        if isinstance(val, dict) and isinstance(val.get("text"), str): take(val["text"])
+        elif isinstance(val, str): take(val)
+
+def _summary_take_kv(acc, parent, k, v):
+    """Các check trên từng cặp (key, value) — thứ tự/ngữ nghĩa như các vòng _deep_iter cũ."""
+    if k not in acc["keys"]:
+        acc["keys"][k] = (parent, v)
+    counts = acc["counts"]
+
+    # ---- media
+    if k in _IMAGE_KEYS and isinstance(v, dict):
+        uri = v.get("uri") or v.get("url")
+        if isinstance(uri, str) and uri.startswith("http"):
+            acc["images"].append(uri)
+    if k in _VIDEO_KEYS and isinstance(v, str) and v.startswith("http"):
+        acc["videos"].append(v)
+    # Video kiểu REEL: videoDeliveryResponseFragment.videoDeliveryResponseResult.progressive_urls
+    if k == "videoDeliveryResponseFragment" and isinstance(v, dict):
+        res = v.get("videoDeliveryResponseResult") or {}
+        for item in res.get("progressive_urls") or []:
+            url = item.get("progressive_url")
+            if isinstance(url, str) and url.startswith("http"):
+                acc["progressive"].append(url)
+
+    # ---- SHARE (new style + fallback string)
+    if k == "share_count" and isinstance(v, dict):
+        c = v.get("count")
+        if isinstance(c, int):
+            counts["share"] = max(counts["share"], c)
+    if k == "i18n_share_count":  # "1.2K", "5"...
+        try:
+            # FB VN thường dùng "." làm thousand sep trong i18n — ta gỡ hết
+            c = int(str(v).replace(".", "").replace(",", ""))
+            counts["share"] = max(counts["share"], c)
+        except:
+            pass
+    # Kiểu cũ (đôi khi có nguyên int):
+    if k in _SHARE_INT_KEYS and isinstance(v, int):
+        counts["share"] = max(counts["share"], v)
+
+    # ---- COMMENT
+    # 1) Comet summary renderer (mới)
+    #    comet_ufi_summary_and_actions_renderer.feedback.comment_rendering_instance.comments.total_count
+    if k == "comments_count_summary_renderer" and isinstance(v, dict):
+        fb = v.get("feedback") or {}
+        cri = fb.get("comment_rendering_instance") or {}
+        tc = (cri.get("comments") or {}).get("total_count")
+        if isinstance(tc, int):
+            counts["comment"] = max(counts["comment"], tc)
+        # đôi khi đặt tên khác
+        tc2 = (cri.get("top_level_comments") or {}).get("count")
+        if isinstance(tc2, int):
+            counts["comment"] = max(counts["comment"], tc2)
+    # 2) Rải rác ở các field khác (fallback)
+    if k in _COMMENT_INT_KEYS:
+        if isinstance(v, int):
+            counts["comment"] = max(counts["comment"], v)
+    # Có nơi wrap thành dict {count: <int>}
+    if k == "comment_count" and isinstance(v, dict):
+        c = v.get("count")
+        if isinstance(c, int):
+            counts["comment"] = max(counts["comment"], c)
+    if k == "i18n_comment_count":
+        try:
+            c = int(str(v).replace(".", "").replace(",", ""))
+            counts["comment"] = max(counts["comment"], c)
+        except:
+            pass
+
+    # ---- REACTIONS (new style): top_reactions.edges[].node.{id|localized_name} + reaction_count
+    if k == "top_reactions" and isinstance(v, dict):
+        for e in v.get("edges") or []:
+            if not isinstance(e, dict):
+                continue
+            node = (e.get("node") or {})
+            rid  = node.get("id")
+            rname= node.get("localized_name")
+            rkey = None
+            if isinstance(rid, str) and rid in REACTION_ID_MAP:
+                rkey = REACTION_ID_MAP[rid]
+            if not rkey and rname:
+                rkey = _norm_reaction_name(rname)
+            rc = e.get("reaction_count")
+            if rkey in REACTION_KEYS.values() and isinstance(rc, int):
+                counts[rkey] = max(counts[rkey], rc)
+                acc["found_breakdown"] = True
+    # tổng (new style): reaction_count.count
+    if k == "reaction_count" and isinstance(v, dict):
+        c = v.get("count")
+        if isinstance(c, int):
+            acc["reaction_total"] = max(acc["reaction_total"], c)
+    # ---- REACTIONS (kiểu cũ list [reactionType/key]:count/total_count)
+    if isinstance(v, list) and v and isinstance(v[0], dict) and (
+        ("reactionType" in v[0] and "count" in v[0]) or
+        ("key" in v[0] and "total_count" in v[0])
+    ):
+        for it in v:
+            rtype = (it.get("reactionType") or it.get("key") or "")
+            cnt = it.get("count") if "count" in it else it.get("total_count")
+            if isinstance(rtype, str):
+                rtype = rtype.upper()
+            if rtype in REACTION_KEYS and isinstance(cnt, int):
+                counts[REACTION_KEYS[rtype]] = max(counts[REACTION_KEYS[rtype]], cnt)
+
+    # ---- thời gian tạo
+    if k in _TS_KEYS:
+        ts = _as_epoch_s(v)
+        if ts and (acc["ts_max"] is None or ts > acc["ts_max"]):
+            acc["ts_max"] = ts
+    if acc["created_first"] is None and k in _CREATED_KEYS and isinstance(v, (int, float, str)):
+        acc["created_first"] = (v,)
+
+def _summarize_into(acc, obj, memo):
+    if isinstance(obj, dict):
+        _summary_take_dict(acc, obj)
+        for k, v in obj.items():
+            _summary_take_kv(acc, obj, k, v)
+            if isinstance(v, dict) and _is_story_node(v):
+                _merge_summary(acc, _subtree_summary(v, memo))
+            elif isinstance(v, (dict, list)):
+                _summarize_into(acc, v, memo)
+    elif isinstance(obj, list):
+        for v in obj:
+            if isinstance(v, dict) and _is_story_node(v):
+                _merge_summary(acc, _subtree_summary(v, memo))
+            elif isinstance(v, (dict, list)):
+                _summarize_into(acc, v, memo)
+
+def _subtree_summary(obj, memo):
+    """
+    Summary của cả subtree `obj` (gồm chính nó). Story node được memo theo id()
+    trong `memo` (sống trong phạm vi 1 response) để cha dùng lại kết quả của con.
+    """
+    key = id(obj)
+    hit = memo.get(key)
+    if hit is not None:
+        return hit
+    acc = _new_summary()
+    _summarize_into(acc, obj, memo)
+    if isinstance(obj, dict) and _is_story_node(obj):
+        memo[key] = acc
+    return acc
+
 def extract_author(n):
     actor = None
     if isinstance(n.get("actors"), list) and n["actors"]:
@@ -64,48 +306,12 @@ def extract_author(n):
 
     return aid, name, link, avatar, etype
 
-def extract_media(n):
+def extract_media(n, memo=None):
     """Trả về (image_urls[], video_urls[])"""
-    image_urls, video_urls = [], []
-
-    # 1) Ảnh – giữ nguyên logic cũ
-    for k, v in _deep_iter(n):
-        if k in ("image", "previewImage", "photo_image", "preferred_thumbnail"):
-            if isinstance(v, dict):
-                uri = v.get("uri") or v.get("url")
-                if isinstance(uri, str) and uri.startswith("http"):
-                    if uri not in image_urls:
-                        image_urls.append(uri)
-
-    # 2) Video kiểu cũ (post thường)
-    for k, v in _deep_iter(n):
-        if k in ("playable_url_quality_hd", "playable_url",
-                 "browser_native_hd_url", "browser_native_sd_url"):
-            if isinstance(v, str) and v.startswith("http"):
-                if v not in video_urls:
-                    video_urls.append(v)
-
-    # 3) Video kiểu REEL / kiểu mới (như JSON ông dán)
-    # tìm block videoDeliveryResponseFragment
-    for k, v in _deep_iter(n):
-        if k == "videoDeliveryResponseFragment" and isinstance(v, dict):
-            res = v.get("videoDeliveryResponseResult") or {}
-            # 3.1 progressive_urls -> đây chính là link mp4 ông muốn
-            prog_list = res.get("progressive_urls") or []
-            for item in prog_list:
-                url = item.get("progressive_url")
-                if isinstance(url, str) and url.startswith("http"):
-                    if url not in video_urls:
-                        video_urls.append(url)
-
-            # 3.2 nếu muốn lưu luôn dash_manifest_urls thì lấy ở đây
-            # dash_list = res.get("dash_manifest_urls") or []
-            # for item in dash_list:
-            #     murl = item.get("manifest_url")
-            #     if isinstance(murl, str) and murl.startswith("http"):
-            #         if murl not in video_urls:
-            #             video_urls.append(murl)
-
+    s = _subtree_summary(n, {} if memo is None else memo)
+    # ảnh giữ thứ tự xuất hiện; video: kiểu cũ (playable_*) trước, progressive (REEL) sau
+    image_urls = list(dict.fromkeys(s["images"]))
+    video_urls = list(dict.fromkeys(s["videos"] + s["progressive"]))
     return image_urls, video_urls
 
 
@@ -138,7 +344,7 @@ def _norm_reaction_name(name: str) -> str | None:
     }
     return mapping.get(s)
 # --- [3] REPLACE: extract_reactions_and_counts với hỗ trợ đầy đủ UFI (new + old)
-def extract_reactions_and_counts(n):
+def extract_reactions_and_counts(n, memo=None):
     """
     Trích xuất reactions / comment / share từ cả kiểu cũ (UFI cũ) lẫn kiểu mới (Comet):
       - feedback.reaction_count.count
@@ -148,126 +354,26 @@ def extract_reactions_and_counts(n):
       - (fallback) total_comment_count, comment_count, display_comments_count, ...
     Trả về dict: {"like","love","haha","wow","sad","angry","care","comment","share"}
     """
-    counts = {v: 0 for v in REACTION_KEYS.values()}
-    counts.update({"comment": 0, "share": 0})
-
-    # ---- A) SHARE (new style + fallback string)
-    for k, v in _deep_iter(n):
-        if k == "share_count" and isinstance(v, dict):
-            c = v.get("count")
-            if isinstance(c, int):
-                counts["share"] = max(counts["share"], c)
-        if k == "i18n_share_count":  # "1.2K", "5"...
-            try:
-                s = str(v).replace(".", "").replace(",", "")
-                # FB VN thường dùng "." làm thousand sep trong i18n — ta gỡ hết
-                c = int(s)
-                counts["share"] = max(counts["share"], c)
-            except:
-                pass
-        # Kiểu cũ (đôi khi có nguyên int):
-        if k in ("sharecount", "resharesCount") and isinstance(v, int):
-            counts["share"] = max(counts["share"], v)
-
-    # ---- B) COMMENT (đủ pattern)
-    # 1) Comet summary renderer (mới)
-    #    comet_ufi_summary_and_actions_renderer.feedback.comment_rendering_instance.comments.total_count
-    total_cmt = 0
-    for k, v in _deep_iter(n):
-        if k == "comments_count_summary_renderer" and isinstance(v, dict):
-            fb = v.get("feedback") or {}
-            # path 1: như JSON bạn gửi
-            cri = fb.get("comment_rendering_instance") or {}
-            comments = cri.get("comments") or {}
-            tc = comments.get("total_count")
-            if isinstance(tc, int):
-                total_cmt = max(total_cmt, tc)
-            # path 2: đôi khi đặt tên khác
-            tlc = cri.get("top_level_comments") or {}
-            tc2 = tlc.get("count")
-            if isinstance(tc2, int):
-                total_cmt = max(total_cmt, tc2)
-
-    # 2) Rải rác ở các field khác (fallback)
-    for k, v in _deep_iter(n):
-        if k in ("total_comment_count", "comment_count", "commentsCount", "display_comments_count"):
-            if isinstance(v, int):
-                total_cmt = max(total_cmt, v)
-        # Có nơi wrap thành dict {count: <int>}
-        if k == "comment_count" and isinstance(v, dict):
-            c = v.get("count")
-            if isinstance(c, int):
-                total_cmt = max(total_cmt, c)
-        if k == "i18n_comment_count":
-            try:
-                c = int(str(v).replace(".", "").replace(",", ""))
-                total_cmt = max(total_cmt, c)
-            except:
-                pass
-    counts["comment"] = max(counts["comment"], total_cmt)
-
-    # ---- C) REACTIONS (new style breakdown + total)
-    found_breakdown = False
-    # 1) breakdown mới: top_reactions.edges[].node.{id|localized_name} + reaction_count
-    for k, v in _deep_iter(n):
-        if k == "top_reactions" and isinstance(v, dict):
-            edges = v.get("edges") or []
-            for e in edges:
-                if not isinstance(e, dict): 
-                    continue
-                node = (e.get("node") or {})
-                rid  = node.get("id")
-                rname= node.get("localized_name")
-                rkey = None
-                if isinstance(rid, str) and rid in REACTION_ID_MAP:
-                    rkey = REACTION_ID_MAP[rid]
-                if not rkey and rname:
-                    rkey = _norm_reaction_name(rname)
-                rc = e.get("reaction_count")
-                if rkey in REACTION_KEYS.values() and isinstance(rc, int):
-                    counts[rkey] = max(counts[rkey], rc)
-                    found_breakdown = True
-
-    # 2) tổng (new style): reaction_count.count
-    total_any = 0
-    for k, v in _deep_iter(n):
-        if k == "reaction_count" and isinstance(v, dict):
-            c = v.get("count")
-            if isinstance(c, int):
-                total_any = max(total_any, c)
-    if total_any and not found_breakdown:
+    s = _subtree_summary(n, {} if memo is None else memo)
+    counts = dict(s["counts"])
+    if s["reaction_total"] and not s["found_breakdown"]:
         # fallback: nếu không có breakdown thì dồn vào 'like' (giữ hành vi cũ)
-        counts["like"] = max(counts["like"], total_any)
-
-    # ---- D) REACTIONS (kiểu cũ list [reactionType/key]:count/total_count)
-    for _k, v in _deep_iter(n):
-        if isinstance(v, list) and v and isinstance(v[0], dict) and (
-            ("reactionType" in v[0] and "count" in v[0]) or
-            ("key" in v[0] and "total_count" in v[0])
-        ):
-            for it in v:
-                rtype = (it.get("reactionType") or it.get("key") or "")
-                cnt = it.get("count") if "count" in it else it.get("total_count")
-                if isinstance(rtype, str):
-                    rtype = rtype.upper()
-                if rtype in REACTION_KEYS and isinstance(cnt, int):
-                    counts[REACTION_KEYS[rtype]] = max(counts[REACTION_KEYS[rtype]], cnt)
-
+        counts["like"] = max(counts["like"], s["reaction_total"])
     return counts
 
 
-def extract_created_time(n):
+def extract_created_time(n, memo=None):
     t = n.get("creation_time") or n.get("created_time") or n.get("creationTime")
     if not t:
-        for k, v in _deep_iter(n):
-            if k in ("creation_time", "created_time", "creationTime") and isinstance(v, (int, float, str)):
-                t = v; break
+        found = _subtree_summary(n, {} if memo is None else memo)["created_first"]
+        if found:
+            t = found[0]
     try:
         return int(t)
     except:
         return t
 
-def extract_share_flags(n):
+def extract_share_flags(n, memo=None):
     is_share = False
     link_share = None
     type_share = None
@@ -275,9 +381,16 @@ def extract_share_flags(n):
 
     # v1: attached_story trực tiếp
     attached = None
-    for k, v in _deep_iter(n):
-        if k in ("attached_story", "attachedStory", "attached_share_story") and isinstance(v, dict):
-            attached = v
+    want = _ATTACHED_KEYS
+    for k, (_parent, v) in _subtree_summary(n, {} if memo is None else memo)["keys"].items():
+        if k in want:
+            if isinstance(v, dict):
+                attached = v
+            else:
+                # lần đầu là null/không phải dict → phải dò tiếp các lần sau
+                for k2, v2 in _deep_iter(n):
+                    if k2 in want and isinstance(v2, dict):
+                        attached = v2; break
             break
 
     # v2: Comet sections
@@ -339,37 +452,15 @@ def _all_urls_from_text(s: str):
             out.append(u); seen.add(u)
     return out
 
-def _dig_attachment_urls(n:dict):
+def _dig_attachment_urls(n:dict, memo=None):
     """
     Lục các URL trong attachments/shareable để lấy OG meta.
     Trả về (urls, meta) với meta có og_title/og_desc/site_name nếu có.
     """
-    urls, meta = [], {}
-    def take(u):
-        u=_clean_url(u)
-        if u and u not in urls:
-            urls.append(u)
-
-    def dive(x):
-        if isinstance(x, dict):
-            # các key hay chứa URL
-            for k in ("url","canonical_url","source","href","permalink_url","external_url"):
-                v=x.get(k)
-                if isinstance(v,str): take(v)
-            # OG-esque meta
-            for (k1,k2) in (("title","og_title"),("subtitle","og_desc"),("site_name","og_site_name"),("publisher","og_site_name")):
-                if isinstance(x.get(k1), dict) and isinstance(x[k1].get("text"), str):
-                    meta.setdefault(k2, x[k1]["text"].strip())
-                elif isinstance(x.get(k1), str):
-                    meta.setdefault(k2, x[k1].strip())
-
-            for v in x.values(): dive(v)
-        elif isinstance(x, list):
-            for v in x: dive(v)
-    dive(n)
-    return urls, meta
-
-def extract_share_flags_smart(n: dict, actor_text: str = None):
+    s = _subtree_summary(n, {} if memo is None else memo)
+    return list(dict.fromkeys(s["att_urls"])), dict(s["att_meta"])
+
+def extract_share_flags_smart(n: dict, actor_text: str = None, memo=None):
     """
     Trả về: (is_share, link_share, type_share, origin_id, share_meta)
     - link_share: ưu tiên URL 'ngoài FB'. Nếu không có → nếu share bài FB thì trả permalink FB.
@@ -400,7 +491,7 @@ def extract_share_flags_smart(n: dict, actor_text: str = None):
     # gom URL + meta trong attachments
     att_urls = []
     for node in cand_nodes:
-        u, meta = _dig_attachment_urls(node)
+        u, meta = _dig_attachment_urls(node, memo)
         att_urls.extend(u)
         share_meta.update({k:v for k,v in meta.items() if v})
 
@@ -471,37 +562,11 @@ def _extract_url_digits(url: str) -> Optional[str]:
             return v[0]
     return None
 
-def _dig_text(o):
-    texts = []
-    def take(x):
-        if isinstance(x, str):
-            t = x.strip()
-            if t and t.lower() not in {"see more", "xem thêm"}:
-                texts.append(t)
-    def dive(v):
-        if isinstance(v, dict):
-            if "text" in v and isinstance(v["text"], str): take(v["text"])
-            if "message" in v and isinstance(v["message"], dict):
-                if isinstance(v["message"].get("text"), str): take(v["message"]["text"])
-            if "body" in v and isinstance(v["body"], dict):
-                if isinstance(v["body"].get("text"), str): take(v["body"]["text"])
-            if "savable_description" in v and isinstance(v["savable_description"], dict):
-                if isinstance(v["savable_description"].get("text"), str): take(v["savable_description"]["text"])
-            for k in ("title", "subtitle", "headline", "label", "contextual_message"):
-                val = v.get(k)
-                if isinstance(val, dict) and isinstance(val.get("text"), str): take(val["text"])
-                elif isinstance(val, str): take(val)
-            for vv in v.values(): dive(vv)
-        elif isinstance(v, list):
-            for it in v: dive(it)
-    dive(o)
-    uniq, seen = [], set()
-    for t in texts:
-        if t not in seen:
-            uniq.append(t); seen.add(t)
-    return uniq
+def _dig_text(o, memo=None):
+    s = _subtree_summary(o, {} if memo is None else memo)
+    return list(dict.fromkeys(s["texts"]))
 
-def _extract_share_texts(n: dict):
+def _extract_share_texts(n: dict, memo=None):
     actor_texts, attached_texts = [], []
     if isinstance(n.get("message"), dict) and isinstance(n["message"].get("text"), str):
         actor_texts.append(n["message"]["text"])
@@ -518,9 +583,9 @@ def _extract_share_texts(n: dict):
             if isinstance(story, dict):
                 if isinstance(story.get("message"), dict) and isinstance(story["message"].get("text"), str):
                     attached_texts.append(story["message"]["text"])
-                attached_texts.extend(_dig_text(story))
+                attached_texts.extend(_dig_text(story, memo))
     if not actor_texts:
-        actor_texts.extend(_dig_text(n))
+        actor_texts.extend(_dig_text(n, memo))
     def _uniq_keep(seq):
         out, seen = [], set()
         for s in seq:
@@ -543,7 +608,84 @@ def _extract_share_texts(n: dict):
     return (actor_texts[0] if actor_texts else None,
             attached_texts[0] if attached_texts else None,
             combined)
-    
+
+def build_post_item(obj: dict, group_url: str = GROUP_URL, memo=None) -> dict:
+    """Dựng 1 row bài viết từ story node. memo: dùng chung trong cùng 1 response."""
+    if memo is None:
+        memo = {}
+    post_id_api = obj.get("post_id")
+    fb_id      = obj.get("id")
+    url        = obj.get("wwwURL") or obj.get("url")
+    url_digits = _extract_url_digits(url)
+    rid        = post_id_api or url_digits or fb_id
+    author_id, author_name, author_link, avatar, type_label = extract_author(obj)
+
+    actor_text, attached_text, text_combined = _extract_share_texts(obj, memo)
+    image_urls, video_urls = extract_media(obj, memo)
+    counts = extract_reactions_and_counts(obj, memo)
+    smart_is_share, smart_link, smart_type, origin_id, share_meta = extract_share_flags_smart(obj, actor_text or text_combined, memo=memo)
+    sub = _subtree_summary(obj, memo)
+    created = sub["ts_max"] if sub["ts_max"] is not None else extract_created_time(obj, memo)
+
+    hashtags = extract_hashtags(text_combined)
+    out_links = list(dict.fromkeys(_all_urls_from_text(text_combined or "") + _dig_attachment_urls(obj, memo)[0]))
+    out_domains = []
+    for u in out_links:
+        try:
+            host = urlparse(u).netloc.lower().split(":")[0]
+            if host: out_domains.append(host)
+        except: pass
+    out_domains = list(dict.fromkeys(out_domains))
+    source_id = None
+    _k, _v = deep_get_first(obj, _GROUP_ID_KEYS, memo)
+    if _v: source_id = _v
+    if not source_id:
+        try:
+            slug = re.search(r"/groups/([^/?#]+)", group_url).group(1)
+            source_id = slug
+        except:
+            pass
+
+    item = {
+        "id": fb_id,
+        "rid": rid,
+        "type": type_label,
+        "link": url,
+        "author_id": author_id,
+        "author": author_name,
+        "author_link": author_link,
+        "avatar": avatar,
+        "created_time": created,
+        "content": text_combined,
+        "image_url": image_urls,
+        "like": counts["like"],
+        "comment": counts["comment"],
+        "haha": counts["haha"],
+        "wow": counts["wow"],
+        "sad": counts["sad"],
+        "love": counts["love"],
+        "angry": counts["angry"],
+        "care": counts["care"],
+        "share": counts["share"],
+        "hashtag": hashtags,
+        "video": video_urls,
+        "source_id": source_id,
+        "is_share": smart_is_share,
+        "link_share": smart_link,
+        "type_share": smart_type,
+        "origin_id": origin_id,
+        "out_links": out_links,
+        "out_domains": out_domains,
+    }
+    if share_meta:
+        item["share_meta"] = share_meta
+    if smart_is_share:
+        item["content_parts"] = {
+            "actor_text": actor_text,
+            "attached_text": attached_text
+        }
+    return item
+
 def filter_only_feed_posts(items):
     keep = []
     for it in items or []:
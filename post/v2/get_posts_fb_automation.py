@@ -1,5 +1,5 @@
 import argparse
-import os, re, json, time, random, datetime, urllib.parse
+import os, re, time, random, datetime, urllib.parse, threading, queue
 from typing import List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse
 
@@ -7,17 +7,17 @@ from urllib.parse import urlparse, urlunparse
 from selenium.common.exceptions import TimeoutException as _SETimeout
 
 # ==== custom utils bạn đã có trong get_info.py (yêu cầu file này tồn tại) ====
-from get_info import _all_urls_from_text, _dig_attachment_urls, _extract_share_texts, _extract_url_digits, _looks_like_group_post, deep_get_first, extract_author, extract_created_time, extract_hashtags, extract_media, extract_reactions_and_counts, extract_share_flags, extract_share_flags_smart, filter_only_feed_posts
+from get_info import _extract_url_digits, _looks_like_group_post, build_post_item, filter_only_feed_posts
 
 from configs import *
-from automation import (fast_forward_cursor, fetch_via_wire, js_fetch_in_page,
+from json_utils import dumps, loads
+from automation import (fast_forward_cursor, fetch_via_wire, js_fetch_chain_in_page, js_fetch_in_page,
                         reload_and_refresh_form, soft_refetch_form_and_cursor)
-from checkpoint import append_ndjson, save_checkpoint
+from checkpoint import append_ndjson, raw_archive, save_checkpoint
 from utils import (
-                   _strip_xssi_prefix, choose_best_graphql_obj, 
-                    current_cursor_from_form, deep_collect_cursors, 
-                    deep_collect_timestamps, deep_find_has_next, 
-                    iter_json_values, merge_vars, 
+                   ResponseAnalysis, _same_request, choose_best_graphql_obj, 
+                    current_cursor_from_form, 
+                    iter_json_spans, merge_vars, 
                     strip_cursors_from_vars, update_vars_for_next_cursor)
 os.makedirs(RAW_DUMPS_DIR, exist_ok=True)
 
@@ -25,86 +25,19 @@ os.makedirs(RAW_DUMPS_DIR, exist_ok=True)
 # Post collectors (ưu tiên rid + link + created_time)
 # =========================
 
-def collect_post_summaries(obj, out, group_url=GROUP_URL):
+def collect_post_summaries(obj, out, group_url=GROUP_URL, memo=None):
+    # memo: summary của từng story trong response này (xem get_info._subtree_summary);
+    # story con (bài được share) chỉ bị duyệt 1 lần và cha dùng lại kết quả.
+    if memo is None:
+        memo = {}
     if isinstance(obj, dict):
         if _looks_like_group_post(obj):
-            post_id_api = obj.get("post_id")
-            fb_id      = obj.get("id")
-            url        = obj.get("wwwURL") or obj.get("url")
-            url_digits = _extract_url_digits(url)
-            rid        = post_id_api or url_digits or fb_id
-            author_id, author_name, author_link, avatar, type_label = extract_author(obj)
-
-            actor_text, attached_text, text_combined = _extract_share_texts(obj)
-            image_urls, video_urls = extract_media(obj)
-            counts = extract_reactions_and_counts(obj)
-            smart_is_share, smart_link, smart_type, origin_id, share_meta = extract_share_flags_smart(obj, actor_text or text_combined)
-            created_candidates = deep_collect_timestamps(obj)
-            created = max(created_candidates) if created_candidates else extract_created_time(obj)
-
-            hashtags = extract_hashtags(text_combined)
-            out_links = list(dict.fromkeys(_all_urls_from_text(text_combined or "") + _dig_attachment_urls(obj)[0]))
-            out_domains = []
-            for u in out_links:
-                try:
-                    host = urlparse(u).netloc.lower().split(":")[0]
-                    if host: out_domains.append(host)
-                except: pass
-            out_domains = list(dict.fromkeys(out_domains))
-            source_id = None
-            _k, _v = deep_get_first(obj, {"group_id", "groupID", "groupIDV2"})
-            if _v: source_id = _v
-            if not source_id:
-                try:
-                    slug = re.search(r"/groups/([^/?#]+)", group_url).group(1)
-                    source_id = slug
-                except:
-                    pass
-
-            item = {
-                "id": fb_id,
-                "rid": rid,
-                "type": type_label,
-                "link": url,
-                "author_id": author_id,
-                "author": author_name,
-                "author_link": author_link,
-                "avatar": avatar,
-                "created_time": created,
-                "content": text_combined,
-                "image_url": image_urls,
-                "like": counts["like"],
-                "comment": counts["comment"],
-                "haha": counts["haha"],
-                "wow": counts["wow"],
-                "sad": counts["sad"],
-                "love": counts["love"],
-                "angry": counts["angry"],
-                "care": counts["care"],
-                "share": counts["share"],
-                "hashtag": hashtags,
-                "video": video_urls,
-                "source_id": source_id,
-                "is_share": smart_is_share,
-                "link_share": smart_link,
-                "type_share": smart_type,
-                "origin_id": origin_id,
-                "out_links": out_links,
-                "out_domains": out_domains,
-            }
-            if share_meta:
-                item["share_meta"] = share_meta
-            if smart_is_share:
-                item["content_parts"] = {
-                    "actor_text": actor_text,
-                    "attached_text": attached_text
-                }
-            out.append(item)
+            out.append(build_post_item(obj, group_url, memo))
         for v in obj.values():
-            collect_post_summaries(v, out, group_url)
+            collect_post_summaries(v, out, group_url, memo)
     elif isinstance(obj, list):
         for v in obj:
-            collect_post_summaries(v, out, group_url)
+            collect_post_summaries(v, out, group_url, memo)
 
 # =========================
 # Dedupe/merge (rid + normalized link)
@@ -172,9 +105,83 @@ def coalesce_posts(items: List[dict]) -> List[dict]:
 # =========================
 # Paginate 1 window (NO time slice khi gọi từ cursor-only)
 # =========================
+# =========================
+# Prefetch: fetch trước trang N+1.. trong lúc trang N đang bóc/ghi
+# =========================
+class _PagePrefetcher:
+    """
+    Thread phụ đi trước tối đa `depth` trang, theo cursor của chính trang vừa fetch.
+    Main loop chỉ dùng trang fetch trước khi form nó chọn TRÙNG form đã fetch;
+    lệch (stall/reload/fast-forward/tăng count...) → bỏ cả hàng đợi, fetch lại như cũ.
+    Khi thread đang chạy nó giữ driver → main phải cancel() trước khi tự gọi driver.
+    """
+    def __init__(self, d, vars_template, depth: int, trim: bool = False):
+        self.d = d
+        self.vars_template = vars_template
+        self.depth = max(1, int(depth))
+        self.trim = trim
+        self._thread = None
+
+    def busy(self) -> bool:
+        return self._thread is not None
+
+    def start(self, form, cursor):
+        if self._thread is not None or not cursor:
+            return
+        self._q = queue.Queue()
+        self._slots = threading.Semaphore(self.depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(dict(form), cursor), daemon=True)
+        self._thread.start()
+
+    def _run(self, form, cursor):
+        while cursor:
+            while not self._slots.acquire(timeout=0.2):
+                if self._stop.is_set(): return
+            # update_vars_for_next_cursor sửa form tại chỗ → luôn làm trên bản copy
+            form = update_vars_for_next_cursor(dict(form), cursor, self.vars_template)
+            time.sleep(random.uniform(0.7, 1.4))  # giữ nhịp request như vòng serial
+            if self._stop.is_set(): return
+            try:
+                txt = js_fetch_in_page(self.d, form, extra_headers={}, timeout_ms=20000, trim=self.trim)
+            except Exception:
+                txt = None
+            obj = choose_best_graphql_obj(iter_json_spans(txt)) if txt else None
+            # phân tích đủ (posts + cursor) ngay ở đây → main loop dùng lại, không walk trang lần 2
+            ra = ResponseAnalysis(obj) if obj else None
+            self._q.put((form, txt, obj, ra))
+            if not obj or self._stop.is_set(): return
+            cursor = ra.cursor
+
+    def take(self, form):
+        """(txt, obj, ra) nếu trang kế đã được fetch đúng với `form`, ngược lại None."""
+        if self._thread is None:
+            return None
+        while True:
+            try:
+                f, txt, obj, ra = self._q.get(timeout=0.2)
+                break
+            except queue.Empty:
+                if not self._thread.is_alive() and self._q.empty():
+                    self._thread = None
+                    return None
+        self._slots.release()
+        if txt is not None and f == form:
+            return txt, obj, ra
+        self.cancel()
+        return None
+
+    def cancel(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()  # chờ fetch đang bay xong để trả driver
+        self._thread = None
+
 def paginate_window(d, form, vars_template, seen_ids: set,
                     t_from: Optional[int]=None, t_to: Optional[int]=None,
-                    page_limit: Optional[int]=None) -> Tuple[int, Optional[int], bool]:
+                    page_limit: Optional[int]=None, prefetch: int = PREFETCH_DEPTH,
+                    chain: int = CHAIN_HOPS, trim: bool = TRIM_RESPONSES) -> Tuple[int, Optional[int], bool]:
     last_good_cursor = current_cursor_from_form(form) or None
     cursor_stall_rounds = 0
     prev_cursor = None
@@ -189,7 +196,7 @@ def paginate_window(d, form, vars_template, seen_ids: set,
 
     if (t_from is not None) or (t_to is not None):
         # không dùng trong cursor-only, nhưng giữ để tái sử dụng
-        base = json.loads(form.get("variables","{}")) if form.get("variables") else {}
+        base = loads(form.get("variables","{}")) if form.get("variables") else {}
         known_keys = set(base.keys())
         cand_after = "afterTime"  if "afterTime"  in known_keys else "after_time"
         cand_before= "beforeTime" if "beforeTime" in known_keys else "before_time"
@@ -198,26 +205,44 @@ def paginate_window(d, form, vars_template, seen_ids: set,
         if t_to   is not None:  base[cand_before] = int(t_to)
         if "count" in base and isinstance(base["count"], int):
             base["count"] = max(base["count"], 10)
-        form["variables"] = json.dumps(base, separators=(",", ":"))
+        form["variables"] = dumps(base)
 
     page = 0
     has_next = False
     cursor_for_reload = None
+    pf = _PagePrefetcher(d, vars_template, prefetch, trim) if prefetch else None
+    seen_new = []  # id mới từ lần save_checkpoint trước (journal chỉ ghi delta)
+    chained = []  # [(form, txt)] các trang kế đã lấy sẵn bởi js_fetch_chain_in_page
+    t_start = time.time()
 
     while True:
         page += 1
+        ahead = pf.take(form) if pf else None
+        if ahead is None and chained:
+            f_next, t_next = chained.pop(0)
+            if _same_request(f_next, form):
+                ahead = (t_next, None, None)
+            else:
+                chained = []  # main loop đã rẽ hướng (stall/reload/tăng count...) → bỏ chuỗi
         max_tries = 3
         last_err = None
         for attempt in range(1, max_tries+1):
+            if ahead:
+                txt = ahead[0]
+                break
             try:
-                txt = js_fetch_in_page(d, form, extra_headers={}, timeout_ms=20000)
+                if chain > 1 and attempt == 1:
+                    pages = js_fetch_chain_in_page(d, form, chain, vars_template, extra_headers={}, timeout_ms=20000, trim=trim)
+                    txt, chained = pages[0][1], pages[1:]
+                else:
+                    txt = js_fetch_in_page(d, form, extra_headers={}, timeout_ms=20000, trim=trim)
                 break
             except (_SETimeout, RuntimeError) as e:
                 last_err = e
                 if "bad_origin:" in str(e):
                     d.get(GROUP_URL); time.sleep(1.2)
                     try:
-                        txt = js_fetch_in_page(d, form, extra_headers={}, timeout_ms=20000)
+                        txt = js_fetch_in_page(d, form, extra_headers={}, timeout_ms=20000, trim=trim)
                         break
                     except Exception:
                         pass
@@ -229,30 +254,30 @@ def paginate_window(d, form, vars_template, seen_ids: set,
                     if new_form:
                         form = new_form
                         if (t_from is not None) or (t_to is not None):
-                            base = json.loads(form.get("variables","{}")) if form.get("variables") else {}
+                            base = loads(form.get("variables","{}")) if form.get("variables") else {}
                             known_keys = set(base.keys())
                             cand_after = "afterTime"  if "afterTime"  in known_keys else "after_time"
                             cand_before= "beforeTime" if "beforeTime" in known_keys else "before_time"
                             base = merge_vars(base, vars_template)
                             if t_from is not None:  base[cand_after]  = int(t_from)
                             if t_to   is not None:  base[cand_before] = int(t_to)
-                            form["variables"] = json.dumps(base, separators=(",", ":"))
+                            form["variables"] = dumps(base)
 
                 if attempt == max_tries:
                     form2, friendly2, docid2 = reload_and_refresh_form(d, GROUP_URL, None, vars_template)
                     if form2:
                         form = form2
                         if (t_from is not None) or (t_to is not None):
-                            base = json.loads(form.get("variables","{}")) if form.get("variables") else {}
+                            base = loads(form.get("variables","{}")) if form.get("variables") else {}
                             known_keys = set(base.keys())
                             cand_after = "afterTime"  if "afterTime"  in known_keys else "after_time"
                             cand_before= "beforeTime" if "beforeTime" in known_keys else "before_time"
                             base = merge_vars(base, vars_template)
                             if t_from is not None:  base[cand_after]  = int(t_from)
                             if t_to   is not None:  base[cand_before] = int(t_to)
-                            form["variables"] = json.dumps(base, separators=(",", ":"))
+                            form["variables"] = dumps(base)
                     try:
-                        txt = js_fetch_in_page(d, form, extra_headers={}, timeout_ms=25000)
+                        txt = js_fetch_in_page(d, form, extra_headers={}, timeout_ms=25000, trim=trim)
                         break
                     except Exception:
                         try:
@@ -262,17 +287,22 @@ def paginate_window(d, form, vars_template, seen_ids: set,
                             pass
                         raise
 
-        obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
-        with open(os.path.join(RAW_DUMPS_DIR, f"slice_{t_from or 'None'}_{t_to or 'None'}_p{page}.json"), "w", encoding="utf-8") as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
+        obj = ahead[1] if (ahead and ahead[1] is not None) else choose_best_graphql_obj(iter_json_spans(txt))
+        raw_archive().put(txt, target=f"slice_{t_from or 'None'}_{t_to or 'None'}", page=page,
+                          cursor=current_cursor_from_form(form),
+                          doc=form.get("fb_api_req_friendly_name") or form.get("doc_id"))
 
         if not obj:
             print(f"[SLICE {t_from}->{t_to}] parse fail → stop slice.")
             break
 
-        page_posts = []
-        collect_post_summaries(obj, page_posts)
-        page_posts = coalesce_posts(filter_only_feed_posts(page_posts))
+        # 1 lượt walk cho cả cursor (prefetch) lẫn posts; trang prefetch đã có sẵn analysis
+        ra = ahead[2] if (ahead and ahead[2] is not None) else ResponseAnalysis(obj)
+        if pf and not pf.busy() and not chained and not (page_limit and page >= page_limit):
+            # fetch N+1 song song với lọc/ghi trang N
+            pf.start(form, ra.cursor)
+
+        page_posts = coalesce_posts(filter_only_feed_posts(ra.posts))
 
         written_this_round = set()
         fresh = []
@@ -284,7 +314,9 @@ def paginate_window(d, form, vars_template, seen_ids: set,
         if fresh:
             append_ndjson(fresh)
             for p in fresh:
-                for k in _all_join_keys(p): seen_ids.add(k)
+                for k in _all_join_keys(p):
+                    if k not in seen_ids:
+                        seen_ids.add(k); seen_new.append(k)
             total_new += len(fresh)
             no_progress_rounds = 0
         else:
@@ -296,14 +328,15 @@ def paginate_window(d, form, vars_template, seen_ids: set,
                 if (min_created is None) or (ct < min_created):
                     min_created = ct
 
-        cursors = deep_collect_cursors(obj)
-        has_next = deep_find_has_next(obj)
+        cursors = ra.cursors
+        has_next = ra.has_next
         if not fresh and has_next:
             cursor_stall_rounds += 1
         else:
             cursor_stall_rounds = 0
         if cursor_stall_rounds >= 6:
             print("[STALL] next=True & fresh=0 nhiều vòng → fast-forward 2 hops")
+            if pf: pf.cancel()
             ff_form, ff_cursor = fast_forward_cursor(d, form, vars_template, hops=2)
             if ff_form:
                 form = ff_form
@@ -322,10 +355,10 @@ def paginate_window(d, form, vars_template, seen_ids: set,
             last_good_cursor = new_cursor
             prev_cursor = new_cursor
             try:
-                v = json.loads(form.get("variables","{}"))
+                v = loads(form.get("variables","{}"))
                 if isinstance(v.get("count"), int):
                     v["count"] = min(max(v["count"] + 10, 20), 60)
-                    form["variables"] = json.dumps(v, separators=(",",":"))
+                    form["variables"] = dumps(v)
             except: 
                 pass
             time.sleep(random.uniform(0.3, 0.6))
@@ -338,6 +371,7 @@ def paginate_window(d, form, vars_template, seen_ids: set,
 
         if new_cursor and prev_cursor == new_cursor:
             print(f"[WARN] cursor lặp lại → thử soft-refetch")
+            if pf: pf.cancel()
             nf, bc, bh, _ = soft_refetch_form_and_cursor(d, form, vars_template)
             if nf and (bc or bh):
                 form = nf
@@ -349,10 +383,10 @@ def paginate_window(d, form, vars_template, seen_ids: set,
                 if f2:
                     form = f2
                     try:
-                        v = json.loads(form.get("variables","{}"))
+                        v = loads(form.get("variables","{}"))
                         if isinstance(v.get("count"), int):
                             v["count"] = min(max(v["count"] + 10, 20), 60)
-                            form["variables"] = json.dumps(v, separators=(",",":"))
+                            form["variables"] = dumps(v)
                     except:
                         pass
                     no_progress_rounds = 0
@@ -363,11 +397,12 @@ def paginate_window(d, form, vars_template, seen_ids: set,
             last_good_cursor = new_cursor
             prev_cursor = new_cursor
 
-        print(f"[SLICE {t_from or '-inf'}→{t_to or '+inf'}] p{page} got {len(page_posts)} (new {len(fresh)}), total_new={total_new}, next={has_next}")
+        pps = page / max(time.time() - t_start, 1e-6)
+        print(f"[SLICE {t_from or '-inf'}→{t_to or '+inf'}] p{page} got {len(page_posts)} (new {len(fresh)}), total_new={total_new}, next={has_next}, {pps:.2f} pages/s")
 
         save_checkpoint(
             cursor=last_good_cursor,
-            seen_ids=list(seen_ids),
+            seen_add=seen_new,
             vars_template=vars_template,
             mode=mode_str,
             slice_from=t_from,
@@ -377,18 +412,20 @@ def paginate_window(d, form, vars_template, seen_ids: set,
             page=page,
             min_created=min_created
         )
+        seen_new.clear()
 
         MAX_NO_NEXT_ROUNDS = 3
         if not has_next and no_progress_rounds >= MAX_NO_NEXT_ROUNDS:
             print(f"[PAGE#{page}] next=False x{no_progress_rounds} → reload trang & bắt lại feed")
 
+            if pf: pf.cancel()
             # cursor để bơm lại sau reload
             reload_cursor = cursor_for_reload or last_good_cursor or current_cursor_from_form(form)
 
             # lưu checkpoint trước khi reload
             save_checkpoint(
                 cursor=reload_cursor,
-                seen_ids=list(seen_ids),
+                seen_add=seen_new,
                 vars_template=vars_template,
                 mode=mode_str,
                 slice_from=t_from,
@@ -398,6 +435,7 @@ def paginate_window(d, form, vars_template, seen_ids: set,
                 page=page,
                 min_created=min_created
             )
+            seen_new.clear()
 
             # thử reload 2 lần
             reloaded_ok = False
@@ -434,8 +472,12 @@ def paginate_window(d, form, vars_template, seen_ids: set,
         if page_limit and page >= page_limit:
             break
 
-        time.sleep(random.uniform(0.7, 1.4))
+        if not (pf and pf.busy()) and not chained:  # prefetch thread / chuỗi trong page tự giữ nhịp sleep
+            time.sleep(random.uniform(0.7, 1.4))
 
+    if pf: pf.cancel()
+    elapsed = time.time() - t_start
+    print(f"[PAGES] {page} pages in {elapsed:.1f}s → {page / max(elapsed, 1e-6):.2f} pages/s (prefetch={prefetch or 0}, chain={chain or 1})")
     return total_new, min_created, bool(has_next)
 
 # =========================
@@ -443,26 +485,24 @@ def paginate_window(d, form, vars_template, seen_ids: set,
 # =========================
 def probe_head(driver, base_form, vars_template, k=5):
     try:
-        v = json.loads(base_form.get("variables","{}"))
+        v = loads(base_form.get("variables","{}"))
     except: 
         v = {}
     v = strip_cursors_from_vars(merge_vars(v, vars_template))
-    form0 = dict(base_form); form0["variables"] = json.dumps(v, separators=(",",":"))
+    form0 = dict(base_form); form0["variables"] = dumps(v)
 
     txt = js_fetch_in_page(driver, form0, extra_headers={
         "Cache-Control": "no-cache", "Pragma": "no-cache",
     })
-    obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
+    obj = choose_best_graphql_obj(iter_json_spans(txt))
     if not obj: 
         return None, [], None
 
-    page_posts = []
-    collect_post_summaries(obj, page_posts)
-    page_posts = coalesce_posts(filter_only_feed_posts(page_posts))
+    ra = ResponseAnalysis(obj)
+    page_posts = coalesce_posts(filter_only_feed_posts(ra.posts))
     top = page_posts[:k]
 
-    cursors = deep_collect_cursors(obj)
-    head_cursor = cursors[0][1] if cursors else None
+    head_cursor = ra.cursor
 
     if head_cursor:
         form1 = update_vars_for_next_cursor(form0, head_cursor, vars_template)
@@ -479,11 +519,9 @@ def strip_cursors_from_form_on_form(form, vars_template=None):
     Tạo bản copy của form, loại bỏ tất cả các trường cursor/endCursor/after... trong phần variables.
     Giữ lại các biến khác (ví dụ: id, count, scale, viewerID...).
     """
-    import json
-
     # Lấy ra biến variables từ form
     try:
-        v = json.loads(form.get("variables", "{}"))
+        v = loads(form.get("variables", "{}"))
     except Exception:
         v = {}
 
@@ -518,10 +556,11 @@ def strip_cursors_from_form_on_form(form, vars_template=None):
 
     # Trả lại form mới (copy)
     new_form = dict(form)
-    new_form["variables"] = json.dumps(cleaned, separators=(",", ":"))
+    new_form["variables"] = dumps(cleaned)
     return new_form
 
-def run_cursor_only(d, form, vars_template, seen_ids, page_limit=None, resume=False):
+def run_cursor_only(d, form, vars_template, seen_ids, page_limit=None, resume=False, prefetch=PREFETCH_DEPTH,
+                    chain=CHAIN_HOPS, trim=TRIM_RESPONSES):
     """
     Cursor-only paging. Nếu resume=True => KHÔNG boot ở head, đi thẳng từ checkpoint cursor.
     """
@@ -532,7 +571,7 @@ def run_cursor_only(d, form, vars_template, seen_ids, page_limit=None, resume=Fa
         fresh_head = 0
         try:
             txt = js_fetch_in_page(d, strip_cursors_from_form_on_form(form, vars_template(form)), {}, 15000)  # pseudo
-            obj = choose_best_graphql_obj(iter_json_values(_strip_xssi_prefix(txt)))
+            obj = choose_best_graphql_obj(iter_json_spans(txt))
             buf = []
             collect_post_summaries(obj, buf)
             buf = coalesce_posts(filter_only_feed_posts(buf))
@@ -543,6 +582,8 @@ def run_cursor_only(d, form, vars_template, seen_ids, page_limit=None, resume=Fa
                     written.append(p)
                     for k in _all_join_keys(p): seen_ids.add(k)
             append_ndjson(written)
+            if written:
+                save_checkpoint(seen_add=[k for p in written for k in _all_join_keys(p)])
             fresh_head = len(written)
             if fresh_head:
                 print(f"[HEAD] grabbed {fresh_head} fresh at head")
@@ -557,7 +598,10 @@ def run_cursor_only(d, form, vars_template, seen_ids, page_limit=None, resume=Fa
     add, _, _ = paginate_window(
         d, form, vars_template, seen_ids,
         t_from=None, t_to=None,
-        page_limit=page_limit
+        page_limit=page_limit,
+        prefetch=prefetch,
+        chain=chain,
+        trim=trim
     )
     total += add
     return total
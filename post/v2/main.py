@@ -6,7 +6,7 @@ import urllib, time, sys
 from datetime import datetime
 from configs import *
 from automation import bootstrap_auth,  install_early_hook, start_driver_with_proxy, wait_next_req
-from checkpoint import load_checkpoint, normalize_seen_ids, save_checkpoint
+from checkpoint import load_checkpoint, normalize_seen_ids, raw_archive, save_checkpoint
 from get_posts_fb_automation import paginate_window, run_cursor_only
 from utils import   get_vars_from_form, is_group_feed_req, make_vars_template, parse_form, update_vars_for_next_cursor
 # from get_posts_fb_automation import start_driver
@@ -23,8 +23,17 @@ if __name__ == "__main__":
     ap.add_argument("--from-month", type=int, default=None, help="Tháng bắt đầu (ví dụ: 8).")
     ap.add_argument("--to-month", type=int, default=None, help="Tháng kết thúc (ví dụ: 6).")
     ap.add_argument("--year", type=int, default=None, help="Năm (ví dụ: 2015).")
+    ap.add_argument("--prefetch", type=int, default=PREFETCH_DEPTH,
+                    help="Số trang fetch trước song song với bóc/ghi trang hiện tại (0 = tuần tự).")
+    ap.add_argument("--chain", type=int, default=CHAIN_HOPS,
+                    help="Số trang lấy liền trong 1 lần gọi WebDriver (JS tự theo end_cursor, 1 = từng trang).")
+    ap.add_argument("--trim", action="store_true", default=TRIM_RESPONSES,
+                    help="Cắt bớt manifest video/tracking trong page trước khi trả body về Python.")
+    ap.add_argument("--raw-archive", choices=("off", "sample", "full"), default=RAW_ARCHIVE,
+                    help="Lưu response gốc vào pack nén trong RAW_DUMPS_DIR: tắt / lấy mẫu / mọi trang.")
 
     args = ap.parse_args()
+    raw_archive(args.raw_archive)
 
     d = start_driver_with_proxy(PROXY_URL, headless=False)
     d.set_script_timeout(40)
@@ -76,10 +85,13 @@ if __name__ == "__main__":
                 d, form, effective_template, seen_ids=set(),
                 t_from=t_from,
                 t_to=t_to,
-                page_limit=args.page_limit
+                page_limit=args.page_limit,
+                prefetch=args.prefetch,
+                chain=args.chain,
+                trim=args.trim
             )
             print(f"✅ Done {start.strftime('%Y-%m')} → {total_new} posts | min_created={min_created}")
-            save_checkpoint(cursor=None, seen_ids=list(seen_ids),
+            save_checkpoint(cursor=None, seen_ids=seen_ids,
                             vars_template=effective_template,
                             mode="time", slice_from=None, slice_to=t_to, year=args.year)
             time.sleep(2)
@@ -98,10 +110,13 @@ if __name__ == "__main__":
     total_got = run_cursor_only(
         d, form, effective_template, seen_ids,
         page_limit=args.page_limit,
-        resume=args.resume   # ✅ quan trọng
+        resume=args.resume,  # ✅ quan trọng
+        prefetch=args.prefetch,
+        chain=args.chain,
+        trim=args.trim
     )
 
     # Lưu checkpoint cuối (giữ seen_ids & template; cursor đã được cập nhật trong quá trình paginate)
-    save_checkpoint(cursor=None, seen_ids=list(seen_ids), vars_template=effective_template,
+    save_checkpoint(cursor=None, seen_ids=seen_ids, vars_template=effective_template,
                     mode=None, slice_from=None, slice_to=None, year=None)
     print(f"[DONE] total new written (cursor-only) = {total_got} → {OUT_NDJSON}")
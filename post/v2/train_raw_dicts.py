@@ -0,0 +1,25 @@
+# =========================
+# Train zstd dictionary cho raw archive (RAW_DUMPS_DIR), 1 dict / friendly name (doc_id)
+# =========================
+# Chạy khi crawler đang dừng; blob ghi từ lần chạy sau sẽ nén bằng dict mới.
+#   python train_raw_dicts.py [--samples 200] [--dict-size 112640]
+import argparse
+from configs import *
+from checkpoint import RawArchive
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=str(RAW_DUMPS_DIR), help="Thư mục raw archive.")
+    ap.add_argument("--samples", type=int, default=200, help="Số response mẫu tối đa mỗi doc.")
+    ap.add_argument("--dict-size", type=int, default=112640, help="Kích thước dictionary (byte).")
+    args = ap.parse_args()
+
+    arc = RawArchive(root=args.root, mode="full")
+    try:
+        trained = arc.train_dicts(samples_per_doc=args.samples, dict_size=args.dict_size)
+    finally:
+        arc.close()
+    for doc, (did, n) in trained.items():
+        print(f"[DICT] {doc}: dict_id={did} từ {n} mẫu")
+    if not trained:
+        print("[DICT] Chưa đủ mẫu (cần ≥20 response / doc).")
@@ -1,6 +1,8 @@
-import json, re, urllib
+import re, urllib
 from typing import Optional, List, Dict
 from configs import *
+from get_info import _as_epoch_s, _looks_like_group_post, build_post_item
+from json_utils import JSONDecodeError, dumps, loads, raw_decode
 
 def _coerce_epoch(v):
     try:
@@ -70,7 +72,7 @@ def is_group_feed_req(rec):
             return True
     try:
         v = parse_form(body).get("variables","")
-        vj = json.loads(urllib.parse.unquote_plus(v))
+        vj = loads(urllib.parse.unquote_plus(v))
         if any(k in vj for k in ["groupID","groupIDV2","id","actorID","profileID","pageID"]):
             if any(k in vj for k in ["after","cursor","endCursor","afterCursor","feedAfterCursor","beforeTime","afterTime"]):
                 return True
@@ -88,33 +90,52 @@ def _strip_xssi_prefix(s: str) -> str:
     s2 = re.sub(r"^\s*\)\]\}'\s*", '', s2)
     return s2
 
-def iter_json_values(s: str):
-    dec = json.JSONDecoder()
+_NON_WS_RE = re.compile(r'\S')
+# cùng các prefix như _strip_xssi_prefix, nhưng match tại offset (không cắt chuỗi)
+_XSSI_AT_RE = re.compile(r"(?:for\s*\(\s*;\s*;\s*\)\s*;\s*)?(?:\)\]\}'\s*)?")
+
+def iter_json_spans(s: str):
+    """
+    Decode nhiều JSON document dính nhau trong `s`, đi bằng offset (không slice).
+    Yield (obj, start, end) — [start, end) là vị trí ký tự của document trong `s`.
+    Prefix XSSI (for (;;); / )]}') ở đầu mỗi document được bỏ qua tại chỗ.
+    """
     i, n = 0, len(s)
     while i < n:
-        m = re.search(r'\S', s[i:])
+        m = _NON_WS_RE.search(s, i)
         if not m: break
-        j = i + m.start()
+        j = m.start()
         try:
-            obj, k = dec.raw_decode(s, j); yield obj; i = k
-        except json.JSONDecodeError:
-            chunk = _strip_xssi_prefix(s[j:])
-            if chunk == s[j:]: break
+            obj, k = raw_decode(s, j)
+        except JSONDecodeError:
+            j2 = _XSSI_AT_RE.match(s, j).end()
+            if j2 == j: break
             try:
-                obj, k_rel = dec.raw_decode(chunk, 0); yield obj; i = j + k_rel
-            except json.JSONDecodeError:
+                obj, k = raw_decode(s, j2)
+            except JSONDecodeError:
                 break
+            j = j2
+        yield obj, j, k
+        i = k
 
-def choose_best_graphql_obj(objs):
-    objs = list(objs)
-    if not objs: return None
-    with_data = [o for o in objs if isinstance(o, dict) and 'data' in o]
-    pick = with_data or objs
-    return max(pick, key=lambda o: len(json.dumps(o, ensure_ascii=False)))
+def iter_json_values(s: str):
+    for obj, _start, _end in iter_json_spans(s):
+        yield obj
+
+def choose_best_graphql_obj(docs):
+    """
+    docs: các (obj, start, end) từ iter_json_spans. Ưu tiên document có 'data',
+    lớn nhất theo độ dài span trong response gốc (không json.dumps lại để đo).
+    """
+    docs = list(docs)
+    if not docs: return None
+    with_data = [d for d in docs if isinstance(d[0], dict) and 'data' in d[0]]
+    pick = with_data or docs
+    return max(pick, key=lambda d: d[2] - d[1])[0]
 
 def current_cursor_from_form(form):
     try:
-        v = json.loads(form.get("variables", "{}"))
+        v = loads(form.get("variables", "{}"))
     except Exception:
         return None
     for k in ["cursor","after","endCursor","afterCursor","feedAfterCursor"]:
@@ -123,83 +144,89 @@ def current_cursor_from_form(form):
             return c
     return None
 
+# =========================
+# Response analysis — 1 lần duyệt: posts + cursors + has_next + timestamps
+# =========================
+_CURSOR_PRIORITY = {"page_info.end_cursor": 3, "end_cursor": 3, "endCursor": 3, "edges[-1].cursor": 2}
+_TS_HINT_KEYS = {"creation_time","created_time","creationTime","createdTime"}
+
+class ResponseAnalysis:
+    """
+    Duyệt GraphQL object đúng 1 lần và gom:
+      - posts: row bài viết thô (chưa filter/coalesce), như collect_post_summaries
+      - cursors: [(nguồn, cursor)] đã xếp hạng + khử trùng
+      - has_next: True/False/None theo page_info
+      - timestamps: epoch giây từ các key creation_time/created_time
+    collect_posts=False khi chỉ cần cursor/has_next (soft-refetch).
+    """
+    def __init__(self, obj, group_url=GROUP_URL, collect_posts=True):
+        posts, found, flags, stamps = [], [], [], []
+        memo = {}
+        def dive(o):
+            if isinstance(o, dict):
+                if collect_posts and _looks_like_group_post(o):
+                    posts.append(build_post_item(o, group_url, memo))
+                pi = o.get("page_info") or o.get("pageInfo")
+                if isinstance(pi, dict):
+                    ec = pi.get("end_cursor") or pi.get("endCursor")
+                    if isinstance(ec, str) and len(ec) >= 10:
+                        found.append(("page_info.end_cursor", ec))
+                    hn = pi.get("has_next_page");  hn = pi.get("hasNextPage") if hn is None else hn
+                    if isinstance(hn, bool): flags.append(hn)
+                edges = o.get("edges")
+                if isinstance(edges, list) and edges:
+                    last = edges[-1]
+                    if isinstance(last, dict):
+                        cur = last.get("cursor")
+                        if isinstance(cur, str) and len(cur) >= 10:
+                            found.append(("edges[-1].cursor", cur))
+                for k, v in o.items():
+                    if k in CURSOR_KEYS:
+                        if isinstance(v, str) and len(v) >= 10:
+                            found.append((k, v))
+                    elif k in _TS_HINT_KEYS:
+                        vv = _as_epoch_s(v)
+                        if vv: stamps.append(vv)
+                    if isinstance(v, (dict, list)):
+                        dive(v)
+            elif isinstance(o, list):
+                for v in o:
+                    if isinstance(v, (dict, list)):
+                        dive(v)
+        dive(obj)
+
+        found.sort(key=lambda kv: (_CURSOR_PRIORITY.get(kv[0], 1), len(kv[1])), reverse=True)
+        uniq, seenv = [], set()
+        for k, v in found:
+            if v not in seenv:
+                uniq.append((k, v)); seenv.add(v)
+
+        self.posts = posts
+        self.cursors = uniq
+        self.timestamps = stamps
+        if any(flags): self.has_next = True
+        elif flags: self.has_next = False
+        else: self.has_next = None
+
+    @property
+    def cursor(self):
+        return self.cursors[0][1] if self.cursors else None
+
 def deep_collect_cursors(obj):
-    found = []
-    def dive(o):
-        if isinstance(o, dict):
-            pi = o.get("page_info") or o.get("pageInfo")
-            if isinstance(pi, dict):
-                ec = pi.get("end_cursor") or pi.get("endCursor")
-                if isinstance(ec, str) and len(ec) >= 10:
-                    found.append(("page_info.end_cursor", ec))
-            edges = o.get("edges")
-            if isinstance(edges, list) and edges:
-                last = edges[-1]
-                if isinstance(last, dict):
-                    cur = last.get("cursor")
-                    if isinstance(cur, str) and len(cur) >= 10:
-                        found.append(("edges[-1].cursor", cur))
-            for k, v in o.items():
-                if k in CURSOR_KEYS and isinstance(v, str) and len(v) >= 10:
-                    found.append((k, v))
-                dive(v)
-        elif isinstance(o, list):
-            for v in o: dive(v)
-    dive(obj)
-    priority = {"page_info.end_cursor": 3, "end_cursor": 3, "endCursor": 3, "edges[-1].cursor": 2}
-    found.sort(key=lambda kv: (priority.get(kv[0], 1), len(kv[1])), reverse=True)
-    uniq, seenv = [], set()
-    for k, v in found:
-        if v not in seenv:
-            uniq.append((k, v)); seenv.add(v)
-    return uniq
+    return ResponseAnalysis(obj, collect_posts=False).cursors
 
 def deep_find_has_next(obj):
-    res = []
-    o = obj
-    def dive(o):
-        if isinstance(o, dict):
-            pi = o.get("page_info") or o.get("pageInfo")
-            if isinstance(pi, dict):
-                hn = pi.get("has_next_page");  hn = pi.get("hasNextPage") if hn is None else hn
-                if isinstance(hn, bool): res.append(hn)
-            for v in o.values(): dive(v)
-        elif isinstance(o, list):
-            for v in o: dive(v)
-    dive(o)
-    if any(res): return True
-    if res and not any(res): return False
-    return None
+    return ResponseAnalysis(obj, collect_posts=False).has_next
 
 def deep_collect_timestamps(obj) -> List[int]:
-    keys_hint = {"creation_time","created_time","creationTime","createdTime"}
-    out = []
-    def as_epoch_s(x):
-        try:
-            v = int(x)
-            if v > 10_000_000_000: v //= 1000
-            if 1104537600 <= v <= 4102444800:  # 2005..2100
-                return v
-        except: pass
-        return None
-    def dive(obj):
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                if k in keys_hint:
-                    vv = as_epoch_s(v)
-                    if vv: out.append(vv)
-                dive(v)
-        elif isinstance(obj, list):
-            for v in obj: dive(v)
-    dive(obj)
-    return out
+    return ResponseAnalysis(obj, collect_posts=False).timestamps
 
 # =========================
 # Variables template helpers
 # =========================
 def get_vars_from_form(form_dict):
     try:
-        return json.loads(form_dict.get("variables", "{}")) if form_dict else {}
+        return loads(form_dict.get("variables", "{}")) if form_dict else {}
     except:
         return {}
 
@@ -225,7 +252,7 @@ def strip_cursors_from_vars(v: dict) -> dict:
 
 def update_vars_for_next_cursor(form: dict, next_cursor: str, vars_template: dict = None):
     try:
-        base = json.loads(form.get("variables", "{}"))
+        base = loads(form.get("variables", "{}"))
     except Exception:
         base = {}
     if vars_template:
@@ -241,6 +268,20 @@ def update_vars_for_next_cursor(form: dict, next_cursor: str, vars_template: dic
         base["cursor"] = next_cursor
     if "count" in base and isinstance(base["count"], int):
         base["count"] = max(base["count"], 10)
-    form["variables"] = json.dumps(base, separators=(",", ":"))
+    form["variables"] = dumps(base)
     return form
 
+def _same_request(a: dict, b: dict) -> bool:
+    """2 form có gửi cùng 1 request không — variables so theo JSON đã parse (JS/Python format số khác nhau)."""
+    if a.keys() != b.keys():
+        return False
+    for k in a:
+        if k == "variables":
+            try:
+                if loads(a[k] or "{}") != loads(b[k] or "{}"): return False
+            except Exception:
+                return False
+        elif a[k] != b[k]:
+            return False
+    return True
+
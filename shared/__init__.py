@@ -0,0 +1 @@
+# Module dùng chung cho post/v2 và comment/v2 (import qua shim json_utils.py trong từng thư mục).
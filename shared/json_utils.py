@@ -0,0 +1,53 @@
+# =========================
+# JSON codec — dùng orjson nếu cài, fallback stdlib json
+# =========================
+# Lưu ý định dạng: dumps() luôn compact (",", ":") + ensure_ascii=False, khác bản cũ
+# (json.dumps mặc định ", " / ": ", form "variables" của post/v2 dùng \uXXXX). Byte output của
+# NDJSON, checkpoint và form variables vì thế đổi so với trước (nội dung JSON không đổi) —
+# so sánh output cũ/mới phải so theo giá trị đã parse, không diff text.
+import json
+
+__all__ = ["JSONDecodeError", "raw_decode", "loads", "dumps", "load", "dump"]
+
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn
+    orjson = None
+
+# orjson.JSONDecodeError kế thừa json.JSONDecodeError → except cũ vẫn bắt được
+JSONDecodeError = json.JSONDecodeError
+
+# decoder stdlib cho raw_decode theo offset (orjson không có API này)
+raw_decode = json.JSONDecoder().raw_decode
+
+if orjson is not None:
+    _OPT = orjson.OPT_NON_STR_KEYS
+    _OPT_INDENT = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+
+def loads(s):
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass  # orjson khắt khe hơn (surrogate lẻ, số quá lớn...) → để stdlib quyết định
+    return json.loads(s)
+
+def dumps(obj, indent: bool = False) -> str:
+    """
+    Luôn ensure_ascii=False (giữ nguyên tiếng Việt). Output compact (",", ":")
+    hoặc indent=2 — cùng định dạng cho cả 2 backend.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_OPT_INDENT if indent else _OPT).decode("utf-8")
+        except TypeError:
+            pass  # kiểu orjson không hỗ trợ (int > 64-bit, ...) → stdlib
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def load(f):
+    return loads(f.read())
+
+def dump(obj, f, indent: bool = False):
+    f.write(dumps(obj, indent))
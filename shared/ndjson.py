@@ -0,0 +1,289 @@
+# =========================
+# NDJSON writer — giữ file mở, gom dòng rồi ghi theo lô (dùng chung post/v2 + comment/v2)
+# =========================
+# Mỗi thư mục bọc ndjson_writer() để truyền NDJSON_FLUSH_* / ZSTD_* từ configs.py của nó.
+import os, atexit, signal, threading, time
+try:
+    import zstandard as zstd
+except ImportError:  # chỉ cần khi output là .ndjson.zst
+    zstd = None
+from shared.json_utils import JSONDecodeError, dumps, load, loads
+
+class NdjsonWriter:
+    """
+    1 writer sống suốt run cho mỗi file output (lấy qua ndjson_writer(path)).
+      - write(obj)/write_many(objs): chỉ dumps + đưa vào buffer
+      - buffer ghi xuống khi đủ flush_bytes hoặc quá flush_interval giây (kiểm tra lúc write)
+      - flush(durable=True): ghi + fsync — gọi trước khi checkpoint ghi nhận id / hết 1 trang comment
+    Lớp con đổi cách lưu file (vd. nén) bằng cách override _open_file/_write_text/_sync/_close_file.
+    """
+    def __init__(self, path, flush_bytes=1 << 20, flush_interval=2.0):
+        self.path = str(path)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._buf, self._size = [], 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._f = self._open_file()
+
+    # --- phần đụng tới file ---
+    def _open_file(self):
+        return open(self.path, "a", encoding="utf-8")
+
+    def _write_text(self, text):
+        self._f.write(text)
+
+    def _sync(self, durable):
+        self._f.flush()
+        if durable:
+            os.fsync(self._f.fileno())
+
+    def _close_file(self):
+        self._f.close()
+
+    def write(self, obj):
+        self.write_many((obj,))
+
+    def write_many(self, objs):
+        with self._lock:
+            for o in objs:
+                line = dumps(o) + "\n"
+                self._buf.append(line)
+                self._size += len(line)
+            if self._size >= self.flush_bytes or time.monotonic() - self._last >= self.flush_interval:
+                self._flush_locked(False)
+
+    def _flush_locked(self, durable):
+        if self._f is None:
+            return
+        if self._buf:
+            self._write_text("".join(self._buf))
+            self._buf, self._size = [], 0
+        self._sync(durable)
+        self._last = time.monotonic()
+
+    def flush(self, durable=False):
+        with self._lock:
+            self._flush_locked(durable)
+
+    def close(self):
+        with self._lock:
+            if self._f is None:
+                return
+            self._flush_locked(True)
+            self._close_file()
+            self._f = None
+
+# =========================
+# NDJSON nén zstd, chia segment — path "<stem>.ndjson.zst"
+# =========================
+# <stem>.00000.ndjson.zst, <stem>.00001.ndjson.zst, ... mỗi segment tối đa ZSTD_SEGMENT_BYTES
+# (tính theo byte chưa nén) + <stem>.manifest.json ghi rows/raw_bytes/zst_bytes từng segment.
+# Flush thường/durable = FLUSH_BLOCK (giữ context nén, phần đã flush vẫn đọc được);
+# hết segment/close = FLUSH_FRAME. Chạy lại → mở segment mới, không nối vào segment cũ.
+_ZST_SUFFIX = ".ndjson.zst"
+
+def _zst_stem(path):
+    path = str(path)
+    return path[:-len(_ZST_SUFFIX)] if path.endswith(_ZST_SUFFIX) else path
+
+def _zst_manifest_path(stem):
+    return stem + ".manifest.json"
+
+class ZstdSegmentWriter(NdjsonWriter):
+    def __init__(self, path, segment_bytes=64 << 20, level=6, **kw):
+        if zstd is None:
+            raise RuntimeError("Ghi .ndjson.zst cần package zstandard (pip install zstandard)")
+        self.stem = _zst_stem(path)
+        self.segment_bytes = segment_bytes
+        self._cctx = zstd.ZstdCompressor(level=level)
+        self._mpath = _zst_manifest_path(self.stem)
+        self.manifest = {"codec": "zstd", "level": level, "segments": []}
+        if os.path.exists(self._mpath):
+            try:
+                with open(self._mpath, "r", encoding="utf-8") as f:
+                    self.manifest["segments"] = load(f).get("segments") or []
+            except Exception:
+                pass
+        super().__init__(path, **kw)
+
+    def _save_manifest(self):
+        tmp = self._mpath + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(dumps(self.manifest, indent=True))
+        os.replace(tmp, self._mpath)
+
+    def _open_file(self):
+        segs = self.manifest["segments"]
+        i = len(segs)
+        while os.path.exists(f"{self.stem}.{i:05d}{_ZST_SUFFIX}"):  # segment sót lại khi crash trước lúc ghi manifest
+            i += 1
+        name = f"{self.stem}.{i:05d}{_ZST_SUFFIX}"
+        f = open(name, "wb")
+        self._zw = self._cctx.stream_writer(f)
+        self._seg = {"file": os.path.basename(name), "rows": 0, "raw_bytes": 0, "zst_bytes": 0, "closed": False}
+        segs.append(self._seg)
+        self._save_manifest()
+        return f
+
+    def _write_text(self, text):
+        if self._seg["raw_bytes"] >= self.segment_bytes:  # xoay trước khi ghi → không để lại segment rỗng
+            self._close_file()
+            self._f = self._open_file()
+        data = text.encode("utf-8")
+        self._zw.write(data)
+        self._seg["rows"] += text.count("\n")
+        self._seg["raw_bytes"] += len(data)
+
+    def _sync(self, durable):
+        self._zw.flush(zstd.FLUSH_BLOCK)
+        self._f.flush()
+        if durable:
+            os.fsync(self._f.fileno())
+            self._seg["zst_bytes"] = self._f.tell()
+            self._save_manifest()
+
+    def _close_file(self):
+        self._zw.flush(zstd.FLUSH_FRAME)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._seg["zst_bytes"] = self._f.tell()
+        self._seg["closed"] = True
+        self._f.close()
+        if not self._seg["rows"]:  # mở rồi đóng mà chưa ghi gì
+            os.remove(self._f.name)
+            self.manifest["segments"].remove(self._seg)
+        self._save_manifest()
+
+def _zst_segment_files(path):
+    stem = _zst_stem(path)
+    names = []
+    try:
+        with open(_zst_manifest_path(stem), "r", encoding="utf-8") as f:
+            names = [s["file"] for s in load(f).get("segments") or []]
+    except Exception:
+        pass
+    d = os.path.dirname(stem) or "."
+    prefix = os.path.basename(stem) + "."
+    on_disk = sorted(n for n in os.listdir(d) if n.startswith(prefix) and n.endswith(_ZST_SUFFIX)
+                     and n[len(prefix):-len(_ZST_SUFFIX)].isdigit()) if os.path.isdir(d) else []
+    names += [n for n in on_disk if n not in names]
+    return [os.path.join(d, n) for n in names if os.path.exists(os.path.join(d, n))]
+
+def _iter_zst_lines(fh, chunk=1 << 20):
+    """
+    Từng dòng (bytes, có \\n) của file nhiều frame zstd; frame cuối có thể chưa đóng (mới FLUSH_BLOCK).
+    Không dùng stream_reader: read(n) trên frame chưa đóng trả b"" sớm, mất phần block đã flush.
+    """
+    dctx = zstd.ZstdDecompressor()
+    dobj = dctx.decompressobj()
+    tail = b""
+    try:
+        while True:
+            data = fh.read(chunk)
+            if not data:
+                break
+            while data:
+                out = dobj.decompress(data)
+                if out:
+                    lines = (tail + out).split(b"\n")
+                    tail = lines.pop()
+                    for ln in lines:
+                        yield ln + b"\n"
+                if not dobj.eof:
+                    break
+                data = dobj.unused_data  # frame kế tiếp (segment đã qua nhiều lần mở/đóng)
+                dobj = dctx.decompressobj()
+    except zstd.ZstdError:
+        pass  # đuôi file hỏng (crash giữa lúc ghi) → dừng ở block đọc được
+    # tail: dòng ghi dở → bỏ
+
+def ndjson_files(path):
+    """File thật cần đọc cho `path`: chính nó, hoặc các segment của "<stem>.ndjson.zst" theo manifest."""
+    path = str(path)
+    if path.endswith(".zst") and not os.path.exists(path):
+        return _zst_segment_files(path)
+    return [path]
+
+def iter_ndjson_lines(path):
+    """
+    Từng dòng (str, còn \n) của file .ndjson/.jsonl thường, 1 file .zst, hoặc "<stem>.ndjson.zst"
+    (toàn bộ segment theo manifest). Với .zst dòng ghi dở bị bỏ; file thường trả cả dòng cuối chưa có \n.
+    """
+    for fp in ndjson_files(path):
+        if fp.endswith(".zst"):
+            if zstd is None:
+                raise RuntimeError("Đọc .ndjson.zst cần package zstandard (pip install zstandard)")
+            with open(fp, "rb") as fh:
+                for line in _iter_zst_lines(fh):
+                    yield line.decode("utf-8")
+        else:
+            with open(fp, "r", encoding="utf-8") as f:
+                yield from f
+
+def iter_ndjson(path):
+    """Đọc lại output từng dòng (dict) như iter_ndjson_lines; dòng hỏng/ghi dở bị bỏ qua."""
+    for line in iter_ndjson_lines(path):
+        if not line.endswith("\n"):
+            break
+        try:
+            yield loads(line)
+        except JSONDecodeError:
+            continue
+
+_WRITERS = {}
+_WRITERS_LOCK = threading.Lock()
+_PREV_HANDLERS = {}
+_HOOKS_ON = False
+
+def ndjson_writer(path, cls=None, **kw) -> NdjsonWriter:
+    """
+    Writer dùng chung theo path tuyệt đối; cls/kw chỉ dùng khi tạo lần đầu.
+    Mặc định path "*.ndjson.zst" → ZstdSegmentWriter, còn lại NdjsonWriter.
+    """
+    key = os.path.abspath(str(path))
+    with _WRITERS_LOCK:
+        w = _WRITERS.get(key)
+        if w is None:
+            if cls is None:
+                cls = ZstdSegmentWriter if str(path).endswith(_ZST_SUFFIX) else NdjsonWriter
+            w = _WRITERS[key] = cls(path, **kw)
+            _install_shutdown_hooks()
+        return w
+
+def flush_ndjson_writers(durable=True):
+    for w in list(_WRITERS.values()):
+        w.flush(durable)
+
+def close_ndjson_writers():
+    with _WRITERS_LOCK:
+        ws = list(_WRITERS.values())
+        _WRITERS.clear()
+    for w in ws:
+        w.close()
+
+def _on_signal(signum, frame):
+    # Chỉ đổi signal thành exception: handler chạy chen vào main thread, có thể đúng lúc main thread đang
+    # giữ lock của writer (write_many/flush) → không đụng writer ở đây. `with lock` nhả lock khi exception
+    # bay ra, rồi atexit close_ndjson_writers mới flush + đóng file.
+    prev = _PREV_HANDLERS.get(signum)
+    if callable(prev):
+        prev(signum, frame)  # SIGINT mặc định → KeyboardInterrupt như cũ
+    else:
+        raise SystemExit(128 + signum)
+
+def _install_shutdown_hooks():
+    global _HOOKS_ON
+    if _HOOKS_ON:
+        return
+    _HOOKS_ON = True
+    atexit.register(close_ndjson_writers)
+    if threading.current_thread() is not threading.main_thread():
+        return  # signal.signal chỉ gọi được từ main thread; còn atexit
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):  # SIGBREAK: Ctrl+Break trên Windows
+        sig = getattr(signal, name, None)
+        if sig is not None and signal.getsignal(sig) is not signal.SIG_IGN:
+            _PREV_HANDLERS[sig] = signal.signal(sig, _on_signal)
@@ -0,0 +1,195 @@
+# =========================
+# Raw archive — response gốc, khoá theo hash nội dung, nén zstd vào pack append-only (dùng chung post/v2 + comment/v2)
+# =========================
+# Mỗi thư mục tạo archive qua raw_archive() của nó (RAW_DUMPS_DIR / RAW_ARCHIVE_* trong configs.py).
+# <root>/pack-00000.bin, ...: mỗi blob là 1 frame zstd độc lập (đọc lại bằng off/len)
+# <root>/index.ndjson: 1 dòng / lần put {h, target, page, cursor, ts, pack, off, len, raw_len, codec}
+# Response trùng nội dung chỉ lưu 1 lần, dòng index trỏ về blob cũ.
+# Hash + nén + ghi chạy trên 1 thread riêng; vòng crawl chỉ put() vào queue.
+# <root>/dicts/: dictionary zstd train theo doc (friendly name/doc_id) bằng train_dicts();
+# dicts.json = {doc: dict_id} đang dùng. Blob nén bằng dict ghi "dict": id trong index,
+# file dict cũ giữ lại để blob cũ vẫn đọc được sau khi train lại.
+import os, atexit, hashlib, queue, threading, time
+try:
+    import zstandard as zstd
+except ImportError:  # raw archive lưu không nén
+    zstd = None
+from shared.json_utils import dumps, load, loads
+
+class RawArchive:
+    def __init__(self, root, mode="full", sample_every=20, pack_bytes=256 << 20, level=6):
+        """
+        mode: "off" | "sample" (1/sample_every trang, hoặc put(force=True)) | "full".
+        Lỗi ghi trên thread nền được giữ lại và raise ở put() kế tiếp hoặc close().
+        """
+        if mode not in ("off", "sample", "full"):
+            raise ValueError(f"RAW_ARCHIVE phải là off/sample/full, không phải {mode!r}")
+        self.root = str(root)
+        self.mode = mode
+        self.sample_every = max(1, int(sample_every))
+        self.pack_bytes = pack_bytes
+        self._n = 0
+        self._error = None
+        self._closed = mode == "off"
+        if self._closed:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        self.level = level
+        self._cctx = zstd.ZstdCompressor(level=level) if zstd else None  # thiếu zstandard → lưu thô
+        self._dict_cctx = {}  # doc → compressor có dictionary
+        self._dicts = {}      # dict_id → ZstdCompressionDict (đọc lại)
+        if zstd:
+            for doc, did in self._load_dict_map().items():
+                try:
+                    self._dict_cctx[doc] = (did, zstd.ZstdCompressor(level=level, dict_data=self._dict(did)))
+                except OSError:
+                    pass
+        self._blobs = {}
+        self._index_path = os.path.join(self.root, "index.ndjson")
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = loads(line)
+                    except Exception:
+                        continue
+                    self._blobs.setdefault(rec["h"], {k: rec[k] for k in ("pack", "off", "len", "raw_len", "codec", "dict")
+                                                      if k in rec})
+        packs = sorted(n for n in os.listdir(self.root) if n.startswith("pack-") and n.endswith(".bin"))
+        self._pack_no = int(packs[-1][5:-4]) if packs else 0
+        self._pack = open(self._pack_path(self._pack_no), "ab")
+        self._index = open(self._index_path, "a", encoding="utf-8")
+        self._q = queue.Queue(maxsize=64)
+        self._t = threading.Thread(target=self._run, name="raw-archive", daemon=True)
+        self._t.start()
+        atexit.register(self.close)
+
+    def _pack_path(self, no):
+        return os.path.join(self.root, f"pack-{no:05d}.bin")
+
+    def _load_dict_map(self):
+        try:
+            with open(os.path.join(self.root, "dicts.json"), "r", encoding="utf-8") as f:
+                return load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _dict(self, did):
+        d = self._dicts.get(did)
+        if d is None:
+            with open(os.path.join(self.root, "dicts", f"{did}.zdict"), "rb") as f:
+                d = self._dicts[did] = zstd.ZstdCompressionDict(f.read())
+        return d
+
+    def put(self, text, force=False, **meta):
+        """
+        Đưa response vào hàng đợi ghi; trả False nếu bị bỏ qua (off / không trúng mẫu).
+        meta["doc"] (friendly name hoặc doc_id) chọn dictionary khi nén.
+        """
+        self._raise_error()
+        if self._closed:
+            return False
+        self._n += 1
+        if self.mode == "sample" and not force and (self._n - 1) % self.sample_every:
+            return False
+        meta.setdefault("ts", time.time())
+        self._q.put((text, meta))
+        return True
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            try:
+                self._store(*item)
+            except Exception as e:
+                print(f"[RAW] archive write failed: {e}")
+                if self._error is None:
+                    self._error = e  # giữ lỗi đầu tiên cho put()/close() raise ở thread chính
+
+    def _raise_error(self):
+        e, self._error = self._error, None
+        if e is not None:
+            raise RuntimeError(f"Raw archive ghi lỗi ({self.root}): {e}") from e
+
+    def _store(self, text, meta):
+        data = text.encode("utf-8") if isinstance(text, str) else bytes(text or b"")
+        h = hashlib.blake2b(data, digest_size=16).hexdigest()
+        loc = self._blobs.get(h)
+        if loc is None:
+            did, cctx = self._dict_cctx.get(meta.get("doc"), (None, self._cctx))
+            blob, codec = (cctx.compress(data), "zstd") if cctx else (data, "raw")
+            off = self._pack.seek(0, os.SEEK_END)
+            if off and off + len(blob) > self.pack_bytes:
+                self._pack.close()
+                self._pack_no += 1
+                self._pack = open(self._pack_path(self._pack_no), "ab")
+                off = 0
+            self._pack.write(blob)
+            self._pack.flush()  # blob xuống file trước dòng index trỏ tới nó
+            loc = self._blobs[h] = {"pack": os.path.basename(self._pack.name), "off": off,
+                                    "len": len(blob), "raw_len": len(data), "codec": codec}
+            if did is not None:
+                loc["dict"] = did
+        self._index.write(dumps({"h": h, **meta, **loc}) + "\n")
+        self._index.flush()
+
+    def get(self, h) -> str:
+        """Đọc lại response gốc theo hash (sau khi đã ghi xong, vd. từ process khác)."""
+        loc = self._blobs[h]
+        with open(os.path.join(self.root, loc["pack"]), "rb") as f:
+            f.seek(loc["off"])
+            blob = f.read(loc["len"])
+        if loc["codec"] == "zstd":
+            dctx = zstd.ZstdDecompressor(dict_data=self._dict(loc["dict"])) if "dict" in loc else zstd.ZstdDecompressor()
+            blob = dctx.decompress(blob)
+        return blob.decode("utf-8")
+
+    def train_dicts(self, samples_per_doc=200, dict_size=112640, min_samples=20):
+        """
+        Train 1 dictionary / doc từ blob đã lưu (lấy mẫu trải đều theo index), ghi dicts/<id>.zdict
+        và cập nhật dicts.json. Áp dụng cho blob ghi từ lần mở archive sau. Trả {doc: (dict_id, n_samples)}.
+        """
+        if zstd is None:
+            raise RuntimeError("Train dictionary cần package zstandard (pip install zstandard)")
+        by_doc = {}
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = loads(line)
+                except Exception:
+                    continue
+                hs = by_doc.setdefault(rec.get("doc"), [])
+                if rec["h"] not in hs:
+                    hs.append(rec["h"])
+        by_doc.pop(None, None)
+        os.makedirs(os.path.join(self.root, "dicts"), exist_ok=True)
+        dmap, out = self._load_dict_map(), {}
+        for doc, hs in by_doc.items():
+            if len(hs) < min_samples:
+                continue
+            step = max(1, len(hs) // samples_per_doc)
+            samples = [self.get(h).encode("utf-8") for h in hs[::step][:samples_per_doc]]
+            zd = zstd.train_dictionary(dict_size, samples)
+            did = zd.dict_id()
+            with open(os.path.join(self.root, "dicts", f"{did}.zdict"), "wb") as f:
+                f.write(zd.as_bytes())
+            dmap[doc] = did
+            out[doc] = (did, len(samples))
+        tmp = os.path.join(self.root, "dicts.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(dumps(dmap, indent=True))
+        os.replace(tmp, os.path.join(self.root, "dicts.json"))
+        return out
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(None)
+        self._t.join()
+        self._pack.close()
+        self._index.close()
+        self._raise_error()
+
@@ -0,0 +1,51 @@
+# =========================
+# Hỗ trợ check_trim_parity.py (post/v2 + comment/v2): chạy đúng __trimBody gửi vào page bằng node,
+# lấy body gốc từ raw archive
+# =========================
+import os, shutil, subprocess
+from shared.json_utils import dumps, loads
+from shared.raw_archive import RawArchive
+
+_NODE_MAIN = r"""
+const chunks = [];
+process.stdin.on('data', c => chunks.push(c));
+process.stdin.on('end', () => {
+  const {spec, texts} = JSON.parse(Buffer.concat(chunks).toString('utf8'));
+  process.stdout.write(JSON.stringify(texts.map(t => __trimBody(t, spec))));
+});
+"""
+
+def trim_bodies(trim_js, spec, texts, node="node"):
+    """__trimBody(text, spec) cho từng body → [{text, full, kept, fallback}] (cùng JS như trong page)."""
+    exe = shutil.which(node)
+    if exe is None:
+        raise RuntimeError("Cần node (Node.js) để chạy __trimBody ngoài trình duyệt")
+    p = subprocess.run([exe, "-e", trim_js + _NODE_MAIN], input=dumps({"spec": spec, "texts": texts}).encode("utf-8"),
+                       capture_output=True)
+    if p.returncode:
+        raise RuntimeError(f"node lỗi: {p.stderr.decode('utf-8', 'replace')[-2000:]}")
+    return loads(p.stdout)
+
+def archive_bodies(root, limit=0, skip_doc=None):
+    """Body gốc (đã khử trùng theo hash) trong raw archive `root`; bỏ doc chứa chuỗi skip_doc."""
+    index = os.path.join(str(root), "index.ndjson")
+    if not os.path.exists(index):
+        return []
+    arc = RawArchive(root, mode="full")
+    out, seen = [], set()
+    try:
+        with open(index, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = loads(line)
+                except Exception:
+                    continue
+                if rec["h"] in seen or (skip_doc and skip_doc in str(rec.get("doc") or "")):
+                    continue
+                seen.add(rec["h"])
+                out.append(arc.get(rec["h"]))
+                if limit and len(out) >= limit:
+                    break
+    finally:
+        arc.close()
+    return out
@@ -1,26 +1,91 @@
-import pandas as pd
+import hashlib
+import os
+import time
+from openpyxl import Workbook, load_workbook
 
 # ===== CẤU HÌNH =====
 input_file = "thoibao-de-last.xlsx"     # đường dẫn file Excel gốc
 output_file = "thoibao-de-last-split.xlsx"  # file Excel sau khi chia
 num_sheets = 4               # số sheet muốn chia
+split_mode = "rows"          # "rows": chia đều theo thứ tự dòng | "hash": theo hash cột `link` (chạy lại vẫn cùng sheet)
+separate_files = False       # True → mỗi phần 1 file: thoibao-de-last-split-sheet1.xlsx, ...
 
-# ===== ĐỌC FILE =====
-df = pd.read_excel(input_file)
+def _link_bucket(link, n):
+    """Phần (0..n-1) của 1 link — blake2b nên ổn định giữa các lần chạy (không như hash())."""
+    key = str(link or "").strip().lower().encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") % n
 
-# ===== TÍNH SỐ DÒNG MỖI SHEET =====
-rows_per_sheet = len(df) // num_sheets
-remainder = len(df) % num_sheets
+def _count_data_rows(ws):
+    # file không ghi dimension → max_row None, phải đếm 1 lượt
+    return sum(1 for _ in ws.iter_rows(min_row=2, values_only=True))
 
-# ===== GHI RA FILE MỚI =====
-with pd.ExcelWriter(output_file, engine="openpyxl") as writer:
-    start = 0
+def split_excel_stream(input_file, output_file, num_sheets, mode="rows", separate_files=False, key="link"):
+    """
+    Chia sheet đầu của input_file thành num_sheets phần, đọc 1 lượt bằng openpyxl read-only
+    và ghi thẳng ra workbook write-only (không dựng DataFrame).
+      - mode="rows": như bản pandas cũ — các phần liên tiếp, phần đầu thêm 1 dòng nếu không chia hết
+      - mode="hash": dòng vào phần blake2b(`key`) % num_sheets → link cố định 1 phần qua các lần chạy
+    separate_files=False → 1 file, sheet Sheet_1..Sheet_N; True → N file <output>-sheet{i}.xlsx (sheet Sheet_i).
+    Trả list số dòng mỗi phần.
+    """
+    src = load_workbook(input_file, read_only=True)
+    ws_in = src.worksheets[0]
+    rows = ws_in.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        src.close()
+        raise ValueError(f"'{input_file}' không có dữ liệu.")
+    header = list(header)
+
+    if mode == "rows":
+        total = (ws_in.max_row - 1) if ws_in.max_row else None
+        if total is None:
+            total = _count_data_rows(ws_in)
+        rows_per_sheet, remainder = divmod(total, num_sheets)
+        bounds, start = [], 0
+        for i in range(num_sheets):
+            start += rows_per_sheet + (1 if i < remainder else 0)
+            bounds.append(start)  # phần i kết thúc (không gồm) ở dòng dữ liệu thứ bounds[i]
+    elif mode == "hash":
+        if key not in header:
+            src.close()
+            raise ValueError(f"Thiếu cột '{key}' để chia theo hash.")
+        key_idx = header.index(key)
+    else:
+        src.close()
+        raise ValueError(f"mode phải là 'rows' hoặc 'hash', không phải {mode!r}")
+
+    stem, ext = os.path.splitext(output_file)
+    books, sheets = [], []
     for i in range(num_sheets):
-        # nếu không chia hết thì các sheet đầu có thêm 1 dòng
-        extra = 1 if i < remainder else 0
-        end = start + rows_per_sheet + extra
-        chunk = df.iloc[start:end]
-        chunk.to_excel(writer, sheet_name=f"Sheet_{i+1}", index=False)
-        start = end
-
-print(f"✅ Đã chia {len(df)} dòng thành {num_sheets} sheet đều nhau trong file '{output_file}'.")
+        if separate_files or not books:
+            books.append(Workbook(write_only=True))
+        ws = books[-1].create_sheet(f"Sheet_{i+1}")
+        ws.append(header)
+        sheets.append(ws)
+
+    counts = [0] * num_sheets
+    part = 0
+    for n, row in enumerate(rows):
+        if mode == "rows":
+            while part < num_sheets - 1 and n >= bounds[part]:
+                part += 1
+        else:
+            part = _link_bucket(row[key_idx] if key_idx < len(row) else None, num_sheets)
+        sheets[part].append(row)
+        counts[part] += 1
+    src.close()
+
+    if separate_files:
+        for i, wb in enumerate(books):
+            wb.save(f"{stem}-sheet{i+1}{ext}")
+    else:
+        books[0].save(output_file)
+    return counts
+
+# ===== CHẠY =====
+if __name__ == "__main__":
+    t0 = time.time()
+    counts = split_excel_stream(input_file, output_file, num_sheets, mode=split_mode, separate_files=separate_files)
+    where = f"các file '{os.path.splitext(output_file)[0]}-sheet*.xlsx'" if separate_files else f"file '{output_file}'"
+    print(f"✅ Đã chia {sum(counts)} dòng thành {num_sheets} sheet {counts} trong {where} ({time.time() - t0:.1f}s).")